@@ -0,0 +1,155 @@
+# ElectionGuard Verifier Big-Integer Arithmetic
+# Nicholas Boucher 2020
+from typing import Any, List, Tuple
+from metrics import counters
+
+# Exponent bits consumed per step of a simultaneous multi-exponentiation
+MULTI_EXP_WINDOW = 4
+
+
+class PythonBackend:
+    """Modular arithmetic on Python's built-in integers."""
+    name = "python"
+
+    @staticmethod
+    def native(x: int) -> Any:
+        return x
+
+    @staticmethod
+    def parse_int(digits: str) -> int:
+        return int(digits)
+
+    @staticmethod
+    def powmod(base: Any, exponent: Any, modulus: Any) -> Any:
+        return pow(base, exponent, modulus)
+
+    @staticmethod
+    def mulmod(a: Any, b: Any, modulus: Any) -> Any:
+        return a * b % modulus
+
+    @staticmethod
+    def invert(a: Any, modulus: Any) -> Any:
+        return pow(a, -1, modulus)
+
+
+class Gmpy2Backend:
+    """Modular arithmetic on GMP integers through the optional gmpy2 package.
+    Results are `mpz` values, which compare equal to and mix freely with
+    Python integers.
+    """
+    name = "gmpy2"
+
+    def __init__(self) -> None:
+        import gmpy2
+        self.native = gmpy2.mpz
+        self.powmod = gmpy2.powmod
+        self.invert = gmpy2.invert
+
+    def parse_int(self, digits: str) -> int:
+        # GMP converts from decimal in subquadratic time
+        return int(self.native(digits))
+
+    @staticmethod
+    def mulmod(a: Any, b: Any, modulus: Any) -> Any:
+        return a * b % modulus
+
+
+# Backends in order of preference for automatic selection
+BACKENDS = {"gmpy2": Gmpy2Backend, "python": PythonBackend}
+
+# The backend used by this process, chosen by `set_backend`
+_backend: Any = None
+
+
+def available_backends() -> List[str]:
+    """Returns the names of the backends which can be used in this
+        environment."""
+    available = []
+    for name, backend in BACKENDS.items():
+        try:
+            backend()
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def set_backend(name: str = "auto") -> None:
+    """Selects the backend used for modular arithmetic by name. The `auto`
+        backend is the fastest available one."""
+    global _backend
+    if name == "auto":
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown arithmetic backend: {name}")
+    _backend = BACKENDS[name]()
+
+
+def backend_name() -> str:
+    """Returns the name of the backend used by this process."""
+    return _backend.name
+
+
+def native(x: int) -> Any:
+    """Converts `x` to the backend's integer type."""
+    return _backend.native(x)
+
+
+def parse_int(digits: str) -> int:
+    """Converts a string of decimal digits to an integer, using the fastest
+        conversion the backend provides."""
+    return _backend.parse_int(digits)
+
+
+def powmod(base: Any, exponent: Any, modulus: Any) -> Any:
+    """Returns `base^exponent mod modulus`."""
+    counters["modexp"] += 1
+    return _backend.powmod(base, exponent, modulus)
+
+
+def mulmod(a: Any, b: Any, modulus: Any) -> Any:
+    """Returns `a b mod modulus`."""
+    return _backend.mulmod(a, b, modulus)
+
+
+def invert(a: Any, modulus: Any) -> Any:
+    """Returns the inverse of `a` modulo `modulus`."""
+    return _backend.invert(a, modulus)
+
+
+def multi_exp(terms: List[Tuple[Any, Any]], modulus: Any) -> Any:
+    """Returns `Π bᵢᵉⁱ mod modulus` for the `(base, exponent)` pairs in
+        `terms`, sharing the squarings between all of the bases."""
+    counters["multi_exp"] += 1
+    counters["multi_exp_terms"] += len(terms)
+    window = MULTI_EXP_WINDOW
+    mask = (1 << window) - 1
+    mul = _backend.mulmod
+
+    # Precompute the small powers of each base
+    tables = []
+    for base, exponent in terms:
+        if exponent:
+            row = [native(1), native(base) % modulus]
+            for _ in range(mask - 1):
+                row.append(mul(row[-1], row[1], modulus))
+            tables.append((int(exponent), row))
+    if not tables:
+        return native(1)
+
+    # Process the exponents one window at a time from the most significant
+    bits = max(exponent.bit_length() for exponent, _ in tables)
+    result = native(1)
+    for shift in range((bits - 1) // window * window, -1, -window):
+        if result != 1:
+            for _ in range(window):
+                result = mul(result, result, modulus)
+        for exponent, row in tables:
+            digit = (exponent >> shift) & mask
+            if digit:
+                result = mul(result, row[digit], modulus)
+    return result
+
+
+# Use the fastest available backend unless another is selected
+set_backend()
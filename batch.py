@@ -0,0 +1,100 @@
+# ElectionGuard Verifier Batch Proof Verification
+# Nicholas Boucher 2020
+from typing import Dict, List, Tuple
+from secrets import randbelow
+from arithmetic import mulmod, multi_exp
+from findings import Finding
+from models import EncryptedBallot
+from proofs import (Equation, ProofContext, contest_equations, first_failure,
+                    selection_equations)
+
+# Random batch exponents are drawn from `[1, 2^BATCH_SECURITY)`, so a batch
+# containing an invalid equation passes with probability at most
+# `2^-BATCH_SECURITY`, provided every element lies in the order `q` subgroup
+BATCH_SECURITY = 64
+
+# Identifies the proof an equation group belongs to as the indices of the
+# ballot in the chunk, the contest, and the selection. Contest proofs use
+# the number of selections as their selection index, so they sort last.
+GroupKey = Tuple[int, int, int]
+
+
+def batch_holds(equations: List[Equation], ctx: ProofContext) -> bool:
+    """Returns true when a random linear combination of `equations` holds.
+        This is always the case when every equation holds, and happens with
+        negligible probability otherwise."""
+    p = ctx.prime
+    generator_exponent, public_key_exponent = 0, 0
+    bases: Dict[int, int] = {}
+    for equation in equations:
+        weight = randbelow((1 << BATCH_SECURITY) - 1) + 1
+        generator_exponent += weight * equation.generator_exponent
+        public_key_exponent += weight * equation.public_key_exponent
+        for base, exponent in equation.terms + equation.fixed_terms:
+            bases[base] = bases.get(base, 0) + weight * exponent
+
+    left = mulmod(ctx.pow_generator(generator_exponent),
+                  ctx.pow_public_key(public_key_exponent), p)
+    return left == multi_exp(list(bases.items()), p)
+
+
+def find_failures(groups: List[Tuple[GroupKey, List[Equation]]],
+                  ctx: ProofContext) -> List[Tuple[GroupKey, Finding]]:
+    """Locates the equation groups which do not hold by bisecting `groups`,
+        discarding each half whose batch holds. Single groups are checked
+        exactly before being reported."""
+    if len(groups) == 1:
+        key, equations = groups[0]
+        failure = first_failure(equations, ctx)
+        return [(key, failure)] if failure is not None else []
+
+    failures = []
+    middle = len(groups) // 2
+    for half in (groups[:middle], groups[middle:]):
+        if not batch_holds([eq for _, eqs in half for eq in eqs], ctx):
+            failures.extend(find_failures(half, ctx))
+    return failures
+
+
+def verify_ballots_batch(ballots: List[EncryptedBallot],
+                         ctx: ProofContext) -> List[List[Finding]]:
+    """Checks the proofs on `ballots` together, returning the same findings
+        for each ballot as `proofs.verify_ballot`."""
+    failures: List[Tuple[GroupKey, Finding]] = []
+    groups: List[Tuple[GroupKey, List[Equation]]] = []
+
+    # Check the challenge hashes and gather the remaining equations
+    for ballot_index, ballot in enumerate(ballots):
+        for contest_index, contest in enumerate(ballot.contests):
+            for selection_index, selection in enumerate(contest.selections):
+                key = (ballot_index, contest_index, selection_index)
+                failure, equations = selection_equations(selection, ctx)
+                if failure is not None:
+                    failures.append((key, failure))
+                groups.append((key, equations))
+            key = (ballot_index, contest_index, len(contest.selections))
+            failure, equations = contest_equations(contest, ctx)
+            if failure is not None:
+                failures.append((key, failure))
+            groups.append((key, equations))
+
+    # Test: All proof equations hold, locating any which do not
+    if not batch_holds([eq for _, eqs in groups for eq in eqs], ctx):
+        failures.extend(find_failures(groups, ctx))
+
+    # Report the first failure in each contest, as sequential checks would
+    first: Dict[Tuple[int, int], Tuple[int, Finding]] = {}
+    for (ballot_index, contest_index, selection_index), failure in failures:
+        current = first.get((ballot_index, contest_index))
+        if current is None or selection_index < current[0]:
+            first[(ballot_index, contest_index)] = (selection_index, failure)
+
+    results: List[List[Finding]] = [[] for _ in ballots]
+    for (ballot_index, contest_index), (selection_index, failure) \
+            in sorted(first.items()):
+        contest = ballots[ballot_index].contests[contest_index]
+        if selection_index < len(contest.selections):
+            failure.selection = selection_index
+        failure.contest = contest_index
+        results[ballot_index].append(failure)
+    return results
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# ElectionGuard Verifier Benchmark Harness
+# Nicholas Boucher 2020
+from typing import Any, Dict, List
+from argparse import SUPPRESS, ArgumentParser, Namespace
+from json import dumps, loads
+from os import remove
+from os.path import abspath, getsize, isdir, isfile, join
+from resource import RUSAGE_SELF, getrusage
+from shutil import rmtree
+from subprocess import run
+from sys import executable
+from tempfile import mkdtemp
+from time import perf_counter
+from arithmetic import available_backends, set_backend
+from binary import write_binary_record
+from generate import generate_record
+from loader import load_election_record
+from metrics import report
+from verify import verify_election, DEFAULT_CHUNK_SIZE
+
+# Stages measured by the harness, each in a fresh process so that its peak
+# resident set size is its own
+STAGES = ("load", "verify")
+
+
+def run_stage(args: Namespace) -> Dict[str, Any]:
+    """Runs one stage on the record in this process and returns its
+        measurements."""
+    set_backend(args.backend)
+    start = perf_counter()
+    election = load_election_record(args.record, lazy_ints=args.lazy_ints)
+    ballots = len(election.cast_ballots)
+    if args.stage == "load":
+        # Decode every ballot, as verification would
+        for _ in election.cast_ballots:
+            pass
+        for _ in election.spoiled_ballots:
+            pass
+        valid = True
+    else:
+        valid = verify_election(election, jobs=args.jobs,
+                                chunk_size=args.chunk_size, batch=args.batch)
+    seconds = perf_counter() - start
+
+    # Linux reports the peak resident set size in kilobytes
+    return {"stage": args.stage, "seconds": seconds, "ballots": ballots,
+            "ballots_per_second": ballots / seconds if seconds else 0.0,
+            "peak_rss_mb": getrusage(RUSAGE_SELF).ru_maxrss / 1024,
+            "valid": valid, "metrics": report()}
+
+
+def measure(args: Namespace, record: str, stage: str) -> Dict[str, Any]:
+    """Runs a stage in a child process, returning the fastest of
+        `args.repeat` runs along with the largest peak memory."""
+    command = [executable, abspath(__file__), record, "--stage", stage,
+               "--jobs", str(args.jobs), "--chunk-size", str(args.chunk_size),
+               "--backend", args.backend]
+    if args.batch:
+        command.append("--batch")
+    if args.lazy_ints:
+        command.append("--lazy-ints")
+    runs: List[Dict[str, Any]] = []
+    for _ in range(args.repeat):
+        result = run(command, capture_output=True, text=True, check=True)
+        runs.append(loads(result.stdout.splitlines()[-1]))
+    best = min(runs, key=lambda r: r["seconds"])
+    best["peak_rss_mb"] = max(r["peak_rss_mb"] for r in runs)
+    return best
+
+
+def main() -> None:
+    """Main point of entry for command line execution."""
+    args = parse_args()
+
+    # Measure a single stage when invoked by the harness itself
+    if args.stage is not None:
+        print(dumps(run_stage(args)))
+        return
+
+    # Generate a deterministic record when none is given
+    cleanup = []
+    record = args.record
+    if record is None:
+        directory = mkdtemp()
+        cleanup.append(directory)
+        record = join(directory, "election.json")
+        start = perf_counter()
+        generate_record(record, ballots=args.ballots, seed=args.seed)
+        print(f"Generated {args.ballots} ballots in "
+              f"{perf_counter() - start:.2f} s")
+    if args.binary:
+        binary_record = f"{record}.egb"
+        write_binary_record(load_election_record(record), binary_record)
+        cleanup.append(binary_record)
+        record = binary_record
+
+    # Run each stage and report its measurements
+    results = [measure(args, record, stage) for stage in STAGES]
+    if args.json:
+        print(dumps({"record": record, "record_bytes": getsize(record),
+                     "backend": args.backend, "jobs": args.jobs,
+                     "batch": args.batch, "stages": results}, indent=2))
+    else:
+        print(f"Record: {record} ({getsize(record) / 2 ** 20:.1f} MB, "
+              f"{results[0]['ballots']} cast ballots)")
+        for result in results:
+            print(f"{result['stage']:<8} {result['seconds']:>9.3f} s "
+                  f"{result['ballots_per_second']:>10.1f} ballots/s "
+                  f"{result['peak_rss_mb']:>9.1f} MB peak RSS"
+                  + ("" if result["valid"] else "  (invalid)"))
+            for name, record in result["metrics"]["stages"].items():
+                print(f"  {name:<18} {record['seconds']:>9.3f} s")
+
+    for path in cleanup:
+        if isdir(path):
+            rmtree(path)
+        elif isfile(path):
+            remove(path)
+
+
+def parse_args() -> Namespace:
+    """Parses, verifies, and returns command line line arguments."""
+    # Configure arguments
+    parser = ArgumentParser(
+            description='Benchmark loading and verifying an election record.')
+    parser.add_argument('record', nargs='?',
+                        help='ElectionGuard results JSON or binary file. A '
+                             'synthetic record is generated when omitted.')
+    parser.add_argument('--ballots', type=int, default=100, metavar='N',
+                        help="Number of ballots in a generated record.")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed of a generated record.")
+    parser.add_argument('--binary', action='store_true',
+                        help="Convert the record to the binary format before "
+                             "measuring.")
+    parser.add_argument('--repeat', type=int, default=1, metavar='N',
+                        help="Number of runs of each stage, reporting the "
+                             "fastest.")
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="Number of worker processes used to verify "
+                             "ballots.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        metavar='N',
+                        help="Number of ballots sent to a worker at a time.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Check proofs as randomized batches.")
+    parser.add_argument('--lazy-ints', action='store_true',
+                        help="Convert the large integers of cast ballots "
+                             "from decimal only when they are first used.")
+    parser.add_argument('--backend', default='auto',
+                        choices=['auto', 'gmpy2', 'python'],
+                        help="Big-integer arithmetic backend.")
+    parser.add_argument('--json', action='store_true',
+                        help="Report the measurements as JSON.")
+    parser.add_argument('--stage', choices=STAGES, help=SUPPRESS)
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Verify arguments
+    if args.record is not None and not isfile(args.record):
+        exit("record is invalid file path")
+    if args.ballots < 1:
+        exit("ballots must be at least 1")
+    if args.repeat < 1:
+        exit("repeat must be at least 1")
+    if args.jobs < 1:
+        exit("jobs must be at least 1")
+    if args.backend != 'auto' and args.backend not in available_backends():
+        exit(f"{args.backend} backend is not available")
+
+    # Return results
+    return args
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,434 @@
+# ElectionGuard Verifier Binary Election Record Format
+# Nicholas Boucher 2020
+#
+# A binary election record holds the same data as the JSON record, laid out
+# so that ballots can be decoded directly from a memory-mapped file:
+#
+#     magic                 8 bytes
+#     header length         u64
+#     header                JSON: hashes, public keys, parameters, tallies
+#     cast ballot count     u64
+#     cast ballot index     u64 offset per ballot, plus the end offset
+#     spoiled ballot count  u64
+#     spoiled ballot index  u64 offset per ballot, plus the end offset
+#     ballots
+#
+# Integers are little-endian. Group elements and exponents are stored at the
+# fixed width of the prime modulus, cleartexts as i64s, and strings as a u32
+# length and UTF-8 bytes.
+from typing import (Any, BinaryIO, Callable, Generic, Iterable, Iterator,
+                    List, Tuple, TypeVar)
+from hashlib import sha256
+from json import dumps, loads
+from mmap import mmap, ACCESS_READ
+from struct import Struct, error as StructError
+from constants import BYTE_ORDER, PRIME
+from metrics import counters
+from models import (BallotDecryption, BallotInformation, ChaumPedersonProof,
+                    DecryptionFragment, DecryptionShare, ElectionParameters,
+                    ElGamalMessage, EncryptedBallot, EncryptedContest,
+                    EncryptedSelection, SelectionDecryption, TallyDecryption,
+                    TrusteePublicKey, from_int, from_list, from_str)
+
+
+T = TypeVar("T")
+
+# Identifies a binary election record file
+MAGIC = b"EGREC1\n\0"
+
+# Width in bytes of a stored group element or exponent
+ELEMENT_SIZE = (PRIME.bit_length() + 7) // 8
+
+# Marks a decryption share without fragments
+NO_FRAGMENTS = 0xFFFFFFFF
+
+_U32 = Struct("<I")
+_U64 = Struct("<Q")
+_I64 = Struct("<q")
+
+
+def is_binary_record(path: str) -> bool:
+    """Returns true when the file at `path` is a binary election record."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class _Writer:
+    """Encodes election record values to a file."""
+    file: BinaryIO
+
+    def __init__(self, file: BinaryIO) -> None:
+        self.file = file
+
+    def u32(self, value: int) -> None:
+        try:
+            self.file.write(_U32.pack(value))
+        except StructError:
+            raise ValueError("Integer does not fit in an unsigned 4-byte "
+                             f"field: {value}")
+
+    def u64(self, value: int) -> None:
+        self.file.write(_U64.pack(value))
+
+    def i64(self, value: int) -> None:
+        try:
+            self.file.write(_I64.pack(value))
+        except StructError:
+            raise ValueError("Integer does not fit in a signed 8-byte "
+                             f"field: {value}")
+
+    def element(self, value: int) -> None:
+        try:
+            self.file.write(int(value).to_bytes(ELEMENT_SIZE, BYTE_ORDER))
+        except OverflowError:
+            raise ValueError(f"Integer does not fit in {ELEMENT_SIZE} bytes: "
+                             f"{value}")
+
+    def string(self, value: str) -> None:
+        data = value.encode()
+        self.u32(len(data))
+        self.file.write(data)
+
+    def ballot_info(self, info: BallotInformation) -> None:
+        for value in (info.date, info.device_info, info.time, info.tracker):
+            self.string(value)
+
+    def message(self, message: ElGamalMessage) -> None:
+        self.element(message.ciphertext)
+        self.element(message.public_key)
+
+    def proof(self, proof: ChaumPedersonProof) -> None:
+        self.element(proof.challenge)
+        self.message(proof.committment)
+        self.element(proof.response)
+
+    def encrypted_ballot(self, ballot: EncryptedBallot) -> None:
+        self.ballot_info(ballot.ballot_info)
+        self.u32(len(ballot.contests))
+        for index, contest in enumerate(ballot.contests):
+            try:
+                self.u32(contest.max_selections)
+            except ValueError as e:
+                raise ValueError(f"Ballot {ballot.ballot_info.tracker}, "
+                                 f"contest {index}: Invalid maximum number "
+                                 f"of selections. {e}")
+            self.proof(contest.num_selections_proof)
+            self.u32(len(contest.selections))
+            for selection in contest.selections:
+                self.message(selection.message)
+                self.proof(selection.one_proof)
+                self.proof(selection.zero_proof)
+
+    def ballot_decryption(self, ballot: BallotDecryption) -> None:
+        self.ballot_info(ballot.ballot_info)
+        self.u32(len(ballot.contests))
+        for contest in ballot.contests:
+            self.u32(len(contest))
+            for selection in contest:
+                self.i64(selection.cleartext)
+                self.element(selection.decrypted_message)
+                self.message(selection.encrypted_message)
+                self.u32(len(selection.shares))
+                for share in selection.shares:
+                    self.element(share.share)
+                    self.proof(share.proof)
+                    if share.fragments is None:
+                        self.u32(NO_FRAGMENTS)
+                        continue
+                    self.u32(len(share.fragments))
+                    for fragment in share.fragments:
+                        self.element(fragment.fragment)
+                        self.element(fragment.lagrange_coefficient)
+                        self.proof(fragment.proof)
+                        self.u32(fragment.trustee_index)
+
+
+class _Digest:
+    """A file for `_Writer` which hashes everything written to it."""
+    hash: Any
+
+    def __init__(self) -> None:
+        self.hash = sha256()
+
+    def write(self, data: bytes) -> None:
+        self.hash.update(data)
+
+
+def encrypted_ballot_digest(ballot: EncryptedBallot) -> str:
+    """Returns the hex SHA-256 digest of the binary encoding of `ballot`,
+        which is the same whichever record format the ballot was read
+        from."""
+    digest = _Digest()
+    _Writer(digest).encrypted_ballot(ballot)
+    return digest.hash.hexdigest()
+
+
+def ciphertext_digest(ballot: EncryptedBallot) -> str:
+    """Returns the hex SHA-256 digest of the binary encoding of the encrypted
+        selections of `ballot` alone, which is shared by every replay of the
+        ballot's ciphertexts under another tracker."""
+    digest = _Digest()
+    writer = _Writer(digest)
+    for contest in ballot.contests:
+        for selection in contest.selections:
+            writer.message(selection.message)
+    return digest.hash.hexdigest()
+
+
+class _Reader:
+    """Decodes election record values from a buffer, starting at `pos`."""
+    data: memoryview
+    pos: int
+
+    def __init__(self, data: memoryview, pos: int) -> None:
+        self.data = data
+        self.pos = pos
+
+    def u32(self) -> int:
+        value = _U32.unpack_from(self.data, self.pos)[0]
+        self.pos += 4
+        return value
+
+    def u64(self) -> int:
+        value = _U64.unpack_from(self.data, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def i64(self) -> int:
+        value = _I64.unpack_from(self.data, self.pos)[0]
+        self.pos += 8
+        return value
+
+    def element(self) -> int:
+        end = self.pos + ELEMENT_SIZE
+        value = int.from_bytes(self.data[self.pos:end], BYTE_ORDER)
+        self.pos = end
+        return value
+
+    def string(self) -> str:
+        length = self.u32()
+        value = str(self.data[self.pos:self.pos + length], 'utf-8')
+        self.pos += length
+        return value
+
+    def ballot_info(self) -> BallotInformation:
+        return BallotInformation(self.string(), self.string(), self.string(),
+                                 self.string())
+
+    def message(self) -> ElGamalMessage:
+        return ElGamalMessage(self.element(), self.element())
+
+    def proof(self) -> ChaumPedersonProof:
+        return ChaumPedersonProof(self.element(), self.message(),
+                                  self.element())
+
+    def encrypted_ballot(self) -> EncryptedBallot:
+        ballot_info = self.ballot_info()
+        contests = []
+        for _ in range(self.u32()):
+            max_selections = self.u32()
+            proof = self.proof()
+            selections = [EncryptedSelection(self.message(), self.proof(),
+                                             self.proof())
+                          for _ in range(self.u32())]
+            contests.append(EncryptedContest(max_selections, proof,
+                                             selections))
+        return EncryptedBallot(ballot_info, contests)
+
+    def ballot_decryption(self) -> BallotDecryption:
+        ballot_info = self.ballot_info()
+        contests = []
+        for _ in range(self.u32()):
+            selections = []
+            for _ in range(self.u32()):
+                cleartext = self.i64()
+                decrypted_message = self.element()
+                encrypted_message = self.message()
+                shares = []
+                for _ in range(self.u32()):
+                    share = self.element()
+                    proof = self.proof()
+                    count = self.u32()
+                    fragments = None
+                    if count != NO_FRAGMENTS:
+                        fragments = [DecryptionFragment(self.element(),
+                                                        self.element(),
+                                                        self.proof(),
+                                                        self.u32())
+                                     for _ in range(count)]
+                    shares.append(DecryptionShare(fragments, proof, share))
+                selections.append(SelectionDecryption(cleartext,
+                                                      decrypted_message,
+                                                      encrypted_message,
+                                                      shares))
+            contests.append(selections)
+        return BallotDecryption(ballot_info, contests)
+
+
+class BinaryBallots(Generic[T]):
+    """The ballots stored in one section of a binary election record. Ballots
+    are decoded from the mapped file only when they are accessed.
+    """
+    data: memoryview
+    """The position of the section's offset index in the file."""
+    index: int
+    length: int
+    decode: Callable[[_Reader], T]
+
+    def __init__(self, data: memoryview, index: int, length: int,
+                 decode: Callable[[_Reader], T]) -> None:
+        self.data = data
+        self.index = index
+        self.length = length
+        self.decode = decode
+
+    def __len__(self) -> int:
+        return self.length
+
+    def offset(self, position: int) -> int:
+        """Returns the file offset of the ballot at `position`."""
+        return _U64.unpack_from(self.data, self.index + 8 * position)[0]
+
+    def __getitem__(self, position: int) -> T:
+        if not 0 <= position < self.length:
+            raise IndexError(position)
+        offset = self.offset(position)
+        counters["bytes_parsed"] += self.offset(position + 1) - offset
+        return self.decode(_Reader(self.data, offset))
+
+    def __iter__(self) -> Iterator[T]:
+        return self.iter_from(0)
+
+    def iter_from(self, start: int) -> Iterator[T]:
+        """Iterates over the ballots from position `start` onwards."""
+        for position in range(start, self.length):
+            yield self[position]
+
+    def iter_positions(self, positions: Iterable[int]) -> Iterator[T]:
+        """Iterates over the ballots at `positions`, decoding only those."""
+        for position in positions:
+            yield self[position]
+
+    def iter_located(self, start: int = 0) -> Iterator[Tuple[int, T]]:
+        """Iterates over the file offset and decoding of each ballot from
+            position `start` onwards."""
+        for position in range(start, self.length):
+            yield self.offset(position), self[position]
+
+    def iter_digests(self) -> Iterator[Tuple[str, str]]:
+        """Iterates over the tracker and the hex SHA-256 digest of the
+            encoding of each ballot, without decoding the ballots."""
+        for position in range(self.length):
+            offset = self.offset(position)
+            end = self.offset(position + 1)
+            tracker = _Reader(self.data, offset).ballot_info().tracker
+            yield tracker, sha256(self.data[offset:end]).hexdigest()
+
+
+class BinaryElectionRecord:
+    """An election record read from a memory-mapped binary record file.
+    Provides the same fields as `ElectionRecord`.
+    """
+    base_hash: str
+    cast_ballots: BinaryBallots[EncryptedBallot]
+    contest_tallies: List[List[TallyDecryption]]
+    extended_base_hash: str
+    joint_public_key: int
+    parameters: ElectionParameters
+    spoiled_ballots: BinaryBallots[BallotDecryption]
+    trustee_public_keys: List[List[TrusteePublicKey]]
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            self._map = mmap(f.fileno(), 0, access=ACCESS_READ)
+        data = memoryview(self._map)
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a binary election record.")
+
+        # Parse the header
+        reader = _Reader(data, len(MAGIC))
+        length = reader.u64()
+        header = loads(bytes(data[reader.pos:reader.pos + length]))
+        counters["bytes_parsed"] += length
+        reader.pos += length
+        self.base_hash = from_str(header.get("base_hash"))
+        self.contest_tallies = from_list(
+            lambda x: from_list(TallyDecryption.from_dict, x),
+            header.get("contest_tallies"))
+        self.extended_base_hash = from_str(header.get("extended_base_hash"))
+        self.joint_public_key = from_int(header.get("joint_public_key"))
+        self.parameters = ElectionParameters.from_dict(
+            header.get("parameters"))
+        self.trustee_public_keys = from_list(
+            lambda x: from_list(TrusteePublicKey.from_dict, x),
+            header.get("trustee_public_keys"))
+
+        # Locate the ballot sections
+        count = reader.u64()
+        self.cast_ballots = BinaryBallots(data, reader.pos, count,
+                                          _Reader.encrypted_ballot)
+        reader.pos += 8 * (count + 1)
+        count = reader.u64()
+        self.spoiled_ballots = BinaryBallots(data, reader.pos, count,
+                                             _Reader.ballot_decryption)
+
+
+def read_binary_ballot(path: str, offset: int) -> EncryptedBallot:
+    """Decodes the single cast ballot at file `offset` of the binary record
+        file at `path`."""
+    with open(path, 'rb') as f:
+        data = mmap(f.fileno(), 0, access=ACCESS_READ)
+    view = memoryview(data)
+    try:
+        reader = _Reader(view, offset)
+        ballot = reader.encrypted_ballot()
+        counters["bytes_parsed"] += reader.pos - offset
+        return ballot
+    finally:
+        view.release()
+        data.close()
+
+
+def write_binary_record(election: Any, path: str) -> None:
+    """Writes `election`, an `ElectionRecord` or a streamed record, to a binary
+        election record file at `path`."""
+    with open(path, 'wb') as f:
+        writer = _Writer(f)
+        f.write(MAGIC)
+        header = dumps({
+            "base_hash": election.base_hash,
+            "contest_tallies": [[tally.to_dict() for tally in contest]
+                                for contest in election.contest_tallies],
+            "extended_base_hash": election.extended_base_hash,
+            "joint_public_key": election.joint_public_key,
+            "parameters": election.parameters.to_dict(),
+            "trustee_public_keys": [[key.to_dict() for key in trustee]
+                                    for trustee in
+                                    election.trustee_public_keys],
+        }).encode()
+        writer.u64(len(header))
+        f.write(header)
+
+        # Reserve each section's offset index ahead of the ballots
+        sections = ((election.cast_ballots, _Writer.encrypted_ballot),
+                    (election.spoiled_ballots, _Writer.ballot_decryption))
+        indexes = []
+        for ballots, _ in sections:
+            writer.u64(len(ballots))
+            indexes.append(f.tell())
+            f.write(bytes(8 * (len(ballots) + 1)))
+
+        # Write the ballots, then fill in the offset indexes
+        offsets: List[List[int]] = []
+        for ballots, encode in sections:
+            section = []
+            for ballot in ballots:
+                section.append(f.tell())
+                encode(writer, ballot)
+            section.append(f.tell())
+            if len(section) != len(ballots) + 1:
+                raise ValueError("Ballot count changed while writing.")
+            offsets.append(section)
+        for index, section in zip(indexes, offsets):
+            f.seek(index)
+            f.write(b"".join(_U64.pack(offset) for offset in section))
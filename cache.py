@@ -0,0 +1,142 @@
+# ElectionGuard Verifier Result Cache
+# Nicholas Boucher 2020
+from typing import Any, List, Optional, Tuple
+from hashlib import sha256
+from json import JSONDecodeError, dumps, loads
+from os import getpid, makedirs, remove, replace, scandir, utime
+from os.path import abspath, dirname, isfile, join
+from constants import GENERATOR, PRIME, SUBGROUP_ORDER
+from findings import Finding
+from tally import TallyAccumulator
+
+# Modules whose code decides the results of the checks or how they are
+# cached and keyed
+CHECK_MODULES = ("arithmetic", "batch", "binary", "cache", "constants",
+                 "decryption", "findings", "fixedbase", "keyceremony",
+                 "loader", "membership", "models", "proofs", "tally",
+                 "utils", "verify")
+
+
+def _source_version() -> str:
+    """Returns the digest of the source of `CHECK_MODULES`."""
+    digest = sha256()
+    for module in CHECK_MODULES:
+        with open(join(dirname(abspath(__file__)), f"{module}.py"),
+                  'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Version of the verifier's checks and of the cached results, which changes
+# with any edit to their source. Results cached by another version are never
+# reused.
+CACHE_VERSION = _source_version()
+
+# Default bound on the total size of the cache in bytes
+DEFAULT_CACHE_SIZE = 1 << 30
+
+
+def content_digest(value: Any) -> str:
+    """Returns the hex SHA-256 digest of `value`, which is built from JSON
+        values, integers and record models."""
+    return sha256(dumps(value, default=_encode_model,
+                        separators=(',', ':')).encode()).hexdigest()
+
+
+def _encode_model(value: Any) -> Any:
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return int(value)
+
+
+def _encode_result(value: Any) -> Any:
+    if isinstance(value, Finding):
+        return {"finding": value.to_dict()}
+    if isinstance(value, TallyAccumulator):
+        return {"tally": value.to_dict()}
+    return int(value)
+
+
+def _decode_result(obj: dict) -> Any:
+    if "finding" in obj:
+        return Finding.from_dict(obj["finding"])
+    if "tally" in obj:
+        return TallyAccumulator.from_dict(obj["tally"])
+    return obj
+
+
+class ResultCache:
+    """A directory of verification results, each stored under a key derived
+    from everything the result depends on, so that a result is reused
+    whenever the same inputs are checked again. Reading a result marks it as
+    recently used, and the least recently used results are evicted once the
+    cache grows beyond its size bound. Results are findings and tallies,
+    possibly within lists and tuples; tuples are returned as lists.
+    """
+    """The directory holding the cached results."""
+    directory: str
+    """The bound on the total size of the cached results in bytes."""
+    max_bytes: int
+
+    def __init__(self, directory: str,
+                 max_bytes: int = DEFAULT_CACHE_SIZE) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """Returns the key of the result computed from `parts`, which also
+            depends on the cache version and the group constants."""
+        return content_digest([CACHE_VERSION, PRIME, GENERATOR,
+                               SUBGROUP_ORDER, *parts])
+
+    def _path(self, key: str) -> str:
+        return join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the result stored under `key`, or None if there is none."""
+        path = self._path(key)
+        if not isfile(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                result = loads(f.read(), object_hook=_decode_result)
+        except (OSError, JSONDecodeError):
+            # The result was evicted or is being replaced by another process
+            return None
+        try:
+            utime(path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key: str, result: Any) -> None:
+        """Stores `result` under `key`, replacing it in a single step so that
+            concurrent readers never see a partial result."""
+        path = self._path(key)
+        makedirs(join(self.directory, key[:2]), exist_ok=True)
+        with open(f"{path}.{getpid()}.tmp", 'w') as f:
+            f.write(dumps(result, default=_encode_result))
+        replace(f"{path}.{getpid()}.tmp", path)
+
+    def prune(self) -> None:
+        """Evicts the least recently used results until the cache is within
+            its size bound."""
+        entries: List[Tuple[float, int, str]] = []
+        for directory in scandir(self.directory):
+            if not directory.is_dir():
+                continue
+            for entry in scandir(directory.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                remove(path)
+            except OSError:
+                pass
+            total -= size
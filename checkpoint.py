@@ -0,0 +1,80 @@
+# ElectionGuard Verifier Checkpoints
+# Nicholas Boucher 2020
+from typing import Any, List, Optional
+from hashlib import sha256
+from json import dump, load
+from os import replace
+from os.path import isfile
+from findings import Finding
+from tally import TallyAccumulator
+
+# Minimum number of seconds between checkpoints written during verification
+CHECKPOINT_INTERVAL = 60
+
+# Number of bytes hashed at a time when computing a file digest
+DIGEST_READ_SIZE = 1 << 20
+
+
+def file_digest(path: str) -> str:
+    """Returns the hex SHA-256 digest of the file at `path`."""
+    digest = sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(DIGEST_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """The progress of a verification of an election record file, from which
+    an interrupted verification can resume.
+    """
+    """The digest of the election record file being verified."""
+    digest: str
+    """The number of cast ballots whose checks are complete, all of which
+    precede any ballot still to be checked.
+    """
+    cast_ballots_done: int
+    """The findings reported for the completed cast ballots."""
+    failures: List[Finding]
+    """The tally accumulated from the completed cast ballots."""
+    tally: TallyAccumulator
+
+    def __init__(self, digest: str, cast_ballots_done: int,
+                 failures: List[Finding], tally: TallyAccumulator) -> None:
+        self.digest = digest
+        self.cast_ballots_done = cast_ballots_done
+        self.failures = failures
+        self.tally = tally
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'Checkpoint':
+        assert isinstance(obj, dict)
+        return Checkpoint(obj["digest"], obj["cast_ballots_done"],
+                          [Finding.from_dict(failure)
+                           for failure in obj["failures"]],
+                          TallyAccumulator.from_dict(obj["tally"]))
+
+    def to_dict(self) -> dict:
+        return {"digest": self.digest,
+                "cast_ballots_done": self.cast_ballots_done,
+                "failures": [failure.to_dict()
+                             for failure in self.failures],
+                "tally": self.tally.to_dict()}
+
+
+def load_checkpoint(path: str, digest: str) -> Optional[Checkpoint]:
+    """Returns the checkpoint stored at `path`, or None if there is none for
+        the record file with `digest`."""
+    if not isfile(path):
+        return None
+    with open(path, 'r') as f:
+        checkpoint = Checkpoint.from_dict(load(f))
+    return checkpoint if checkpoint.digest == digest else None
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint) -> None:
+    """Stores `checkpoint` at `path`, replacing any previous checkpoint in a
+        single step so that an interruption cannot leave a partial file."""
+    with open(f"{path}.tmp", 'w') as f:
+        dump(checkpoint.to_dict(), f, default=int)
+    replace(f"{path}.tmp", path)
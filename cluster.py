@@ -0,0 +1,248 @@
+# ElectionGuard Verifier Cluster Coordinator
+# Nicholas Boucher 2020
+#
+# A coordinator verifies the ballots of a record across worker nodes, each
+# holding its own copy of the record file. Nodes connect to the coordinator
+# and exchange JSON messages, each preceded by its length as a u32:
+#
+#     node:        {"type": "hello", "digest": record file digest}
+#     coordinator: {"type": "shard", "id": n, "kind": "cast" | "spoiled",
+#                   "start": first ballot, "stop": end ballot,
+#                   "setup": values the checks depend on}
+#     node:        {"type": "result", "id": n, "findings": [...],
+#                   "tally": cast ballot tally or null}
+#     coordinator: {"type": "done"}
+#
+# Shards are contiguous ranges of ballots. Results are merged in shard order,
+# so the findings and tally match those of a single-node verification. A
+# node which stays silent for longer than the coordinator's timeout is
+# treated as disconnected.
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from collections import deque
+from json import dumps, loads
+from selectors import EVENT_READ, DefaultSelector
+from socket import create_server, socket
+from struct import Struct
+from time import monotonic
+from constants import PRIME
+from findings import Finding
+from tally import TallyAccumulator
+
+# Default number of ballots in a shard
+DEFAULT_SHARD_SIZE = 256
+
+# Number of shards assigned to a node at a time, so that a node always has
+# a shard to start on when it finishes one
+SHARDS_PER_NODE = 2
+
+# Default number of seconds a node may take to greet the coordinator or to
+# answer its oldest outstanding shard
+DEFAULT_NODE_TIMEOUT = 600.0
+
+_LENGTH = Struct("<I")
+
+
+def send_message(connection: socket, message: Dict[str, Any]) -> None:
+    """Sends `message` as a length-prefixed JSON message."""
+    data = dumps(message, default=int).encode()
+    connection.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _receive_exactly(connection: socket, size: int) -> Optional[bytes]:
+    data = b""
+    while len(data) < size:
+        try:
+            block = connection.recv(size - len(data))
+        except OSError:
+            # The connection was reset
+            return None
+        if not block:
+            return None
+        data += block
+    return data
+
+
+def receive_message(connection: socket) -> Optional[Dict[str, Any]]:
+    """Receives a length-prefixed JSON message, or returns None when the
+        connection has closed or the message is not a JSON object."""
+    header = _receive_exactly(connection, _LENGTH.size)
+    if header is None:
+        return None
+    data = _receive_exactly(connection, _LENGTH.unpack(header)[0])
+    if data is None:
+        return None
+    try:
+        message = loads(data)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
+
+
+def _parse_result(message: Optional[Dict[str, Any]], kind: str,
+                  shards: Deque[int], ranges: Dict[int, Tuple[int, int]]
+                  ) -> Any:
+    """Returns the findings of a result message for one of `shards`, along
+        with the tally for cast ballots, or None if the message is not a
+        valid result for one of them. The findings must lie within the
+        shard's range of ballots in `ranges`, and the tally must cover
+        exactly those ballots."""
+    if message is None or message.get("type") != "result" \
+            or message.get("id") not in shards:
+        return None
+    start, stop = ranges[message["id"]]
+    try:
+        findings = [Finding.from_dict(finding)
+                    for finding in message["findings"]]
+        if not all(isinstance(finding.ballot, int)
+                   and start <= finding.ballot < stop
+                   for finding in findings):
+            return None
+        if kind != "cast":
+            return findings
+        tally = TallyAccumulator.from_dict(message["tally"])
+        products = [product for row in tally.products for product in row]
+        if tally.prime != PRIME or tally.count != stop - start or \
+                not all(len(product) == 2 and
+                        all(isinstance(value, int) and 0 <= value < PRIME
+                            for value in product) for product in products):
+            return None
+        return findings, tally
+    except (AssertionError, KeyError, TypeError, ValueError):
+        return None
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """Parses a `host:port` address."""
+    host, _, port = address.rpartition(":")
+    return host, int(port)
+
+
+class Coordinator:
+    """Assigns shards of ballots to the connected worker nodes and collects
+    their results in order. A node which disconnects, breaks the protocol
+    or times out has its outstanding shards reassigned to the others.
+    """
+    server: socket
+    """The digest of the record file every node must hold."""
+    digest: str
+    """The number of seconds a node may stay silent while it has shards
+    outstanding.
+    """
+    timeout: float
+    nodes: List[socket]
+
+    def __init__(self, address: Tuple[str, int], digest: str,
+                 timeout: float = DEFAULT_NODE_TIMEOUT) -> None:
+        self.server = create_server(address)
+        self.digest = digest
+        self.timeout = timeout
+        self.nodes = []
+
+    def accept(self, count: int) -> None:
+        """Waits until `count` nodes holding the record file have
+            connected."""
+        while len(self.nodes) < count:
+            connection, _ = self.server.accept()
+            # A timed out receive or send raises an OSError, which is
+            # treated as a disconnect
+            connection.settimeout(self.timeout)
+            hello = receive_message(connection)
+            if hello is None or hello.get("digest") != self.digest:
+                connection.close()
+                continue
+            self.nodes.append(connection)
+
+    def map_shards(self, kind: str, first: int, stop: int,
+                   setup: Dict[str, Any], shard_size: int) -> Iterator[Any]:
+        """Verifies the `kind` ballots from index `first` up to `stop` in
+            shards of `shard_size` ballots, yielding the findings of each
+            shard in order, along with the tally for cast ballots."""
+        shards: Deque[Tuple[int, int, int]] = deque(
+            (shard, start, min(start + shard_size, stop))
+            for shard, start in enumerate(range(first, stop, shard_size)))
+        assigned: Dict[socket, Deque[int]] = {node: deque()
+                                              for node in self.nodes}
+        ranges = {shard: (start, end) for shard, start, end in shards}
+        # The time by which each node must next answer
+        deadlines: Dict[socket, float] = {}
+        results: Dict[int, Any] = {}
+        following = 0
+        selector = DefaultSelector()
+        for node in self.nodes:
+            selector.register(node, EVENT_READ)
+
+        def assign(node: socket) -> None:
+            if not assigned[node]:
+                deadlines[node] = monotonic() + self.timeout
+            while len(assigned[node]) < SHARDS_PER_NODE and shards:
+                shard, start, end = shards.popleft()
+                assigned[node].append(shard)
+                try:
+                    send_message(node, {"type": "shard", "id": shard,
+                                        "kind": kind, "start": start,
+                                        "stop": end, "setup": setup})
+                except OSError:
+                    drop(node)
+                    return
+
+        def drop(node: socket) -> None:
+            # Reassign the shards of a disconnected node
+            selector.unregister(node)
+            self.nodes.remove(node)
+            deadlines.pop(node, None)
+            for shard in reversed(assigned.pop(node)):
+                shards.appendleft((shard, *ranges[shard]))
+            node.close()
+            for other in list(self.nodes):
+                if other in assigned:
+                    assign(other)
+
+        try:
+            for node in list(self.nodes):
+                if node in assigned:
+                    assign(node)
+            while following < len(ranges):
+                # Yield the results which are next in order
+                if following in results:
+                    yield results.pop(following)
+                    following += 1
+                    continue
+                if not self.nodes:
+                    raise RuntimeError("Every worker node has disconnected.")
+                waiting = [deadlines[node] for node in self.nodes
+                           if assigned.get(node)]
+                timeout = (max(min(waiting) - monotonic(), 0)
+                           if waiting else None)
+                for key, _ in selector.select(timeout):
+                    node = key.fileobj
+                    if node not in assigned:
+                        continue
+                    message = receive_message(node)
+                    result = _parse_result(message, kind, assigned[node],
+                                           ranges)
+                    if result is None:
+                        # The node has disconnected or sent an invalid result
+                        drop(node)
+                        continue
+                    results[message["id"]] = result
+                    assigned[node].remove(message["id"])
+                    deadlines[node] = monotonic() + self.timeout
+                    assign(node)
+
+                # Drop the nodes which have not answered in time
+                for node in list(self.nodes):
+                    if assigned.get(node) and monotonic() > deadlines[node]:
+                        drop(node)
+        finally:
+            selector.close()
+
+    def close(self) -> None:
+        """Releases the nodes and stops listening."""
+        for node in self.nodes:
+            try:
+                send_message(node, {"type": "done"})
+            except OSError:
+                pass
+            node.close()
+        self.nodes = []
+        self.server.close()
@@ -2,12 +2,27 @@
 # ElectionGuard Command Line Verifier Utility
 # Nicholas Boucher 2020
 from argparse import ArgumentParser, Namespace
+from cProfile import Profile
+from json import dump
+import tracemalloc
 from os.path import isfile
 from logging import basicConfig, getLogger
-from verify import verify_election
-from models import election_record_from_dict
-from json import loads
-from constants import LOG_VERBOSE, LOG_NORMAL
+from verify import (compute_extended_base_hash, verify_ballot_chunk,
+                    verify_election, DEFAULT_CHUNK_SIZE)
+from loader import load_election_record
+from binary import write_binary_record
+from checkpoint import file_digest
+from cache import DEFAULT_CACHE_SIZE
+from cluster import (DEFAULT_NODE_TIMEOUT, DEFAULT_SHARD_SIZE, Coordinator,
+                     parse_address)
+from arithmetic import available_backends, backend_name, set_backend
+from metrics import report, stage
+from findings import FindingsReport
+from proofs import ProofContext
+from trackers import build_index, lookup_ballots, open_index
+from sampling import DEFAULT_CONFIDENCE
+from constants import (GENERATOR, LOG_VERBOSE, LOG_NORMAL, PRIME,
+                       SUBGROUP_ORDER)
 
 
 def main() -> None:
@@ -23,16 +38,117 @@ def main() -> None:
     else:
         log.setLevel(LOG_NORMAL)
 
-    # Deserialize election data JSON
-    with open(args.election_data, 'r') as f:
-        election = election_record_from_dict(loads(f.read()))
+    # Select the big-integer arithmetic backend
+    set_backend(args.backend)
+
+    # Start the optional profilers
+    if args.tracemalloc:
+        tracemalloc.start()
+    profiler = None
+    if args.profile is not None:
+        profiler = Profile()
+        profiler.enable()
+
+    # Verify only the cast ballots with a tracker, located by the tracker
+    # index rather than by reading the record
+    index_path = f"{args.election_data}.trackers"
+    if args.lookup is not None:
+        with stage("lookup"):
+            index = open_index(args.election_data, index_path)
+            ballots = lookup_ballots(index, args.election_data, args.lookup)
+            ctx = ProofContext(PRIME, GENERATOR, SUBGROUP_ORDER,
+                               index.joint_public_key,
+                               index.extended_base_hash, batch=args.batch)
+            index.close()
+        if not ballots:
+            log.log(LOG_NORMAL, f"No cast ballot has tracker {args.lookup}.")
+        findings = FindingsReport(args.findings)
+        for ballot_index, ballot in ballots:
+            failures, _ = verify_ballot_chunk(ctx, ballot_index, [ballot])
+            for failure in failures:
+                findings.add(failure)
+            log.log(LOG_NORMAL, f"Cast ballot {ballot_index} "
+                                f"({args.lookup}): "
+                                f"{'Invalid' if failures else 'Valid'}.")
+        if len(ballots) > 1:
+            log.log(LOG_NORMAL, f"Tracker {args.lookup} is used by "
+                                f"{len(ballots)} cast ballots.")
+        findings.close()
+        return
+
+    # Deserialize election data, streaming ballots from the file
+    with stage("load"):
+        election = load_election_record(args.election_data,
+                                        lazy_ints=args.lazy_ints)
+
+    # Convert the election data to a binary record instead of verifying
+    if args.convert is not None:
+        write_binary_record(election, args.convert)
+        log.log(LOG_NORMAL, f"Binary election record written to "
+                            f"{args.convert}.")
+        return
+
+    # Index the cast ballots by tracker instead of verifying, reporting
+    # duplicated trackers and replayed ciphertexts
+    if args.index:
+        with stage("index"):
+            duplicates = build_index(election, args.election_data,
+                                     index_path,
+                                     compute_extended_base_hash(election))
+        findings = FindingsReport(args.findings)
+        for duplicate in duplicates:
+            findings.add(duplicate)
+        findings.close()
+        log.log(LOG_NORMAL, f"Tracker index written to {index_path}, with "
+                            f"{len(duplicates)} duplicate cast ballots.")
+        return
 
     # Verify the election results
-    if verify_election(election):
+    table_path = f"{args.election_data}.tables" if args.tables else None
+    dlog_path = f"{args.election_data}.dlog" if args.tables else None
+    checkpoint_path = digest = None
+    if args.checkpoint or args.resume:
+        checkpoint_path = f"{args.election_data}.checkpoint"
+    if (checkpoint_path is not None or args.cache is not None
+            or args.listen is not None):
+        digest = file_digest(args.election_data)
+    cluster = None
+    if args.listen is not None:
+        cluster = Coordinator(parse_address(args.listen), digest,
+                              args.node_timeout)
+        log.log(LOG_NORMAL, f"Waiting for {args.nodes} worker nodes on "
+                            f"{args.listen}.")
+        cluster.accept(args.nodes)
+    valid = verify_election(election, jobs=args.jobs,
+                            chunk_size=args.chunk_size, table_path=table_path,
+                            batch=args.batch, dlog_path=dlog_path,
+                            checkpoint_path=checkpoint_path, digest=digest,
+                            resume=args.resume, keep_going=args.keep_going,
+                            findings_path=args.findings,
+                            state_path=args.incremental,
+                            cache_path=args.cache,
+                            cache_size=args.cache_size * 2 ** 20,
+                            cluster=cluster, shard_size=args.shard_size,
+                            sample=args.sample, seed=args.seed,
+                            confidence=args.confidence)
+    if cluster is not None:
+        cluster.close()
+    if valid:
         log.log(LOG_NORMAL, "Election Valid.")
     else:
         log.log(LOG_NORMAL, "Election Invalid.")
 
+    # Write out the instrumentation
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    if args.metrics_json is not None:
+        metrics = report()
+        metrics.update({"valid": valid, "backend": backend_name(),
+                        "jobs": args.jobs, "batch": args.batch})
+        with open(args.metrics_json, 'w') as f:
+            dump(metrics, f, indent=2)
+
 
 def parse_args() -> Namespace:
     """Parses, verifies, and returns command line line arguments."""
@@ -40,9 +156,100 @@ def parse_args() -> Namespace:
     parser = ArgumentParser(
             description='Verify ElectionGuard Elections Results.')
     parser.add_argument('election_data',
-                        help='ElectionGuard results JSON file.')
+                        help='ElectionGuard results JSON or binary file.')
     parser.add_argument('--verbose', '-v', action='store_true',
                         help="Verbose output.")
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="Number of worker processes used to verify "
+                             "ballots.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        metavar='N',
+                        help="Number of ballots sent to a worker at a time.")
+    parser.add_argument('--tables', action='store_true',
+                        help="Save fixed-base exponentiation and discrete log "
+                             "tables alongside the election data and reuse "
+                             "them on later runs.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Check the proofs in each chunk of ballots "
+                             "together as a randomized batch.")
+    parser.add_argument('--backend', default='auto',
+                        choices=['auto', 'gmpy2', 'python'],
+                        help="Big-integer arithmetic backend. Defaults to "
+                             "gmpy2 when it is installed.")
+    parser.add_argument('--lazy-ints', action='store_true',
+                        help="Convert the large integers of cast ballots "
+                             "from decimal only when they are first used.")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="Periodically save progress through the cast "
+                             "ballots alongside the election data.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue from the last saved checkpoint for "
+                             "the election data, if there is one. Implies "
+                             "--checkpoint.")
+    parser.add_argument('--incremental', metavar='PATH',
+                        help="Check only the cast ballots which are new or "
+                             "changed since the verification state saved at "
+                             "PATH, then update the state.")
+    parser.add_argument('--cache', metavar='DIR',
+                        help="Reuse verification results cached in DIR for "
+                             "unchanged records and parts of records.")
+    parser.add_argument('--cache-size', type=int,
+                        default=DEFAULT_CACHE_SIZE // 2 ** 20, metavar='MB',
+                        help="Size bound of the cache, beyond which the "
+                             "least recently used results are evicted.")
+    parser.add_argument('--listen', metavar='HOST:PORT',
+                        help="Coordinate worker nodes connecting to "
+                             "HOST:PORT, which verify the ballots in "
+                             "shards. See worker.py.")
+    parser.add_argument('--nodes', type=int, default=1, metavar='N',
+                        help="Number of worker nodes to wait for.")
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE,
+                        metavar='N',
+                        help="Number of ballots assigned to a node at a "
+                             "time.")
+    parser.add_argument('--node-timeout', type=float,
+                        default=DEFAULT_NODE_TIMEOUT, metavar='SECONDS',
+                        help="Seconds a worker node may take to answer "
+                             "before its shards are reassigned.")
+    parser.add_argument('--keep-going', action='store_true',
+                        help="Run every check rather than stopping after "
+                             "the first stage with a failure.")
+    parser.add_argument('--findings', metavar='PATH',
+                        help="Write each failed check as a line of JSON to "
+                             "PATH.")
+    parser.add_argument('--metrics-json', metavar='PATH',
+                        help="Write stage timings and operation counts as "
+                             "JSON to PATH.")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Profile verification with cProfile, writing "
+                             "the statistics to PATH.")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Trace memory allocations, recording the peak "
+                             "traced memory of each stage in the metrics.")
+    parser.add_argument('--convert', metavar='OUTPUT',
+                        help="Write the election data as a binary record to "
+                             "OUTPUT instead of verifying it.")
+    parser.add_argument('--index', action='store_true',
+                        help="Write the tracker index of the cast ballots "
+                             "alongside the election data instead of "
+                             "verifying it, reporting cast ballots with "
+                             "duplicated trackers or ciphertexts.")
+    parser.add_argument('--lookup', metavar='TRACKER',
+                        help="Verify only the cast ballots with TRACKER, "
+                             "located by the tracker index, which is built "
+                             "first if needed.")
+    parser.add_argument('--sample', type=int, metavar='N',
+                        help="Verify only a random sample of N cast ballots, "
+                             "reporting an upper bound on the fraction of "
+                             "invalid cast ballots. The encrypted tallies "
+                             "are still checked against every cast ballot.")
+    parser.add_argument('--seed', type=int, default=0, metavar='N',
+                        help="Seed of the random sample, which is the same "
+                             "for the same seed.")
+    parser.add_argument('--confidence', type=float,
+                        default=DEFAULT_CONFIDENCE, metavar='C',
+                        help="Confidence of the bound on the fraction of "
+                             "invalid cast ballots.")
 
     # Parse arguments
     args = parser.parse_args()
@@ -50,6 +257,35 @@ def parse_args() -> Namespace:
     # Verify arguments
     if not isfile(args.election_data):
         exit("election_data is invalid file path")
+    if args.jobs < 1:
+        exit("jobs must be at least 1")
+    if args.chunk_size < 1:
+        exit("chunk-size must be at least 1")
+    if args.backend != 'auto' and args.backend not in available_backends():
+        exit(f"{args.backend} backend is not available")
+    if args.incremental is not None and (args.checkpoint or args.resume):
+        exit("incremental cannot be combined with checkpoint or resume")
+    if args.cache_size < 1:
+        exit("cache-size must be at least 1")
+    if args.nodes < 1:
+        exit("nodes must be at least 1")
+    if args.shard_size < 1:
+        exit("shard-size must be at least 1")
+    if args.node_timeout <= 0:
+        exit("node-timeout must be positive")
+    if args.listen is not None and args.incremental is not None:
+        exit("listen cannot be combined with incremental")
+    if args.lookup is not None and args.index:
+        exit("lookup cannot be combined with index")
+    if args.sample is not None and args.sample < 1:
+        exit("sample must be at least 1")
+    if not 0 < args.confidence < 1:
+        exit("confidence must be between 0 and 1")
+    if args.sample is not None and (args.incremental is not None
+                                    or args.checkpoint or args.resume
+                                    or args.listen is not None):
+        exit("sample cannot be combined with incremental, checkpoint, "
+             "resume or listen")
     
     # Return results
     return args
@@ -47,5 +47,8 @@ GENERATOR = int("""
         098A8C1E FD3CD28A 6B79306C A2C20C55 174218A3 935F697E 813628D2 D861BE54
         """.replace("\n", "").replace(" ", ""), 16)
 
+# Order `q` of the subgroup of `Z^*_p` generated by the group generator
+SUBGROUP_ORDER = 2 ** 256 - 189
+
 # Bytes order for number representation in hashes
 BYTE_ORDER = "little"
\ No newline at end of file
@@ -0,0 +1,237 @@
+# ElectionGuard Verifier Decryption Share Checks
+# Nicholas Boucher 2020
+from typing import Dict, List, Optional, Tuple
+from arithmetic import invert, mulmod, multi_exp, powmod
+from batch import batch_holds
+from findings import Finding
+from models import ChaumPedersonProof, DecryptionShare, ElGamalMessage
+from proofs import Equation, ProofContext
+from utils import hash_elems
+
+# The trustee and fragment keys are raised using fixed-base tables once there
+# are at least this many decryptions to check. Building a table costs about
+# as much as this many exponentiations, which the table then makes cheaper.
+KEY_TABLE_THRESHOLD = 64
+
+# Lagrange coefficients computed by this process, keyed by the sorted
+# x-coordinates of the present trustees and the subgroup order
+_lagrange: Dict[Tuple[Tuple[int, ...], int], Dict[int, int]] = {}
+
+
+def lagrange_coefficients(xs: Tuple[int, ...], order: int) -> Dict[int, int]:
+    """Returns the Lagrange coefficient `w_ℓ = Π m / (m - ℓ) mod q` of each
+        x-coordinate `ℓ` in `xs`, over the other coordinates `m`. Each set
+        of present trustees is computed once per process."""
+    key = (tuple(sorted(xs)), order)
+    coefficients = _lagrange.get(key)
+    if coefficients is None:
+        coefficients = {}
+        for x in key[0]:
+            numerator, denominator = 1, 1
+            for m in key[0]:
+                if m != x:
+                    numerator = numerator * m % order
+                    denominator = denominator * (m - x) % order
+            coefficients[x] = numerator * invert(denominator, order) % order
+        _lagrange[key] = coefficients
+    return coefficients
+
+
+class DecryptionContext:
+    """The election-wide values needed to check the decryption shares of a
+    tally or spoiled ballot.
+    """
+    proofs: ProofContext
+    """The coefficient commitments `K_ij` of each trustee's polynomial."""
+    trustee_keys: List[List[int]]
+    """The threshold `k` of trustees required to decrypt the election, and
+    so the number of fragments needed to reconstruct an absent trustee's
+    share.
+    """
+    threshold: int
+    """The public keys `g^P_i(ℓ)` of the fragments computed by trustee
+    `ℓ - 1` for absent trustee `i`, keyed by `(i, ℓ)`.
+    """
+    fragment_keys: Dict[Tuple[int, int], int]
+    """Whether the share proofs raise the trustee and fragment keys using
+    fixed-base tables, which are built once per process.
+    """
+    tabulate_keys: bool
+
+    def __init__(self, proofs: ProofContext, trustee_keys: List[List[int]],
+                 threshold: int, tabulate_keys: bool = False) -> None:
+        self.proofs = proofs
+        self.trustee_keys = trustee_keys
+        self.threshold = threshold
+        self.fragment_keys = {}
+        self.tabulate_keys = tabulate_keys
+
+    def fragment_key(self, trustee: int, x: int) -> int:
+        """Returns `g^P_i(x) = Π K_ijˣʲ mod p` for trustee `i`, computed from
+            the trustee's coefficient commitments by Horner's rule so that
+            each commitment is only raised to the small power `x`."""
+        key = self.fragment_keys.get((trustee, x))
+        if key is None:
+            p = self.proofs.prime
+            key = 1
+            for commitment in reversed(self.trustee_keys[trustee]):
+                key = mulmod(powmod(key, x, p), commitment, p)
+            self.fragment_keys[(trustee, x)] = key
+        return key
+
+
+def share_equations(message: ElGamalMessage, share: int,
+                    proof: ChaumPedersonProof, public_key: int,
+                    ctx: ProofContext, check: str, label: str,
+                    tabulate: bool = False
+                    ) -> Tuple[Optional[Finding], List[Equation]]:
+    """Checks the challenge hash of the proof that `share = Aˢ`, where
+        `public_key = gˢ`, and returns the equations which remain to be
+        checked. The first value is a finding when the hash check fails.
+        With `tabulate`, the public key is raised using its fixed-base
+        table."""
+    alpha, beta = message.public_key, message.ciphertext
+    a, b = proof.committment.public_key, proof.committment.ciphertext
+    c, v = proof.challenge, proof.response
+
+    # Test: The challenge is the hash of the message, commitment and share
+    expected = hash_elems(ctx.extended_base_hash, alpha, beta, a, b, share)
+    if expected != c:
+        return Finding(f"{check}_challenge",
+                       f"{label} challenge is not valid.", expected=expected,
+                       actual=c), []
+
+    # Test: `gᵛ = a Kᵢᶜ` and `Aᵛ = b Mᵢᶜ`, the latter checked as
+    # `1 = b Mᵢᶜ A⁻ᵛ`
+    failure = f"{label} is not valid."
+    terms, key_terms = [(a, 1)], [(public_key, c)]
+    if not tabulate:
+        terms, key_terms = terms + key_terms, []
+    return None, [Equation(v, 0, terms, check, failure, key_terms),
+                  Equation(0, 0, [(b, 1), (share, c),
+                                  (alpha, -v % ctx.order)], check, failure)]
+
+
+def decryption_equations(message: ElGamalMessage, decrypted: int,
+                         shares: List[DecryptionShare],
+                         ctx: DecryptionContext
+                         ) -> Tuple[List[Finding], List[Equation]]:
+    """Checks the structure of the decryption of `message` to `decrypted`
+        by `shares`, recombining the shares of absent trustees from their
+        fragments, and returns the findings along with the proof equations
+        which remain to be checked."""
+    p, q = ctx.proofs.prime, ctx.proofs.order
+    failures: List[Finding] = []
+    equations: List[Equation] = []
+
+    # Test: There is one share per trustee
+    if len(shares) != len(ctx.trustee_keys):
+        return [Finding("share_count",
+                        f"Expected {len(ctx.trustee_keys)} decryption "
+                        f"shares, found {len(shares)}.",
+                        expected=len(ctx.trustee_keys),
+                        actual=len(shares))], []
+    present = [i for i, share in enumerate(shares) if share.fragments is None]
+
+    for i, share in enumerate(shares):
+        # Test: The share of a present trustee is proven against the
+        # trustee's public key
+        if share.fragments is None:
+            if not ctx.trustee_keys[i]:
+                failures.append(Finding("share_proof",
+                                        f"Share {i}: Trustee has no public "
+                                        "key to prove the share against."))
+                continue
+            failure, share_eqs = share_equations(message, share.share,
+                                                 share.proof,
+                                                 ctx.trustee_keys[i][0],
+                                                 ctx.proofs, "share_proof",
+                                                 f"Share {i}: Share proof",
+                                                 ctx.tabulate_keys)
+            if failure is not None:
+                failures.append(failure)
+            equations.extend(share_eqs)
+            continue
+
+        # Test: The fragments come from enough distinct present trustees to
+        # reconstruct the absent trustee's polynomial
+        indices = [fragment.trustee_index for fragment in share.fragments]
+        if not set(indices) <= set(present) or len(set(indices)) != \
+                len(indices):
+            failures.append(Finding("fragment_trustees",
+                                    f"Share {i}: Fragments are not from "
+                                    "distinct present trustees."))
+            continue
+        if len(set(indices)) < ctx.threshold:
+            failures.append(Finding("fragment_count",
+                                    f"Share {i}: Too few fragments to "
+                                    "reconstruct the share.",
+                                    expected=ctx.threshold,
+                                    actual=len(indices)))
+            continue
+
+        weights = lagrange_coefficients(tuple(j + 1 for j in indices), q)
+        terms = []
+        for k, fragment in enumerate(share.fragments):
+            label = f"Share {i}: Fragment {k}"
+            x = fragment.trustee_index + 1
+
+            # Test: The Lagrange coefficient matches the present trustees
+            if fragment.lagrange_coefficient != weights[x]:
+                failures.append(Finding("lagrange_coefficient",
+                                        f"{label}: Lagrange coefficient is "
+                                        "not valid.", expected=weights[x],
+                                        actual=fragment.lagrange_coefficient))
+
+            # Test: The fragment is proven against `g^P_i(ℓ)`
+            failure, fragment_eqs = share_equations(
+                message, fragment.fragment, fragment.proof,
+                ctx.fragment_key(i, x), ctx.proofs, "fragment_proof",
+                f"{label}: Fragment proof", ctx.tabulate_keys)
+            if failure is not None:
+                failures.append(failure)
+            equations.extend(fragment_eqs)
+            terms.append((fragment.fragment, weights[x]))
+
+        # Test: The fragments combine to the share, `Mᵢ = Π Mᵢⱼʷʲ`
+        if multi_exp(terms, p) != share.share:
+            failures.append(Finding("fragment_combination",
+                                    f"Share {i}: Fragments do not combine "
+                                    "to the share."))
+
+    # Test: The shares combine with the decryption, `B = M Π Mᵢ`
+    product = decrypted
+    for share in shares:
+        product = mulmod(product, share.share, p)
+    if product != message.ciphertext:
+        failures.append(Finding("decryption",
+                                "Decrypted message is not the ciphertext "
+                                "divided by the product of the shares."))
+    return failures, equations
+
+
+def verify_decryption(message: ElGamalMessage, decrypted: int,
+                      shares: List[DecryptionShare],
+                      ctx: DecryptionContext) -> List[Finding]:
+    """Checks that `shares` correctly decrypt `message` to `decrypted`,
+        returning a finding for each problem found. In batch mode, the share
+        proofs are checked together first."""
+    failures, equations = decryption_equations(message, decrypted, shares,
+                                               ctx)
+    return check_equations(failures, equations, ctx)
+
+
+def check_equations(failures: List[Finding], equations: List[Equation],
+                    ctx: DecryptionContext) -> List[Finding]:
+    """Adds to the `failures` of a decryption a finding for each of its
+        proof `equations` which does not hold, unless the same failure is
+        already reported, and returns them. In batch mode, the equations are
+        checked together first."""
+    if ctx.proofs.batch and batch_holds(equations, ctx.proofs):
+        return failures
+    for equation in equations:
+        if (not equation.holds(ctx.proofs)
+                and all(equation.message != failure.message
+                        for failure in failures)):
+            failures.append(equation.finding())
+    return failures
@@ -0,0 +1,153 @@
+# ElectionGuard Verifier Discrete Logarithms
+# Nicholas Boucher 2020
+from typing import Dict, List, Optional, Tuple
+from os import replace
+from os.path import isfile
+from struct import Struct
+from constants import BYTE_ORDER
+from arithmetic import invert, mulmod, powmod
+
+# The largest number of powers held in a table. Larger logarithms are found
+# by baby-step giant-step, using the table as the baby steps.
+DLOG_TABLE_LIMIT = 1 << 20
+
+# Powers are keyed by their low 64 bits, and candidates are confirmed by
+# exponentiation, which keeps each table entry small
+_KEY_MASK = (1 << 64) - 1
+
+# Identifies a persisted table file
+_MAGIC = b"EGDLT1\n"
+
+_U64 = Struct("<Q")
+
+# Tables used by this process, keyed by generator and prime
+_tables: Dict[Tuple[int, int], 'DiscreteLogTable'] = {}
+
+# Table files already loaded by this process
+_loaded_paths: set = set()
+
+
+class DiscreteLogTable:
+    """The powers `g⁰, g¹, ..., gⁿ⁻¹` of a generator, indexed for lookup. The
+    table is extended as larger logarithms are requested, so it is shared
+    between every tally in an election.
+    """
+    generator: int
+    prime: int
+    """The exponent of each power, keyed by the low bits of the power."""
+    exponents: Dict[int, int]
+    """The keys of the powers in exponent order."""
+    keys: List[int]
+    """The power `gⁿ` following the last power in the table."""
+    next_power: int
+
+    def __init__(self, generator: int, prime: int) -> None:
+        self.generator = generator
+        self.prime = prime
+        self.exponents = {}
+        self.keys = []
+        self.next_power = 1
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def extend(self, size: int) -> None:
+        """Adds powers to the table until it holds `size` of them."""
+        power = self.next_power
+        for exponent in range(len(self.keys), size):
+            key = power & _KEY_MASK
+            self.exponents.setdefault(key, exponent)
+            self.keys.append(key)
+            power = mulmod(power, self.generator, self.prime)
+        self.next_power = power
+
+    def _find(self, element: int) -> Optional[int]:
+        """Returns the exponent of `element` if it is a power in the table."""
+        exponent = self.exponents.get(element & _KEY_MASK)
+        if exponent is not None and \
+                powmod(self.generator, exponent, self.prime) == element:
+            return exponent
+        return None
+
+    def log(self, element: int, bound: int) -> Optional[int]:
+        """Returns the exponent `m ≤ bound` with `gᵐ = element`, or None if
+            there is no such exponent. Small exponents are looked up directly,
+            and larger ones by giant steps of the table's size."""
+        self.extend(min(bound + 1, max(len(self), DLOG_TABLE_LIMIT)))
+        step = invert(self.next_power, self.prime)
+        for giant in range(0, bound + 1, len(self)):
+            exponent = self._find(element)
+            if exponent is not None and giant + exponent <= bound:
+                return giant + exponent
+            element = mulmod(element, step, self.prime)
+        return None
+
+    def save(self, path: str) -> None:
+        """Writes the table to the file at `path`, replacing it only once
+            every power is written."""
+        width = (self.prime.bit_length() + 7) // 8
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(_MAGIC)
+            f.write(width.to_bytes(4, BYTE_ORDER))
+            f.write(self.prime.to_bytes(width, BYTE_ORDER))
+            f.write(self.generator.to_bytes(width, BYTE_ORDER))
+            f.write(len(self.keys).to_bytes(8, BYTE_ORDER))
+            f.write(b"".join(_U64.pack(key) for key in self.keys))
+        replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load(path: str, generator: int, prime: int) -> 'DiscreteLogTable':
+        """Reads the table for `generator` stored at `path`, or returns an
+            empty table when there is no such file. Raises a ValueError when
+            the file is truncated or its last power is not the generator's."""
+        table = DiscreteLogTable(generator, prime)
+        if not isfile(path):
+            return table
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(_MAGIC):
+            raise ValueError(f"{path} is not a discrete log table file.")
+        pos = len(_MAGIC)
+        width = int.from_bytes(data[pos:pos + 4], BYTE_ORDER)
+        pos += 4
+        stored_prime = int.from_bytes(data[pos:pos + width], BYTE_ORDER)
+        stored_generator = int.from_bytes(data[pos + width:pos + 2 * width],
+                                          BYTE_ORDER)
+        pos += 2 * width
+        if (stored_prime, stored_generator) != (prime, generator):
+            return table
+        count = int.from_bytes(data[pos:pos + 8], BYTE_ORDER)
+        pos += 8
+        if pos + 8 * count != len(data):
+            raise ValueError(f"{path} does not hold {count} powers.")
+        table.keys = [key for key, in _U64.iter_unpack(data[pos:pos + 8 *
+                                                            count])]
+        for exponent, key in enumerate(table.keys):
+            table.exponents.setdefault(key, exponent)
+        table.next_power = powmod(generator, count, prime)
+        if count and table.keys[-1] != \
+                mulmod(table.next_power, invert(generator, prime),
+                       prime) & _KEY_MASK:
+            raise ValueError(f"{path} holds powers of another generator.")
+        return table
+
+
+def get_dlog_table(generator: int, prime: int,
+                   path: Optional[str] = None) -> DiscreteLogTable:
+    """Returns this process's table for `generator`, which keeps the powers
+        found by every earlier verification. The table is first extended
+        from the file at `path` when it is given and holds more powers."""
+    table = _tables.get((generator, prime))
+    if path is not None and path not in _loaded_paths:
+        _loaded_paths.add(path)
+        # A damaged file is ignored, and overwritten once the table is saved
+        try:
+            stored = DiscreteLogTable.load(path, generator, prime)
+        except ValueError:
+            stored = DiscreteLogTable(generator, prime)
+        if table is None or len(stored) > len(table):
+            table = stored
+    if table is None:
+        table = DiscreteLogTable(generator, prime)
+    _tables[(generator, prime)] = table
+    return table
@@ -0,0 +1,109 @@
+# ElectionGuard Verifier Findings
+# Nicholas Boucher 2020
+from typing import Any, List, Optional, TextIO
+from json import dumps
+from metrics import notify
+from utils import fail
+
+# Sources of findings which are reported for an individual ballot
+BALLOT_SOURCES = {"cast": "Cast ballot", "spoiled": "Spoiled ballot"}
+
+
+class Finding:
+    """A single failed check, located within the election record."""
+    """Identifies the kind of check which failed, e.g. `selection_proof`."""
+    check: str
+    """A description of the failure."""
+    message: str
+    """The part of the record the finding is in: `cast` or `spoiled` for a
+    ballot, `tally` for a contest tally, or None for the rest of the record.
+    """
+    source: Optional[str]
+    """The index of the ballot among the cast or spoiled ballots."""
+    ballot: Optional[int]
+    tracker: Optional[str]
+    trustee: Optional[int]
+    coefficient: Optional[int]
+    contest: Optional[int]
+    selection: Optional[int]
+    """The value the check required, when it compares two values."""
+    expected: Any
+    """The value found in the record, when the check compares two values."""
+    actual: Any
+
+    def __init__(self, check: str, message: str,
+                 source: Optional[str] = None, ballot: Optional[int] = None,
+                 tracker: Optional[str] = None,
+                 trustee: Optional[int] = None,
+                 coefficient: Optional[int] = None,
+                 contest: Optional[int] = None,
+                 selection: Optional[int] = None, expected: Any = None,
+                 actual: Any = None) -> None:
+        self.check = check
+        self.message = message
+        self.source = source
+        self.ballot = ballot
+        self.tracker = tracker
+        self.trustee = trustee
+        self.coefficient = coefficient
+        self.contest = contest
+        self.selection = selection
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self) -> str:
+        parts = []
+        if self.source in BALLOT_SOURCES:
+            parts.append(f"{BALLOT_SOURCES[self.source]} {self.ballot} "
+                         f"({self.tracker})")
+        if self.trustee is not None:
+            parts.append(f"Trustee {self.trustee}")
+        if self.coefficient is not None:
+            parts.append(f"Coefficient {self.coefficient}")
+        if self.contest is not None:
+            parts.append(f"Contest {self.contest}")
+        if self.selection is not None:
+            parts.append(f"Selection {self.selection}")
+        if self.source == "tally":
+            parts.append("Tally")
+        parts.append(self.message)
+        return ": ".join(parts)
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'Finding':
+        assert isinstance(obj, dict)
+        return Finding(**obj)
+
+    def to_dict(self) -> dict:
+        return {"check": self.check, "message": self.message,
+                "source": self.source, "ballot": self.ballot,
+                "tracker": self.tracker, "trustee": self.trustee,
+                "coefficient": self.coefficient, "contest": self.contest,
+                "selection": self.selection, "expected": self.expected,
+                "actual": self.actual}
+
+
+class FindingsReport:
+    """Reports the findings of a verification as they are made, logging each
+    one, notifying the progress listener, and writing it as a line of JSON
+    when a findings file is given.
+    """
+    file: Optional[TextIO]
+    """The findings reported, in order."""
+    findings: List[Finding]
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.file = open(path, 'w') if path is not None else None
+        self.findings = []
+
+    def add(self, finding: Finding) -> bool:
+        """Reports `finding` and returns false for failure."""
+        self.findings.append(finding)
+        notify({"type": "finding", "finding": finding.to_dict()})
+        if self.file is not None:
+            self.file.write(dumps(finding.to_dict(), default=int) + "\n")
+        return fail(str(finding))
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
@@ -0,0 +1,234 @@
+# ElectionGuard Verifier Fixed-Base Exponentiation
+# Nicholas Boucher 2020
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+from os import replace
+from os.path import isfile
+from random import randrange
+from constants import BYTE_ORDER, GENERATOR, PRIME, SUBGROUP_ORDER
+from arithmetic import mulmod, native, powmod
+from metrics import counters
+
+# Number of exponent bits consumed by each row of a table
+DEFAULT_WINDOW = 8
+
+# Exponents up to this many bits are covered by a table. Exponents in the
+# ElectionGuard proofs are reduced modulo the subgroup order `q`.
+DEFAULT_BITS = SUBGROUP_ORDER.bit_length()
+
+# Identifies a persisted table file
+_MAGIC = b"EGFBT1\n"
+
+# Largest window accepted from a persisted table file, beyond which a row
+# would not fit in memory
+MAX_WINDOW = 16
+
+# Number of tables kept by a process, beyond which the least recently used
+# are evicted. A table of the default size takes about 4.7 MB.
+MAX_TABLES = 32
+
+# Tables built or loaded by this process, keyed by base and modulus, from
+# least to most recently used
+_tables: 'OrderedDict[Tuple[int, int], FixedBaseTable]' = OrderedDict()
+
+# Table files already loaded by this process
+_loaded_paths: set = set()
+
+
+class FixedBaseTable:
+    """Precomputed powers of a fixed base for windowed exponentiation. Row `i`
+    holds `base^(d 2^(w i))` for every `w`-bit digit `d`, so raising the base
+    to an exponent costs one multiplication per non-zero digit and no
+    squarings.
+    """
+    base: int
+    modulus: int
+    """The number of exponent bits consumed by each row."""
+    window: int
+    """The number of exponent bits covered by the table."""
+    bits: int
+    rows: List[List[int]]
+
+    def __init__(self, base: int, modulus: int, window: int = DEFAULT_WINDOW,
+                 bits: int = DEFAULT_BITS,
+                 rows: Optional[List[List[int]]] = None) -> None:
+        self.base = base
+        self.modulus = modulus
+        self.window = window
+        self.bits = bits
+        self.rows = rows if rows is not None else self._build()
+
+    def _build(self) -> List[List[int]]:
+        """Computes the rows of the table."""
+        rows = []
+        modulus = native(self.modulus)
+        row_base = native(self.base) % modulus
+        for _ in range((self.bits + self.window - 1) // self.window):
+            row = [native(1)]
+            for _ in range((1 << self.window) - 1):
+                row.append(mulmod(row[-1], row_base, modulus))
+            rows.append(row)
+            row_base = mulmod(row[-1], row_base, modulus)
+        return rows
+
+    def consistent(self) -> bool:
+        """Returns whether the first row starts with `1` and the base, each
+            row starts where the previous one ends, and a randomly chosen
+            power in each row follows the one before it. This catches a
+            table stored for another base or damaged on disk without
+            rebuilding it."""
+        if not self.rows or self.rows[0][:2] != [1, self.base % self.modulus]:
+            return False
+        for row, following in zip(self.rows, self.rows[1:] + [None]):
+            digit = randrange(1, len(row))
+            if mulmod(row[digit - 1], row[1], self.modulus) != row[digit]:
+                return False
+            if following is not None and (
+                    following[0] != 1 or
+                    mulmod(row[-1], row[1], self.modulus) != following[1]):
+                return False
+        return True
+
+    def pow(self, exponent: int) -> int:
+        """Returns `base^exponent mod modulus`."""
+        # Fall back to generic exponentiation outside of the table's range
+        if exponent < 0 or exponent.bit_length() > self.bits:
+            return powmod(self.base, exponent, self.modulus)
+
+        counters["fixed_base_exp"] += 1
+        exponent = int(exponent)
+        mask = (1 << self.window) - 1
+        result = 1
+        for row in self.rows:
+            if not exponent:
+                break
+            digit = exponent & mask
+            if digit:
+                result = mulmod(result, row[digit], self.modulus)
+            exponent >>= self.window
+        return result
+
+
+def _store(table: FixedBaseTable) -> None:
+    """Keeps `table` in this process, evicting the least recently used
+        tables beyond `MAX_TABLES` other than the generator's, which every
+        record uses."""
+    key = (table.base, table.modulus)
+    _tables[key] = table
+    _tables.move_to_end(key)
+    while len(_tables) > MAX_TABLES:
+        evicted = next(other for other in _tables
+                       if other != (GENERATOR, PRIME))
+        del _tables[evicted]
+
+
+def get_table(base: int, modulus: int) -> FixedBaseTable:
+    """Returns the table for `base`, building it the first time it is
+        requested by this process or after it was evicted."""
+    table = _tables.get((base, modulus))
+    if table is None:
+        table = FixedBaseTable(base, modulus)
+        _store(table)
+    else:
+        _tables.move_to_end((base, modulus))
+    return table
+
+
+def fixed_pow(base: int, exponent: int, modulus: int,
+              path: Optional[str] = None) -> int:
+    """Returns `base^exponent mod modulus` using this process's table for
+        `base`. Tables are first loaded from `path` when it is given."""
+    if path is not None and path not in _loaded_paths:
+        _loaded_paths.add(path)
+        for table in _load_stored(path):
+            _store(table)
+    return get_table(base, modulus).pow(exponent)
+
+
+def save_tables(path: str, tables: List[FixedBaseTable]) -> None:
+    """Writes `tables` to the file at `path`, replacing it only once every
+        table is written."""
+    with open(f"{path}.tmp", 'wb') as f:
+        f.write(_MAGIC)
+        f.write(len(tables).to_bytes(4, BYTE_ORDER))
+        for table in tables:
+            width = (table.modulus.bit_length() + 7) // 8
+            f.write(width.to_bytes(4, BYTE_ORDER))
+            f.write(table.window.to_bytes(4, BYTE_ORDER))
+            f.write(table.bits.to_bytes(4, BYTE_ORDER))
+            f.write(table.modulus.to_bytes(width, BYTE_ORDER))
+            f.write(table.base.to_bytes(width, BYTE_ORDER))
+            for row in table.rows:
+                f.write(b"".join(int(x).to_bytes(width, BYTE_ORDER)
+                                 for x in row))
+    replace(f"{path}.tmp", path)
+
+
+def load_tables(path: str) -> List[FixedBaseTable]:
+    """Reads the tables stored in the file at `path`, raising a ValueError
+        when the file is truncated or its tables are not consistent with
+        their bases."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(_MAGIC):
+        raise ValueError(f"{path} is not a fixed-base table file.")
+
+    def read_int(pos: int, width: int) -> int:
+        return int.from_bytes(data[pos:pos + width], BYTE_ORDER)
+
+    tables = []
+    pos = len(_MAGIC)
+    count = read_int(pos, 4)
+    pos += 4
+    for _ in range(count):
+        width, window, bits = (read_int(pos + 4 * i, 4) for i in range(3))
+        pos += 12
+        if not 0 < window <= MAX_WINDOW or width == 0:
+            raise ValueError(f"{path} has an invalid table header.")
+        row_count = (bits + window - 1) // window
+        if pos + 2 * width + row_count * (width << window) > len(data):
+            raise ValueError(f"{path} is truncated.")
+        modulus = read_int(pos, width)
+        base = read_int(pos + width, width)
+        pos += 2 * width
+        if modulus < 2:
+            raise ValueError(f"{path} has an invalid table modulus.")
+        rows = []
+        for _ in range(row_count):
+            rows.append([native(read_int(pos + width * d, width))
+                         for d in range(1 << window)])
+            pos += width << window
+        table = FixedBaseTable(base, modulus, window, bits, rows)
+        if not table.consistent():
+            raise ValueError(f"{path} holds an inconsistent table.")
+        tables.append(table)
+    if pos != len(data):
+        raise ValueError(f"{path} has trailing data.")
+    return tables
+
+
+def _load_stored(path: str) -> List[FixedBaseTable]:
+    """Returns the tables stored at `path`, or none when there is no such
+        file or it is not valid, so that the tables are rebuilt."""
+    if not isfile(path):
+        return []
+    try:
+        return load_tables(path)
+    except ValueError:
+        return []
+
+
+def prepare_tables(path: str, bases: List[int], modulus: int) -> None:
+    """Ensures the file at `path` holds tables for each of `bases`, building
+        and saving any that are missing."""
+    _loaded_paths.add(path)
+    stored = [table for table in _load_stored(path)
+              if table.modulus == modulus and table.base in bases
+              and table.window == DEFAULT_WINDOW
+              and table.bits == DEFAULT_BITS]
+    for table in stored:
+        _store(table)
+    if len(stored) == len(set(bases)):
+        return
+    save_tables(path, [get_table(base, modulus)
+                       for base in dict.fromkeys(bases)])
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# ElectionGuard Synthetic Election Record Generator
+# Nicholas Boucher 2020
+from typing import Any, Dict, List, Tuple
+from argparse import ArgumentParser, Namespace
+from hashlib import sha256
+from json import dumps
+from random import Random
+from constants import BYTE_ORDER, GENERATOR, PRIME, SUBGROUP_ORDER
+from arithmetic import mulmod, powmod
+from decryption import lagrange_coefficients
+from fixedbase import fixed_pow
+from utils import hash_elems, int_to_bytes
+
+# Placeholder proof recorded for the share of an absent trustee, whose
+# fragments carry the proofs instead
+ABSENT_SHARE_PROOF = {"challenge": 0,
+                      "committment": {"ciphertext": 1, "public_key": 1},
+                      "response": 0}
+
+
+class RecordGenerator:
+    """Produces a valid election record from a seed. The same seed and sizes
+    always produce the same record.
+    """
+    rng: Random
+    """The secret polynomial coefficients of each trustee."""
+    coefficients: List[List[int]]
+    """The trustees who are absent from decryption."""
+    absent: List[int]
+    """The first `threshold` trustees who are present at decryption."""
+    present: List[int]
+    base_hash: int
+    extended_base_hash: int
+    public_key: int
+
+    def __init__(self, num_trustees: int, threshold: int, missing: int,
+                 seed: int) -> None:
+        self.rng = Random(seed)
+        self.coefficients = [[self.exponent() for _ in range(threshold)]
+                             for _ in range(num_trustees)]
+        self.absent = list(range(num_trustees - missing, num_trustees))
+        self.present = [i for i in range(num_trustees)
+                        if i not in self.absent][:threshold]
+        self.base_hash = self.rng.getrandbits(256)
+
+        # Derive the joint key and the extended base hash from the trustees
+        self.public_key = 1
+        digest = sha256()
+        for trustee in self.coefficients:
+            for coefficient in trustee:
+                digest.update(int_to_bytes(self.pow_g(coefficient)))
+            self.public_key = mulmod(self.public_key, self.pow_g(trustee[0]),
+                                     PRIME)
+        digest.update(int_to_bytes(self.base_hash))
+        self.extended_base_hash = int.from_bytes(digest.digest(), BYTE_ORDER)
+
+    def exponent(self) -> int:
+        """Returns a random non-zero exponent."""
+        return self.rng.randrange(1, SUBGROUP_ORDER)
+
+    def pow_g(self, exponent: int) -> int:
+        return fixed_pow(GENERATOR, exponent % SUBGROUP_ORDER, PRIME)
+
+    def pow_k(self, exponent: int) -> int:
+        return fixed_pow(self.public_key, exponent % SUBGROUP_ORDER, PRIME)
+
+    def trustee_public_keys(self) -> List[List[Dict[str, Any]]]:
+        """Returns each trustee's coefficient commitments with their Schnorr
+            proofs."""
+        trustees = []
+        for trustee in self.coefficients:
+            keys = []
+            for coefficient in trustee:
+                key = self.pow_g(coefficient)
+                r = self.exponent()
+                h = self.pow_g(r)
+                c = hash_elems(self.base_hash, key, h)
+                keys.append({"proof": {"challenge": c, "committment": h,
+                                       "response": (r + c * coefficient)
+                                       % SUBGROUP_ORDER},
+                             "public_key": key})
+            trustees.append(keys)
+        return trustees
+
+    def encrypt(self, m: int) -> Tuple[int, int, int]:
+        """Returns the nonce and the ElGamal encryption `(α, β)` of `m`."""
+        r = self.exponent()
+        return r, self.pow_g(r), mulmod(self.pow_g(m), self.pow_k(r), PRIME)
+
+    def proof(self, challenge: int, a: int, b: int, response: int
+              ) -> Dict[str, Any]:
+        return {"challenge": challenge,
+                "committment": {"ciphertext": b, "public_key": a},
+                "response": response}
+
+    def selection(self, m: int) -> Tuple[int, Dict[str, Any]]:
+        """Returns the nonce and an encrypted selection of `m` with its
+            disjunctive proof, simulating the proof of the false case."""
+        q = SUBGROUP_ORDER
+        r, alpha, beta = self.encrypt(m)
+        c_fake, u_fake = self.exponent(), self.exponent()
+        t = self.exponent()
+        if m == 0:
+            a1 = mulmod(self.pow_g(u_fake), powmod(alpha, q - c_fake, PRIME),
+                        PRIME)
+            b1 = mulmod(mulmod(self.pow_g(c_fake), self.pow_k(u_fake), PRIME),
+                        powmod(beta, q - c_fake, PRIME), PRIME)
+            a0, b0 = self.pow_g(t), self.pow_k(t)
+        else:
+            a0 = mulmod(self.pow_g(u_fake), powmod(alpha, q - c_fake, PRIME),
+                        PRIME)
+            b0 = mulmod(self.pow_k(u_fake), powmod(beta, q - c_fake, PRIME),
+                        PRIME)
+            a1, b1 = self.pow_g(t), self.pow_k(t)
+        c = hash_elems(self.extended_base_hash, alpha, beta, a0, b0, a1, b1)
+        c_real = (c - c_fake) % q
+        u_real = (t + c_real * r) % q
+        if m == 0:
+            zero, one = (c_real, a0, b0, u_real), (c_fake, a1, b1, u_fake)
+        else:
+            zero, one = (c_fake, a0, b0, u_fake), (c_real, a1, b1, u_real)
+        return r, {"message": {"ciphertext": beta, "public_key": alpha},
+                   "one_proof": self.proof(*one),
+                   "zero_proof": self.proof(*zero)}
+
+    def contest(self, selections: int, max_selections: int
+                ) -> Tuple[List[int], Dict[str, Any]]:
+        """Returns the votes and an encrypted contest in which
+            `max_selections` of the selections are chosen at random."""
+        chosen = set(self.rng.sample(range(selections), max_selections))
+        votes = [1 if i in chosen else 0 for i in range(selections)]
+        encrypted = []
+        nonce, alpha, beta = 0, 1, 1
+        for m in votes:
+            r, selection = self.selection(m)
+            encrypted.append(selection)
+            nonce += r
+            alpha = mulmod(alpha, selection["message"]["public_key"], PRIME)
+            beta = mulmod(beta, selection["message"]["ciphertext"], PRIME)
+        t = self.exponent()
+        a, b = self.pow_g(t), self.pow_k(t)
+        c = hash_elems(self.extended_base_hash, alpha, beta, a, b)
+        u = (t + c * nonce) % SUBGROUP_ORDER
+        return votes, {"max_selections": max_selections,
+                       "num_selections_proof": self.proof(c, a, b, u),
+                       "selections": encrypted}
+
+    def share_proof(self, alpha: int, beta: int, secret: int, share: int
+                    ) -> Dict[str, Any]:
+        """Returns the proof that `share = αˢ` for the secret `s`."""
+        t = self.exponent()
+        a, b = self.pow_g(t), powmod(alpha, t, PRIME)
+        c = hash_elems(self.extended_base_hash, alpha, beta, a, b, share)
+        return self.proof(c, a, b, (t + c * secret) % SUBGROUP_ORDER)
+
+    def shares(self, alpha: int, beta: int) -> List[Dict[str, Any]]:
+        """Returns the decryption shares of `(α, β)`, reconstructing the
+            shares of absent trustees from fragments."""
+        q = SUBGROUP_ORDER
+        xs = tuple(j + 1 for j in self.present)
+        weights = lagrange_coefficients(xs, q)
+        shares = []
+        for i, trustee in enumerate(self.coefficients):
+            if i not in self.absent:
+                share = powmod(alpha, trustee[0], PRIME)
+                shares.append({"fragments": None,
+                               "proof": self.share_proof(alpha, beta,
+                                                         trustee[0], share),
+                               "share": share})
+                continue
+            fragments = []
+            share = 1
+            for j in self.present:
+                x = j + 1
+                secret = sum(a * pow(x, k, q)
+                             for k, a in enumerate(trustee)) % q
+                fragment = powmod(alpha, secret, PRIME)
+                fragments.append({"fragment": fragment,
+                                  "lagrange_coefficient": weights[x],
+                                  "proof": self.share_proof(alpha, beta,
+                                                            secret, fragment),
+                                  "trustee_index": j})
+                share = mulmod(share, powmod(fragment, weights[x], PRIME),
+                               PRIME)
+            shares.append({"fragments": fragments,
+                           "proof": ABSENT_SHARE_PROOF, "share": share})
+        return shares
+
+    def decryption(self, alpha: int, beta: int, m: int
+                   ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Returns the decrypted message `gᵐ` of `(α, β)` and its shares."""
+        return self.pow_g(m), self.shares(alpha, beta)
+
+
+def ballot_info(tracker: str) -> Dict[str, str]:
+    return {"date": "2020-03-03", "device_info": "synthetic", "time": "12:00",
+            "tracker": tracker}
+
+
+def generate_record(path: str, ballots: int = 100, contests: int = 2,
+                    selections: int = 3, num_trustees: int = 3,
+                    threshold: int = 2, missing: int = 1, spoiled: int = 1,
+                    seed: int = 0) -> None:
+    """Writes a valid election record with the given sizes to `path`.
+        Contests alternate between one and two allowed selections. Ballots
+        are written as they are generated, so memory does not grow with the
+        number of ballots."""
+    if not 0 <= missing <= num_trustees - threshold:
+        raise ValueError("Too many absent trustees to decrypt the election.")
+    if selections < 2:
+        raise ValueError("Contests need at least two selections.")
+    generator = RecordGenerator(num_trustees, threshold, missing, seed)
+    max_selections = [1 + contest % 2 for contest in range(contests)]
+    tallies = [[[1, 1, 0] for _ in range(selections)]
+               for _ in range(contests)]
+
+    with open(path, 'w') as f:
+        f.write('{"base_hash": ' + dumps(str(generator.base_hash)))
+        f.write(', "extended_base_hash": '
+                + dumps(str(generator.extended_base_hash)))
+        f.write(', "joint_public_key": ' + dumps(int(generator.public_key)))
+        f.write(', "parameters": ' + dumps({
+            "ballotCodingFile": {
+                "ballotStyles": [], "contests": [],
+                "county": {"id": "county", "name": "Synthetic County"},
+                "date": "2020-03-03", "districts": [], "parties": [],
+                "precincts": [], "state": "XX",
+                "title": "Synthetic Election"},
+            "date": "2020-03-03", "generator": GENERATOR,
+            "location": "Synthetic", "num_trustees": num_trustees,
+            "prime": PRIME, "threshold": threshold}))
+        f.write(', "trustee_public_keys": '
+                + dumps(generator.trustee_public_keys(), default=int))
+
+        # Cast ballots, accumulating the encrypted tallies
+        f.write(', "cast_ballots": [')
+        for index in range(ballots):
+            encrypted = []
+            for contest, row in zip(max_selections, tallies):
+                votes, encrypted_contest = generator.contest(selections,
+                                                             contest)
+                encrypted.append(encrypted_contest)
+                for tally, m, selection in zip(
+                        row, votes, encrypted_contest["selections"]):
+                    tally[0] = mulmod(tally[0],
+                                      selection["message"]["public_key"],
+                                      PRIME)
+                    tally[1] = mulmod(tally[1],
+                                      selection["message"]["ciphertext"],
+                                      PRIME)
+                    tally[2] += m
+            f.write((", " if index else "") + dumps({
+                "ballot_info": ballot_info(f"cast-{seed}-{index:08d}"),
+                "contests": encrypted}, default=int))
+        f.write(']')
+
+        # Decrypted tallies
+        contest_tallies = []
+        for row in tallies:
+            decrypted = []
+            for alpha, beta, m in row:
+                message, shares = generator.decryption(int(alpha), int(beta),
+                                                       m)
+                decrypted.append({"cleartext": m,
+                                  "decrypted_tally": message,
+                                  "encrypted_tally": {"ciphertext": beta,
+                                                      "public_key": alpha},
+                                  "shares": shares})
+            contest_tallies.append(decrypted)
+        f.write(', "contest_tallies": ' + dumps(contest_tallies, default=int))
+
+        # Spoiled ballots, decrypted in full
+        f.write(', "spoiled_ballots": [')
+        for index in range(spoiled):
+            decrypted = []
+            for _ in range(contests):
+                row = []
+                for _ in range(selections):
+                    m = generator.rng.randrange(2)
+                    _, alpha, beta = generator.encrypt(m)
+                    message, shares = generator.decryption(alpha, beta, m)
+                    row.append({"cleartext": m, "decrypted_message": message,
+                                "encrypted_message": {"ciphertext": beta,
+                                                      "public_key": alpha},
+                                "shares": shares})
+                decrypted.append(row)
+            f.write((", " if index else "") + dumps({
+                "ballot_info": ballot_info(f"spoiled-{seed}-{index:08d}"),
+                "contests": decrypted}, default=int))
+        f.write(']}')
+
+
+def main() -> None:
+    """Main point of entry for command line execution."""
+    args = parse_args()
+    generate_record(args.output, ballots=args.ballots, contests=args.contests,
+                    selections=args.selections, num_trustees=args.trustees,
+                    threshold=args.threshold, missing=args.missing,
+                    spoiled=args.spoiled, seed=args.seed)
+
+
+def parse_args() -> Namespace:
+    """Parses, verifies, and returns command line line arguments."""
+    # Configure arguments
+    parser = ArgumentParser(
+            description='Generate a synthetic ElectionGuard election record.')
+    parser.add_argument('output', help='Path of the JSON record to write.')
+    parser.add_argument('--ballots', type=int, default=100, metavar='N',
+                        help="Number of cast ballots.")
+    parser.add_argument('--contests', type=int, default=2, metavar='N',
+                        help="Number of contests on each ballot.")
+    parser.add_argument('--selections', type=int, default=3, metavar='N',
+                        help="Number of selections in each contest.")
+    parser.add_argument('--trustees', type=int, default=3, metavar='N',
+                        help="Number of trustees.")
+    parser.add_argument('--threshold', type=int, default=2, metavar='N',
+                        help="Number of trustees needed to decrypt.")
+    parser.add_argument('--missing', type=int, default=1, metavar='N',
+                        help="Number of trustees absent from decryption.")
+    parser.add_argument('--spoiled', type=int, default=1, metavar='N',
+                        help="Number of spoiled ballots.")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Seed of the generated record.")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Verify arguments
+    if args.ballots < 0 or args.spoiled < 0:
+        exit("ballots and spoiled must not be negative")
+    if args.contests < 1 or args.selections < 2:
+        exit("contests must be at least 1 and selections at least 2")
+    if not 1 <= args.threshold <= args.trustees:
+        exit("threshold must be between 1 and the number of trustees")
+    if not 0 <= args.missing <= args.trustees - args.threshold:
+        exit("missing must leave at least threshold trustees present")
+
+    # Return results
+    return args
+
+
+if __name__ == '__main__':
+    main()
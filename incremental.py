@@ -0,0 +1,97 @@
+# ElectionGuard Verifier Incremental Verification State
+# Nicholas Boucher 2020
+from typing import Any, Dict, List, Optional
+from hashlib import sha256
+from json import dump, load
+from os import replace
+from os.path import isfile
+from findings import Finding
+from tally import TallyAccumulator
+from utils import int_to_bytes
+
+
+def ballot_context(*values: int) -> str:
+    """Returns the hex SHA-256 digest of the record values which the checks
+        on a cast ballot depend on, such as the joint public key and the
+        extended base hash."""
+    digest = sha256()
+    for value in values:
+        digest.update(int_to_bytes(value))
+    return digest.hexdigest()
+
+
+class BallotStatus:
+    """The result of verifying one cast ballot."""
+    """The digest of the ballot's contents when it was verified."""
+    digest: str
+    """The findings reported for the ballot, which is valid when empty."""
+    failures: List[Finding]
+
+    def __init__(self, digest: str, failures: List[Finding]) -> None:
+        self.digest = digest
+        self.failures = failures
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'BallotStatus':
+        assert isinstance(obj, dict)
+        return BallotStatus(obj["digest"],
+                            [Finding.from_dict(failure)
+                             for failure in obj["failures"]])
+
+    def to_dict(self) -> dict:
+        return {"digest": self.digest,
+                "failures": [failure.to_dict() for failure in self.failures]}
+
+
+class IncrementalState:
+    """The cast ballots verified by earlier runs over versions of an
+    election record, from which a later version with more ballots can be
+    verified by checking only the ballots which are new or changed.
+    """
+    """The digest of the record values the ballot checks depend on. State
+    for a different context is discarded.
+    """
+    context: str
+    """The status of each verified ballot, keyed by its tracker."""
+    ballots: Dict[str, BallotStatus]
+    """The tally accumulated from exactly the ballots in `ballots`."""
+    tally: TallyAccumulator
+
+    def __init__(self, context: str, ballots: Dict[str, BallotStatus],
+                 tally: TallyAccumulator) -> None:
+        self.context = context
+        self.ballots = ballots
+        self.tally = tally
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'IncrementalState':
+        assert isinstance(obj, dict)
+        return IncrementalState(obj["context"],
+                                {tracker: BallotStatus.from_dict(status)
+                                 for tracker, status in
+                                 obj["ballots"].items()},
+                                TallyAccumulator.from_dict(obj["tally"]))
+
+    def to_dict(self) -> dict:
+        return {"context": self.context,
+                "ballots": {tracker: status.to_dict()
+                            for tracker, status in self.ballots.items()},
+                "tally": self.tally.to_dict()}
+
+
+def load_state(path: str, context: str) -> Optional[IncrementalState]:
+    """Returns the incremental state stored at `path`, or None if there is
+        none for the ballot `context`."""
+    if not isfile(path):
+        return None
+    with open(path, 'r') as f:
+        state = IncrementalState.from_dict(load(f))
+    return state if state.context == context else None
+
+
+def save_state(path: str, state: IncrementalState) -> None:
+    """Stores `state` at `path`, replacing any previous state in a single
+        step so that an interruption cannot leave a partial file."""
+    with open(f"{path}.tmp", 'w') as f:
+        dump(state.to_dict(), f, default=int)
+    replace(f"{path}.tmp", path)
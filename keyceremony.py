@@ -0,0 +1,88 @@
+# ElectionGuard Verifier Key Ceremony Checks
+# Nicholas Boucher 2020
+from typing import Iterable, List, Optional, Tuple
+from batch import batch_holds
+from decryption import DecryptionContext
+from findings import Finding
+from models import TallyDecryption, TrusteePublicKey
+from proofs import Equation, ProofContext
+from utils import hash_elems
+
+# A trustee's coefficient commitment with the indices of the trustee and
+# the coefficient
+IndexedKey = Tuple[int, int, TrusteePublicKey]
+
+# Identifies the fragment public key `g^P_i(ℓ)` as `(i, ℓ)`
+FragmentKeyId = Tuple[int, int]
+
+
+def schnorr_equation(key: TrusteePublicKey, base_hash: int,
+                     ctx: ProofContext) -> Tuple[Optional[Finding],
+                                                 Optional[Equation]]:
+    """Checks the challenge hash of the Schnorr proof that the trustee knows
+        the secret coefficient of `key`, and returns the equation which
+        remains to be checked. The first value is a finding when the hash
+        check fails."""
+    h, c, u = key.proof.committment, key.proof.challenge, key.proof.response
+
+    # Test: The challenge is the hash of the base hash, key and commitment
+    expected = hash_elems(base_hash, key.public_key, h)
+    if expected != c:
+        return Finding("schnorr_challenge",
+                       "Schnorr proof challenge is not valid.",
+                       expected=expected, actual=c), None
+
+    # Test: `gᵘ = h Kᶜ`
+    return None, Equation(u, 0, [(h, 1), (key.public_key, c)],
+                          "schnorr_proof", "Schnorr proof is not valid.")
+
+
+def verify_key_chunk(ctx: ProofContext, base_hash: int, start: int,
+                     keys: List[IndexedKey]) -> List[Finding]:
+    """Checks the Schnorr proofs on a chunk of coefficient commitments,
+        returning the findings for the chunk in order."""
+    results: List[List[Finding]] = [[] for _ in keys]
+    equations: List[Tuple[int, Equation]] = []
+    for position, (_, _, key) in enumerate(keys):
+        failure, equation = schnorr_equation(key, base_hash, ctx)
+        if failure is not None:
+            results[position].append(failure)
+        else:
+            equations.append((position, equation))
+
+    # Check the proof equations, together when batching
+    if not (ctx.batch and batch_holds([eq for _, eq in equations], ctx)):
+        for position, equation in equations:
+            if not equation.holds(ctx):
+                results[position].append(equation.finding())
+
+    failures = []
+    for (trustee, coefficient, _), result in zip(keys, results):
+        for failure in result:
+            failure.trustee, failure.coefficient = trustee, coefficient
+            failures.append(failure)
+    return failures
+
+
+def fragment_key_ids(contest_tallies: Iterable[List[TallyDecryption]]
+                     ) -> List[FragmentKeyId]:
+    """Returns the fragment public keys needed to check the fragments of
+        absent trustees in the tallies, in sorted order."""
+    ids = set()
+    for tallies in contest_tallies:
+        for tally in tallies:
+            for trustee, share in enumerate(tally.shares):
+                for fragment in share.fragments or []:
+                    ids.add((trustee, fragment.trustee_index + 1))
+    return sorted(ids)
+
+
+def fragment_key_chunk(ctx: DecryptionContext, start: int,
+                       ids: List[FragmentKeyId]
+                       ) -> List[Tuple[FragmentKeyId, int]]:
+    """Computes the fragment public keys for a chunk of `(i, ℓ)` pairs."""
+    results = []
+    for trustee, x in ids:
+        if 0 <= trustee < len(ctx.trustee_keys) and x > 0:
+            results.append(((trustee, x), ctx.fragment_key(trustee, x)))
+    return results
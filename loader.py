@@ -0,0 +1,380 @@
+# ElectionGuard Verifier Streaming Record Loader
+# Nicholas Boucher 2020
+from typing import (Any, BinaryIO, Callable, Generic, Iterable, Iterator,
+                    List, Optional, Tuple, TypeVar, Union)
+from itertools import islice
+from json import loads
+import re
+from binary import (BinaryElectionRecord, encrypted_ballot_digest,
+                    is_binary_record, read_binary_ballot)
+from metrics import counters
+from models import (BallotDecryption, DecodeError, ElectionParameters,
+                    EncryptedBallot, LazyInt, TallyDecryption,
+                    TrusteePublicKey, from_int, from_list, from_str)
+
+
+T = TypeVar("T")
+
+# Number of bytes read from the record file at a time
+READ_SIZE = 1 << 20
+
+# Top-level record fields which are streamed rather than parsed eagerly
+STREAMED_FIELDS = ("cast_ballots", "spoiled_ballots")
+
+# The run of bytes, such as digits, before the next token which affects
+# nesting depth while skipping over a JSON value
+_STRUCTURE = re.compile(rb'[^"\[\]{}]*')
+
+# The rest of a JSON string up to its closing quote, which stops early at an
+# escape cut off by the end of the buffer
+_STRING_BODY = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
+# A JSON number or literal
+_SCALAR = re.compile(rb'[^\s,:\]}]*')
+
+# Integers with at least this many digits are decoded lazily
+LAZY_INT_DIGITS = 20
+
+# JSON insignificant whitespace
+_WHITESPACE = re.compile(rb'[ \t\n\r]*')
+
+
+class _JsonScanner:
+    """Reads JSON values one at a time from a file, holding only the bytes of
+    the value currently being read in memory.
+    """
+    file: BinaryIO
+    """Bytes read from the file but not yet consumed."""
+    buffer: bytearray
+    """The file offset of the first byte in the buffer."""
+    base: int
+    """The position of the next unconsumed byte in the buffer."""
+    pos: int
+    eof: bool
+    """The state of the scan of the value being read, which resumes where
+    it stopped when more of the file is read, so that each byte of a value
+    is scanned once: the buffer position at which to resume, the nesting
+    depth, and whether the scan stopped inside a string.
+    """
+    scan: int
+    depth: int
+    in_string: bool
+
+    def __init__(self, file: BinaryIO, offset: int = 0) -> None:
+        file.seek(offset)
+        self.file = file
+        self.buffer = bytearray()
+        self.base = offset
+        self.pos = 0
+        self.eof = False
+        self.scan = self.depth = 0
+        self.in_string = False
+
+    def offset(self) -> int:
+        """Returns the file offset of the next unconsumed byte."""
+        return self.base + self.pos
+
+    def fill(self) -> bool:
+        """Reads more of the file into the buffer, first discarding the
+            consumed bytes when they outnumber the rest. Returns false at the
+            end of the file."""
+        if self.eof:
+            return False
+        data = self.file.read(READ_SIZE)
+        if not data:
+            self.eof = True
+            return False
+        counters["bytes_read"] += len(data)
+        if self.pos > len(self.buffer) - self.pos:
+            del self.buffer[:self.pos]
+            self.base += self.pos
+            self.scan -= self.pos
+            self.pos = 0
+        self.buffer += data
+        return True
+
+    def peek(self) -> bytes:
+        """Skips whitespace and returns the next byte without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return bytes(self.buffer[self.pos:self.pos + 1])
+            if not self.fill():
+                raise ValueError("Unexpected end of election record at byte "
+                                 f"{self.offset()}.")
+
+    def expect(self, char: bytes) -> None:
+        """Consumes the next byte, which must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char.decode()!r} at byte "
+                             f"{self.offset()} of election record, found "
+                             f"{found.decode(errors='replace')!r}.")
+        self.pos += 1
+
+    def read_value(self) -> bytes:
+        """Consumes the next JSON value and returns its raw bytes."""
+        self.peek()
+        self.scan, self.depth, self.in_string = self.pos, 0, False
+        while True:
+            end = self._value_end()
+            if end is not None:
+                value = bytes(self.buffer[self.pos:end])
+                self.pos = end
+                return value
+            if not self.fill():
+                raise ValueError("Unexpected end of election record at byte "
+                                 f"{self.offset()}.")
+
+    def _value_end(self) -> Optional[int]:
+        """Returns the buffer position after the value starting at the current
+            position, or None if more of the file must be read first."""
+        buffer, pos = self.buffer, self.scan
+        if buffer[self.pos] not in b'"{[':
+            pos = self.scan = _SCALAR.match(buffer, pos).end()
+            return pos if pos < len(buffer) or self.eof else None
+        while True:
+            if self.in_string:
+                pos = _STRING_BODY.match(buffer, pos).end()
+                if pos == len(buffer) or buffer[pos] != ord('"'):
+                    self.scan = pos
+                    return None
+                pos += 1
+                self.in_string = False
+                if self.depth == 0:
+                    return pos
+                continue
+            pos = _STRUCTURE.match(buffer, pos).end()
+            if pos == len(buffer):
+                self.scan = pos
+                return None
+            token = buffer[pos]
+            pos += 1
+            if token == ord('"'):
+                self.in_string = True
+            elif token in b'{[':
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return pos
+
+    def iter_array(self) -> Iterator[Tuple[int, bytes]]:
+        """Consumes a JSON array, yielding the file offset and raw bytes of
+            each element."""
+        self.expect(b'[')
+        if self.peek() == b']':
+            self.pos += 1
+            return
+        while True:
+            offset = self.offset()
+            yield offset, self.read_value()
+            if self.peek() == b']':
+                self.pos += 1
+                return
+            self.expect(b',')
+
+
+class RecordStream(Generic[T]):
+    """A re-iterable sequence of ballots stored in a JSON array of a record
+    file. Ballots are decoded one at a time as they are iterated over.
+    """
+    """The path of the record file."""
+    path: str
+    """The name of the record field holding the array."""
+    field: str
+    """The file offset of the start of the JSON array."""
+    offset: int
+    """The number of elements in the array."""
+    length: int
+    """Decodes one parsed array element."""
+    decode: Callable[[Any], T]
+    """Whether large integers are kept as `LazyInt` digits when parsed."""
+    lazy_ints: bool
+
+    def __init__(self, path: str, field: str, offset: int, length: int,
+                 decode: Callable[[Any], T], lazy_ints: bool = False) -> None:
+        self.path = path
+        self.field = field
+        self.offset = offset
+        self.length = length
+        self.decode = decode
+        self.lazy_ints = lazy_ints
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[T]:
+        return self.iter_from(0)
+
+    def iter_from(self, start: int) -> Iterator[T]:
+        """Iterates over the ballots from index `start` onwards. Earlier
+            ballots are skipped over without being parsed."""
+        return (item for _, item in self.iter_located(start))
+
+    def iter_located(self, start: int = 0) -> Iterator[Tuple[int, T]]:
+        """Iterates over the file offset and decoding of each ballot from
+            index `start` onwards."""
+        with open(self.path, 'rb') as f:
+            scanner = _JsonScanner(f, self.offset)
+            for index, (offset, raw) in enumerate(scanner.iter_array()):
+                if index >= start:
+                    yield offset, self._decode(index, raw)
+
+    def iter_positions(self, positions: Iterable[int]) -> Iterator[T]:
+        """Iterates over the ballots at the increasing indices `positions`.
+            Other ballots are skipped over without being parsed."""
+        wanted = iter(positions)
+        position = next(wanted, None)
+        if position is None:
+            return
+        with open(self.path, 'rb') as f:
+            scanner = _JsonScanner(f, self.offset)
+            for index, (_, raw) in enumerate(scanner.iter_array()):
+                if index == position:
+                    yield self._decode(index, raw)
+                    position = next(wanted, None)
+                    if position is None:
+                        return
+
+    def _decode(self, index: int, raw: bytes) -> T:
+        """Decodes the raw bytes of the ballot at `index`."""
+        counters["bytes_parsed"] += len(raw)
+        try:
+            return self.decode(loads(raw, parse_int=_lazy_int)
+                               if self.lazy_ints else loads(raw))
+        except DecodeError as e:
+            raise e.within(f"{self.field}[{index}]")
+
+
+class ElectionRecordStream:
+    """An election record whose header fields are parsed eagerly, while cast
+    and spoiled ballots are streamed from the record file on demand. Provides
+    the same fields as `ElectionRecord`.
+    """
+    base_hash: str
+    cast_ballots: RecordStream[EncryptedBallot]
+    contest_tallies: List[List[TallyDecryption]]
+    extended_base_hash: str
+    joint_public_key: int
+    parameters: ElectionParameters
+    spoiled_ballots: RecordStream[BallotDecryption]
+    trustee_public_keys: List[List[TrusteePublicKey]]
+
+    def __init__(self, base_hash: str,
+                 cast_ballots: RecordStream[EncryptedBallot],
+                 contest_tallies: List[List[TallyDecryption]],
+                 extended_base_hash: str, joint_public_key: int,
+                 parameters: ElectionParameters,
+                 spoiled_ballots: RecordStream[BallotDecryption],
+                 trustee_public_keys: List[List[TrusteePublicKey]]) -> None:
+        self.base_hash = base_hash
+        self.cast_ballots = cast_ballots
+        self.contest_tallies = contest_tallies
+        self.extended_base_hash = extended_base_hash
+        self.joint_public_key = joint_public_key
+        self.parameters = parameters
+        self.spoiled_ballots = spoiled_ballots
+        self.trustee_public_keys = trustee_public_keys
+
+
+def _lazy_int(digits: str) -> Union[int, LazyInt]:
+    """Parses a JSON integer, deferring the conversion of large ones."""
+    if len(digits) < LAZY_INT_DIGITS:
+        return int(digits)
+    return LazyInt(digits)
+
+
+def iter_from(ballots: Iterable[T], start: int) -> Iterator[T]:
+    """Iterates over `ballots` from index `start` onwards, skipping earlier
+        ballots without decoding them where the sequence supports it."""
+    if hasattr(ballots, "iter_from"):
+        return ballots.iter_from(start)
+    return islice(ballots, start, None)
+
+
+def iter_positions(ballots: Iterable[T], positions: Iterable[int]
+                   ) -> Iterator[T]:
+    """Iterates over the elements of `ballots` at the increasing indices
+        `positions`, without decoding the others where the sequence supports
+        it."""
+    if hasattr(ballots, "iter_positions"):
+        return ballots.iter_positions(positions)
+    if hasattr(ballots, "__getitem__"):
+        return (ballots[position] for position in positions)
+    wanted = set(positions)
+    return (ballot for index, ballot in enumerate(ballots)
+            if index in wanted)
+
+
+def iter_digests(ballots: Iterable[EncryptedBallot]
+                 ) -> Iterator[Tuple[str, str]]:
+    """Iterates over the tracker and digest of each cast ballot in
+        `ballots`. Digests identify a ballot's contents independently of the
+        record format, and are read without decoding the ballots where the
+        sequence supports it."""
+    if hasattr(ballots, "iter_digests"):
+        return ballots.iter_digests()
+    return ((ballot.ballot_info.tracker, encrypted_ballot_digest(ballot))
+            for ballot in ballots)
+
+
+def read_cast_ballot(path: str, offset: int) -> EncryptedBallot:
+    """Decodes the single cast ballot at file `offset` of the record file at
+        `path`, as located by `iter_located`."""
+    if is_binary_record(path):
+        return read_binary_ballot(path, offset)
+    with open(path, 'rb') as f:
+        raw = _JsonScanner(f, offset).read_value()
+    counters["bytes_parsed"] += len(raw)
+    return EncryptedBallot.from_dict(loads(raw))
+
+
+def load_election_record(path: str, lazy_ints: bool = False
+                         ) -> Union[ElectionRecordStream,
+                                    BinaryElectionRecord]:
+    """Loads the election record file at `path`. Binary records are memory
+        mapped. For JSON records, a single pass over the file parses the
+        header fields and indexes the ballot arrays without decoding any
+        ballots. With `lazy_ints`, the large integers of cast ballots in a
+        JSON record are converted from decimal only when first read."""
+    if is_binary_record(path):
+        return BinaryElectionRecord(path)
+
+    header = {}
+    streams = {}
+    with open(path, 'rb') as f:
+        scanner = _JsonScanner(f)
+        scanner.expect(b'{')
+        while scanner.peek() != b'}':
+            key = loads(scanner.read_value())
+            scanner.expect(b':')
+            if key in STREAMED_FIELDS:
+                offset = scanner.offset()
+                length = sum(1 for _ in scanner.iter_array())
+                streams[key] = (offset, length)
+            else:
+                raw = scanner.read_value()
+                counters["bytes_parsed"] += len(raw)
+                header[key] = loads(raw)
+            if scanner.peek() == b',':
+                scanner.pos += 1
+
+    # Ensure the streamed fields are present before building the record
+    for key in STREAMED_FIELDS:
+        if key not in streams:
+            raise ValueError(f"Election record is missing field {key!r}.")
+
+    return ElectionRecordStream(
+        from_str(header.get("base_hash")),
+        RecordStream(path, "cast_ballots", *streams["cast_ballots"],
+                     EncryptedBallot.from_dict, lazy_ints),
+        from_list(lambda x: from_list(TallyDecryption.from_dict, x),
+                  header.get("contest_tallies")),
+        from_str(header.get("extended_base_hash")),
+        from_int(header.get("joint_public_key")),
+        ElectionParameters.from_dict(header.get("parameters")),
+        RecordStream(path, "spoiled_ballots", *streams["spoiled_ballots"],
+                     BallotDecryption.from_dict),
+        from_list(lambda x: from_list(TrusteePublicKey.from_dict, x),
+                  header.get("trustee_public_keys")))
@@ -0,0 +1,185 @@
+# ElectionGuard Verifier Subgroup Membership Checks
+# Nicholas Boucher 2020
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from secrets import randbits
+from arithmetic import mulmod, powmod
+from batch import BATCH_SECURITY
+from findings import Finding
+from models import (BallotDecryption, ChaumPedersonProof, DecryptionShare,
+                    ElGamalMessage, EncryptedBallot, TallyDecryption,
+                    TrusteePublicKey)
+
+# Elements are combined in blocks of this many, whose subset products are
+# tabulated so that each random subset costs one multiplication per block
+MEMBERSHIP_WINDOW = 5
+
+# Batches of at most this many elements are checked one element at a time,
+# which costs no more exponentiations than the rounds of a batch check
+MEMBERSHIP_LEAF = BATCH_SECURITY
+
+# Where a group element appears in the record, as the name of the element
+# along with the location fields of a `Finding`
+Location = Dict[str, Any]
+
+# A group element tagged with a key identifying where it appears
+Element = Tuple[Any, int]
+
+
+def is_member(x: int, prime: int, order: int) -> bool:
+    """Returns true when `x` lies in the subgroup of order `order` of the
+        integers modulo `prime`."""
+    return 0 < x < prime and powmod(x, order, prime) == 1
+
+
+def batch_members(values: List[int], prime: int, order: int) -> bool:
+    """Returns true when every value is likely a member of the subgroup of
+        order `order`. Each of `BATCH_SECURITY` rounds checks that the
+        product of a random subset of the values lies in the subgroup. A
+        non-member leaves the product outside the subgroup in at least half
+        of the subsets, so a batch containing one passes with probability at
+        most `2^-BATCH_SECURITY`, while a batch of members always passes.
+        Small batches are checked one value at a time instead."""
+    if len(values) <= MEMBERSHIP_LEAF:
+        return all(is_member(x, prime, order) for x in values)
+    if not all(0 < x < prime for x in values):
+        return False
+    masks = [randbits(len(values)) for _ in range(BATCH_SECURITY)]
+    products = [1] * BATCH_SECURITY
+    window = (1 << MEMBERSHIP_WINDOW) - 1
+    for block in range(0, len(values), MEMBERSHIP_WINDOW):
+        # Tabulate the product of every subset of the block
+        subsets = [1]
+        for x in values[block:block + MEMBERSHIP_WINDOW]:
+            subsets.extend([mulmod(subset, x, prime) for subset in subsets])
+        for index, mask in enumerate(masks):
+            bits = (mask >> block) & window
+            if bits:
+                products[index] = mulmod(products[index], subsets[bits],
+                                         prime)
+    return all(powmod(product, order, prime) == 1 for product in products)
+
+
+def find_non_members(values: List[int], prime: int, order: int,
+                     offset: int = 0) -> List[int]:
+    """Returns the indices, counted from `offset`, of the values which are not
+        members of the subgroup of order `order`, bisecting `values` and
+        discarding each half whose batch passes."""
+    if len(values) <= MEMBERSHIP_LEAF:
+        return [offset + index for index, x in enumerate(values)
+                if not is_member(x, prime, order)]
+
+    non_members = []
+    middle = len(values) // 2
+    for start, half in ((0, values[:middle]), (middle, values[middle:])):
+        if not batch_members(half, prime, order):
+            non_members.extend(find_non_members(half, prime, order,
+                                                offset + start))
+    return non_members
+
+
+def membership_failures(elements: Iterable[Element], prime: int,
+                        order: int) -> List[Any]:
+    """Checks that every element lies in the subgroup of order `order` as a
+        single batch, returning the keys of any non-members in order."""
+    elements = list(elements)
+    values = [value for _, value in elements]
+    if len(values) > MEMBERSHIP_LEAF and batch_members(values, prime, order):
+        return []
+    return [elements[index][0]
+            for index in find_non_members(values, prime, order)]
+
+
+def non_member(location: Location) -> Finding:
+    """Returns the finding for a non-member at `location`."""
+    location = dict(location)
+    element = location.pop("element")
+    return Finding("membership", f"{element} is not a member of the subgroup "
+                                 "of order q.", **location)
+
+
+def message_elements(name: str, message: ElGamalMessage,
+                     **location: Any) -> Iterator[Element]:
+    """Yields the group elements of an ElGamal message."""
+    yield dict(location, element=f"{name} public key"), message.public_key
+    yield dict(location, element=f"{name} ciphertext"), message.ciphertext
+
+
+def proof_elements(name: str, proof: ChaumPedersonProof,
+                   **location: Any) -> Iterator[Element]:
+    """Yields the group elements of a Chaum-Pedersen proof commitment."""
+    yield from message_elements(f"{name} commitment", proof.committment,
+                                **location)
+
+
+def share_elements(name: str, share: DecryptionShare,
+                   **location: Any) -> Iterator[Element]:
+    """Yields the group elements of a decryption share and its fragments."""
+    yield dict(location, element=name), share.share
+    yield from proof_elements(f"{name} proof", share.proof, **location)
+    for index, fragment in enumerate(share.fragments or []):
+        yield (dict(location, element=f"{name}: Fragment {index}"),
+               fragment.fragment)
+        yield from proof_elements(f"{name}: Fragment {index} proof",
+                                  fragment.proof, **location)
+
+
+def encrypted_ballot_elements(ballot: EncryptedBallot) -> Iterator[Element]:
+    """Yields the group elements of a cast ballot."""
+    for contest_index, contest in enumerate(ballot.contests):
+        for selection_index, selection in enumerate(contest.selections):
+            location = {"contest": contest_index,
+                        "selection": selection_index}
+            yield from message_elements("Message", selection.message,
+                                        **location)
+            yield from proof_elements("Zero proof", selection.zero_proof,
+                                      **location)
+            yield from proof_elements("One proof", selection.one_proof,
+                                      **location)
+        yield from proof_elements("Number of selections proof",
+                                  contest.num_selections_proof,
+                                  contest=contest_index)
+
+
+def ballot_decryption_elements(ballot: BallotDecryption
+                               ) -> Iterator[Element]:
+    """Yields the group elements of a spoiled ballot."""
+    for contest_index, contest in enumerate(ballot.contests):
+        for selection_index, selection in enumerate(contest):
+            location = {"contest": contest_index,
+                        "selection": selection_index}
+            yield (dict(location, element="Decrypted message"),
+                   selection.decrypted_message)
+            yield from message_elements("Encrypted message",
+                                        selection.encrypted_message,
+                                        **location)
+            for share_index, share in enumerate(selection.shares):
+                yield from share_elements(f"Share {share_index}", share,
+                                          **location)
+
+
+def tally_elements(contest_tallies: Iterable[List[TallyDecryption]]
+                   ) -> Iterator[Element]:
+    """Yields the group elements of the decrypted contest tallies."""
+    for contest_index, tallies in enumerate(contest_tallies):
+        for selection_index, tally in enumerate(tallies):
+            location = {"source": "tally", "contest": contest_index,
+                        "selection": selection_index}
+            yield (dict(location, element="Decryption"),
+                   tally.decrypted_tally)
+            yield from message_elements("Encryption", tally.encrypted_tally,
+                                        **location)
+            for share_index, share in enumerate(tally.shares):
+                yield from share_elements(f"Share {share_index}", share,
+                                          **location)
+
+
+def trustee_elements(trustee_public_keys: Iterable[List[TrusteePublicKey]]
+                     ) -> Iterator[Element]:
+    """Yields the group elements of the trustee public keys."""
+    for trustee_index, trustee in enumerate(trustee_public_keys):
+        for coefficient_index, key in enumerate(trustee):
+            location = {"trustee": trustee_index,
+                        "coefficient": coefficient_index}
+            yield dict(location, element="Public key"), key.public_key
+            yield (dict(location, element="Proof commitment"),
+                   key.proof.committment)
@@ -0,0 +1,75 @@
+# ElectionGuard Verifier Instrumentation
+# Nicholas Boucher 2020
+from typing import Any, Callable, Dict, Iterator, Optional
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+import tracemalloc
+
+# Counts of hot-path operations performed by this process, such as modular
+# exponentiations, proof hashes and record bytes parsed. Counts from worker
+# processes are merged in by `parallel.map_chunks`.
+counters: Counter = Counter()
+
+# The measurements of each verification stage run by this process, in the
+# order the stages were first entered
+_stages: Dict[str, Dict[str, float]] = {}
+
+# Called with each progress event of this process, such as a stage starting
+# or finishing, when set
+_listener: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+def set_listener(listener: Optional[Callable[[Dict[str, Any]], None]]
+                 ) -> None:
+    """Sets the function called with each progress event, or removes it."""
+    global _listener
+    _listener = listener
+
+
+def notify(event: Dict[str, Any]) -> None:
+    """Passes the progress `event` to the listener, if there is one."""
+    if _listener is not None:
+        _listener(event)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times the enclosed block as the verification stage `name`. When
+        tracemalloc is tracing, the stage's peak traced memory is recorded
+        as well. Repeated stages accumulate their times. The listener is
+        notified as the stage starts and finishes."""
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    notify({"type": "stage", "stage": name, "status": "started"})
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        seconds = perf_counter() - start
+        record = _stages.setdefault(name, {"seconds": 0.0})
+        record["seconds"] += seconds
+        notify({"type": "stage", "stage": name, "status": "finished",
+                "seconds": seconds})
+        if tracing:
+            record["peak_traced_bytes"] = max(
+                record.get("peak_traced_bytes", 0),
+                tracemalloc.get_traced_memory()[1])
+
+
+def merge_counters(counts: Dict[str, int]) -> None:
+    """Adds counts taken in another process to this process's counters."""
+    counters.update(counts)
+
+
+def reset() -> None:
+    """Discards all measurements taken so far."""
+    counters.clear()
+    _stages.clear()
+
+
+def report() -> Dict[str, Any]:
+    """Returns the measurements taken so far as JSON-compatible values."""
+    return {"stages": {name: dict(record) for name, record in _stages.items()},
+            "counters": dict(sorted(counters.items()))}
@@ -11,12 +11,24 @@
 #     result = election_record_from_dict(json.loads(json_string))
 from typing import Any, List, Optional, TypeVar, Type, cast, Callable
 from enum import Enum
+from arithmetic import parse_int
 
 
 T = TypeVar("T")
 EnumT = TypeVar("EnumT", bound=Enum)
 
 
+class LazyInt(str):
+    """The decimal digits of a large integer read from a record, kept until
+    the field holding the integer is first read.
+    """
+    __slots__ = ()
+
+
+# Types accepted for integer fields which may be decoded lazily
+_INTEGER = (int, LazyInt)
+
+
 def from_str(x: Any) -> str:
     assert isinstance(x, str)
     return x
@@ -51,6 +63,10 @@ def from_union(fs, x):
     assert False
 
 
+def from_optional(f: Callable[[Any], T], x: Any) -> Optional[T]:
+    return None if x is None else f(x)
+
+
 def from_bool(x: Any) -> bool:
     assert isinstance(x, bool)
     return x
@@ -82,6 +98,8 @@ class BallotInformation:
     """The tracker code generated for this ballot."""
     tracker: str
 
+    __slots__ = ("date", "device_info", "time", "tracker")
+
     def __init__(self, date: str, device_info: str, time: str, tracker: str) -> None:
         self.date = date
         self.device_info = device_info
@@ -90,12 +108,7 @@ class BallotInformation:
 
     @staticmethod
     def from_dict(obj: Any) -> 'BallotInformation':
-        assert isinstance(obj, dict)
-        date = from_str(obj.get("date"))
-        device_info = from_str(obj.get("device_info"))
-        time = from_str(obj.get("time"))
-        tracker = from_str(obj.get("tracker"))
-        return BallotInformation(date, device_info, time, tracker)
+        return decode_ballot_information(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -122,16 +135,27 @@ class ElGamalMessage:
     """The one-time public key `a = gʳ`, where `r` is the randomly generated one-time public key."""
     public_key: int
 
+    __slots__ = ("_ciphertext", "_public_key")
+
     def __init__(self, ciphertext: int, public_key: int) -> None:
-        self.ciphertext = ciphertext
-        self.public_key = public_key
+        self._ciphertext = ciphertext
+        self._public_key = public_key
+
+    @property
+    def ciphertext(self) -> int:
+        if type(self._ciphertext) is LazyInt:
+            self._ciphertext = parse_int(self._ciphertext)
+        return self._ciphertext
+
+    @property
+    def public_key(self) -> int:
+        if type(self._public_key) is LazyInt:
+            self._public_key = parse_int(self._public_key)
+        return self._public_key
 
     @staticmethod
     def from_dict(obj: Any) -> 'ElGamalMessage':
-        assert isinstance(obj, dict)
-        ciphertext = from_int(obj.get("ciphertext"))
-        public_key = from_int(obj.get("public_key"))
-        return ElGamalMessage(ciphertext, public_key)
+        return decode_elgamal_message(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -169,18 +193,28 @@ class ChaumPedersonProof:
     """
     response: int
 
+    __slots__ = ("_challenge", "committment", "_response")
+
     def __init__(self, challenge: int, committment: ElGamalMessage, response: int) -> None:
-        self.challenge = challenge
+        self._challenge = challenge
         self.committment = committment
-        self.response = response
+        self._response = response
+
+    @property
+    def challenge(self) -> int:
+        if type(self._challenge) is LazyInt:
+            self._challenge = parse_int(self._challenge)
+        return self._challenge
+
+    @property
+    def response(self) -> int:
+        if type(self._response) is LazyInt:
+            self._response = parse_int(self._response)
+        return self._response
 
     @staticmethod
     def from_dict(obj: Any) -> 'ChaumPedersonProof':
-        assert isinstance(obj, dict)
-        challenge = from_int(obj.get("challenge"))
-        committment = ElGamalMessage.from_dict(obj.get("committment"))
-        response = from_int(obj.get("response"))
-        return ChaumPedersonProof(challenge, committment, response)
+        return decode_chaum_pederson_proof(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -203,6 +237,8 @@ class EncryptedSelection:
     one_proof: ChaumPedersonProof
     zero_proof: ChaumPedersonProof
 
+    __slots__ = ("message", "one_proof", "zero_proof")
+
     def __init__(self, message: ElGamalMessage, one_proof: ChaumPedersonProof, zero_proof: ChaumPedersonProof) -> None:
         self.message = message
         self.one_proof = one_proof
@@ -210,11 +246,7 @@ class EncryptedSelection:
 
     @staticmethod
     def from_dict(obj: Any) -> 'EncryptedSelection':
-        assert isinstance(obj, dict)
-        message = ElGamalMessage.from_dict(obj.get("message"))
-        one_proof = ChaumPedersonProof.from_dict(obj.get("one_proof"))
-        zero_proof = ChaumPedersonProof.from_dict(obj.get("zero_proof"))
-        return EncryptedSelection(message, one_proof, zero_proof)
+        return decode_encrypted_selection(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -237,6 +269,8 @@ class EncryptedContest:
     """The encrypted selections made on the ballot."""
     selections: List[EncryptedSelection]
 
+    __slots__ = ("max_selections", "num_selections_proof", "selections")
+
     def __init__(self, max_selections: int, num_selections_proof: ChaumPedersonProof, selections: List[EncryptedSelection]) -> None:
         self.max_selections = max_selections
         self.num_selections_proof = num_selections_proof
@@ -244,11 +278,7 @@ class EncryptedContest:
 
     @staticmethod
     def from_dict(obj: Any) -> 'EncryptedContest':
-        assert isinstance(obj, dict)
-        max_selections = from_int(obj.get("max_selections"))
-        num_selections_proof = ChaumPedersonProof.from_dict(obj.get("num_selections_proof"))
-        selections = from_list(EncryptedSelection.from_dict, obj.get("selections"))
-        return EncryptedContest(max_selections, num_selections_proof, selections)
+        return decode_encrypted_contest(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -265,16 +295,15 @@ class EncryptedBallot:
     ballot_info: BallotInformation
     contests: List[EncryptedContest]
 
+    __slots__ = ("ballot_info", "contests")
+
     def __init__(self, ballot_info: BallotInformation, contests: List[EncryptedContest]) -> None:
         self.ballot_info = ballot_info
         self.contests = contests
 
     @staticmethod
     def from_dict(obj: Any) -> 'EncryptedBallot':
-        assert isinstance(obj, dict)
-        ballot_info = BallotInformation.from_dict(obj.get("ballot_info"))
-        contests = from_list(EncryptedContest.from_dict, obj.get("contests"))
-        return EncryptedBallot(ballot_info, contests)
+        return decode_encrypted_ballot(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -300,6 +329,8 @@ class DecryptionFragment:
     """The index of the trustee who produced this fragment."""
     trustee_index: int
 
+    __slots__ = ("fragment", "lagrange_coefficient", "proof", "trustee_index")
+
     def __init__(self, fragment: int, lagrange_coefficient: int, proof: ChaumPedersonProof, trustee_index: int) -> None:
         self.fragment = fragment
         self.lagrange_coefficient = lagrange_coefficient
@@ -308,12 +339,7 @@ class DecryptionFragment:
 
     @staticmethod
     def from_dict(obj: Any) -> 'DecryptionFragment':
-        assert isinstance(obj, dict)
-        fragment = from_int(obj.get("fragment"))
-        lagrange_coefficient = from_int(obj.get("lagrange_coefficient"))
-        proof = ChaumPedersonProof.from_dict(obj.get("proof"))
-        trustee_index = from_int(obj.get("trustee_index"))
-        return DecryptionFragment(fragment, lagrange_coefficient, proof, trustee_index)
+        return decode_decryption_fragment(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -335,6 +361,8 @@ class DecryptionShare:
     """The share of the decrypted message `M_i`."""
     share: int
 
+    __slots__ = ("fragments", "proof", "share")
+
     def __init__(self, fragments: Optional[List[DecryptionFragment]], proof: ChaumPedersonProof, share: int) -> None:
         self.fragments = fragments
         self.proof = proof
@@ -342,11 +370,7 @@ class DecryptionShare:
 
     @staticmethod
     def from_dict(obj: Any) -> 'DecryptionShare':
-        assert isinstance(obj, dict)
-        fragments = from_union([lambda x: from_list(DecryptionFragment.from_dict, x), from_none], obj.get("fragments"))
-        proof = ChaumPedersonProof.from_dict(obj.get("proof"))
-        share = from_int(obj.get("share"))
-        return DecryptionShare(fragments, proof, share)
+        return decode_decryption_share(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -366,6 +390,8 @@ class TallyDecryption:
     """The decryption shares `M_i` used to compute the decrypted tally `M`."""
     shares: List[DecryptionShare]
 
+    __slots__ = ("cleartext", "decrypted_tally", "encrypted_tally", "shares")
+
     def __init__(self, cleartext: int, decrypted_tally: int, encrypted_tally: ElGamalMessage, shares: List[DecryptionShare]) -> None:
         self.cleartext = cleartext
         self.decrypted_tally = decrypted_tally
@@ -396,6 +422,8 @@ class BallotStyle:
     party_id: Optional[str]
     precincts: List[str]
 
+    __slots__ = ("districts", "id", "party_id", "precincts")
+
     def __init__(self, districts: List[str], id: str, party_id: Optional[str], precincts: List[str]) -> None:
         self.districts = districts
         self.id = id
@@ -407,7 +435,7 @@ class BallotStyle:
         assert isinstance(obj, dict)
         districts = from_list(from_str, obj.get("districts"))
         id = from_str(obj.get("id"))
-        party_id = from_union([from_str, from_none], obj.get("partyId"))
+        party_id = from_optional(from_str, obj.get("partyId"))
         precincts = from_list(from_str, obj.get("precincts"))
         return BallotStyle(districts, id, party_id, precincts)
 
@@ -425,6 +453,8 @@ class BMDConfig:
     show_help_page: Optional[bool]
     show_settings_page: Optional[bool]
 
+    __slots__ = ("require_activation", "show_help_page", "show_settings_page")
+
     def __init__(self, require_activation: Optional[bool], show_help_page: Optional[bool], show_settings_page: Optional[bool]) -> None:
         self.require_activation = require_activation
         self.show_help_page = show_help_page
@@ -433,9 +463,9 @@ class BMDConfig:
     @staticmethod
     def from_dict(obj: Any) -> 'BMDConfig':
         assert isinstance(obj, dict)
-        require_activation = from_union([from_bool, from_none], obj.get("requireActivation"))
-        show_help_page = from_union([from_bool, from_none], obj.get("showHelpPage"))
-        show_settings_page = from_union([from_bool, from_none], obj.get("showSettingsPage"))
+        require_activation = from_optional(from_bool, obj.get("requireActivation"))
+        show_help_page = from_optional(from_bool, obj.get("showHelpPage"))
+        show_settings_page = from_optional(from_bool, obj.get("showSettingsPage"))
         return BMDConfig(require_activation, show_help_page, show_settings_page)
 
     def to_dict(self) -> dict:
@@ -452,6 +482,8 @@ class Candidate:
     name: str
     party_id: Optional[str]
 
+    __slots__ = ("id", "is_write_in", "name", "party_id")
+
     def __init__(self, id: str, is_write_in: Optional[bool], name: str, party_id: Optional[str]) -> None:
         self.id = id
         self.is_write_in = is_write_in
@@ -462,9 +494,9 @@ class Candidate:
     def from_dict(obj: Any) -> 'Candidate':
         assert isinstance(obj, dict)
         id = from_str(obj.get("id"))
-        is_write_in = from_union([from_bool, from_none], obj.get("isWriteIn"))
+        is_write_in = from_optional(from_bool, obj.get("isWriteIn"))
         name = from_str(obj.get("name"))
-        party_id = from_union([from_str, from_none], obj.get("partyId"))
+        party_id = from_optional(from_str, obj.get("partyId"))
         return Candidate(id, is_write_in, name, party_id)
 
     def to_dict(self) -> dict:
@@ -494,6 +526,8 @@ class Contest:
     description: Optional[str]
     short_title: Optional[str]
 
+    __slots__ = ("allow_write_ins", "candidates", "district_id", "id", "party_id", "seats", "section", "title", "type", "description", "short_title")
+
     def __init__(self, allow_write_ins: Optional[bool], candidates: Optional[List[Candidate]], district_id: str, id: str, party_id: Optional[str], seats: Optional[float], section: str, title: str, type: TypeEnum, description: Optional[str], short_title: Optional[str]) -> None:
         self.allow_write_ins = allow_write_ins
         self.candidates = candidates
@@ -510,17 +544,17 @@ class Contest:
     @staticmethod
     def from_dict(obj: Any) -> 'Contest':
         assert isinstance(obj, dict)
-        allow_write_ins = from_union([from_bool, from_none], obj.get("allowWriteIns"))
-        candidates = from_union([lambda x: from_list(Candidate.from_dict, x), from_none], obj.get("candidates"))
+        allow_write_ins = from_optional(from_bool, obj.get("allowWriteIns"))
+        candidates = from_optional(lambda x: from_list(Candidate.from_dict, x), obj.get("candidates"))
         district_id = from_str(obj.get("districtId"))
         id = from_str(obj.get("id"))
-        party_id = from_union([from_str, from_none], obj.get("partyId"))
-        seats = from_union([from_float, from_none], obj.get("seats"))
+        party_id = from_optional(from_str, obj.get("partyId"))
+        seats = from_optional(from_float, obj.get("seats"))
         section = from_str(obj.get("section"))
         title = from_str(obj.get("title"))
         type = TypeEnum(obj.get("type"))
-        description = from_union([from_str, from_none], obj.get("description"))
-        short_title = from_union([from_str, from_none], obj.get("shortTitle"))
+        description = from_optional(from_str, obj.get("description"))
+        short_title = from_optional(from_str, obj.get("shortTitle"))
         return Contest(allow_write_ins, candidates, district_id, id, party_id, seats, section, title, type, description, short_title)
 
     def to_dict(self) -> dict:
@@ -543,6 +577,8 @@ class County:
     id: str
     name: str
 
+    __slots__ = ("id", "name")
+
     def __init__(self, id: str, name: str) -> None:
         self.id = id
         self.name = name
@@ -565,6 +601,8 @@ class District:
     id: str
     name: str
 
+    __slots__ = ("id", "name")
+
     def __init__(self, id: str, name: str) -> None:
         self.id = id
         self.name = name
@@ -588,6 +626,8 @@ class Party:
     id: str
     name: str
 
+    __slots__ = ("abbrev", "id", "name")
+
     def __init__(self, abbrev: str, id: str, name: str) -> None:
         self.abbrev = abbrev
         self.id = id
@@ -613,6 +653,8 @@ class Precinct:
     id: str
     name: str
 
+    __slots__ = ("id", "name")
+
     def __init__(self, id: str, name: str) -> None:
         self.id = id
         self.name = name
@@ -646,6 +688,8 @@ class BallotCoding:
     state: str
     title: str
 
+    __slots__ = ("ballot_styles", "bmd_config", "contests", "county", "date", "districts", "parties", "precincts", "seal", "seal_url", "state", "title")
+
     def __init__(self, ballot_styles: List[BallotStyle], bmd_config: Optional[BMDConfig], contests: List[Contest], county: County, date: str, districts: List[District], parties: List[Party], precincts: List[Precinct], seal: Optional[str], seal_url: Optional[str], state: str, title: str) -> None:
         self.ballot_styles = ballot_styles
         self.bmd_config = bmd_config
@@ -664,15 +708,15 @@ class BallotCoding:
     def from_dict(obj: Any) -> 'BallotCoding':
         assert isinstance(obj, dict)
         ballot_styles = from_list(BallotStyle.from_dict, obj.get("ballotStyles"))
-        bmd_config = from_union([BMDConfig.from_dict, from_none], obj.get("bmdConfig"))
+        bmd_config = from_optional(BMDConfig.from_dict, obj.get("bmdConfig"))
         contests = from_list(Contest.from_dict, obj.get("contests"))
         county = County.from_dict(obj.get("county"))
         date = from_str(obj.get("date"))
         districts = from_list(District.from_dict, obj.get("districts"))
         parties = from_list(Party.from_dict, obj.get("parties"))
         precincts = from_list(Precinct.from_dict, obj.get("precincts"))
-        seal = from_union([from_str, from_none], obj.get("seal"))
-        seal_url = from_union([from_str, from_none], obj.get("sealURL"))
+        seal = from_optional(from_str, obj.get("seal"))
+        seal_url = from_optional(from_str, obj.get("sealURL"))
         state = from_str(obj.get("state"))
         title = from_str(obj.get("title"))
         return BallotCoding(ballot_styles, bmd_config, contests, county, date, districts, parties, precincts, seal, seal_url, state, title)
@@ -711,6 +755,8 @@ class ElectionParameters:
     """The threshold `k` of trustees required to complete verification."""
     threshold: int
 
+    __slots__ = ("ballot_coding_file", "date", "generator", "location", "num_trustees", "prime", "threshold")
+
     def __init__(self, ballot_coding_file: BallotCoding, date: str, generator: int, location: str, num_trustees: int, prime: int, threshold: int) -> None:
         self.ballot_coding_file = ballot_coding_file
         self.date = date
@@ -757,6 +803,8 @@ class SelectionDecryption:
     """The decryption shares `M_i` used to compute the decryption `M`."""
     shares: List[DecryptionShare]
 
+    __slots__ = ("cleartext", "decrypted_message", "encrypted_message", "shares")
+
     def __init__(self, cleartext: int, decrypted_message: int, encrypted_message: ElGamalMessage, shares: List[DecryptionShare]) -> None:
         self.cleartext = cleartext
         self.decrypted_message = decrypted_message
@@ -765,12 +813,7 @@ class SelectionDecryption:
 
     @staticmethod
     def from_dict(obj: Any) -> 'SelectionDecryption':
-        assert isinstance(obj, dict)
-        cleartext = from_int(obj.get("cleartext"))
-        decrypted_message = from_int(obj.get("decrypted_message"))
-        encrypted_message = ElGamalMessage.from_dict(obj.get("encrypted_message"))
-        shares = from_list(DecryptionShare.from_dict, obj.get("shares"))
-        return SelectionDecryption(cleartext, decrypted_message, encrypted_message, shares)
+        return decode_selection_decryption(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -786,16 +829,15 @@ class BallotDecryption:
     ballot_info: BallotInformation
     contests: List[List[SelectionDecryption]]
 
+    __slots__ = ("ballot_info", "contests")
+
     def __init__(self, ballot_info: BallotInformation, contests: List[List[SelectionDecryption]]) -> None:
         self.ballot_info = ballot_info
         self.contests = contests
 
     @staticmethod
     def from_dict(obj: Any) -> 'BallotDecryption':
-        assert isinstance(obj, dict)
-        ballot_info = BallotInformation.from_dict(obj.get("ballot_info"))
-        contests = from_list(lambda x: from_list(SelectionDecryption.from_dict, x), obj.get("contests"))
-        return BallotDecryption(ballot_info, contests)
+        return decode_ballot_decryption(obj)
 
     def to_dict(self) -> dict:
         result: dict = {}
@@ -824,6 +866,8 @@ class SchnorrProof:
     """
     response: int
 
+    __slots__ = ("challenge", "committment", "response")
+
     def __init__(self, challenge: int, committment: int, response: int) -> None:
         self.challenge = challenge
         self.committment = committment
@@ -851,6 +895,8 @@ class TrusteePublicKey:
     """An ElGamal public key."""
     public_key: int
 
+    __slots__ = ("proof", "public_key")
+
     def __init__(self, proof: SchnorrProof, public_key: int) -> None:
         self.proof = proof
         self.public_key = public_key
@@ -893,6 +939,8 @@ class ElectionRecord:
     """The public keys/coefficient commitments for each trustee."""
     trustee_public_keys: List[List[TrusteePublicKey]]
 
+    __slots__ = ("base_hash", "cast_ballots", "contest_tallies", "extended_base_hash", "joint_public_key", "parameters", "spoiled_ballots", "trustee_public_keys")
+
     def __init__(self, base_hash: str, cast_ballots: List[EncryptedBallot], contest_tallies: List[List[TallyDecryption]], extended_base_hash: str, joint_public_key: int, parameters: ElectionParameters, spoiled_ballots: List[BallotDecryption], trustee_public_keys: List[List[TrusteePublicKey]]) -> None:
         self.base_hash = base_hash
         self.cast_ballots = cast_ballots
@@ -907,12 +955,12 @@ class ElectionRecord:
     def from_dict(obj: Any) -> 'ElectionRecord':
         assert isinstance(obj, dict)
         base_hash = from_str(obj.get("base_hash"))
-        cast_ballots = from_list(EncryptedBallot.from_dict, obj.get("cast_ballots"))
+        cast_ballots = _list_field(obj, "cast_ballots", decode_encrypted_ballot)
         contest_tallies = from_list(lambda x: from_list(TallyDecryption.from_dict, x), obj.get("contest_tallies"))
         extended_base_hash = from_str(obj.get("extended_base_hash"))
         joint_public_key = from_int(obj.get("joint_public_key"))
         parameters = ElectionParameters.from_dict(obj.get("parameters"))
-        spoiled_ballots = from_list(BallotDecryption.from_dict, obj.get("spoiled_ballots"))
+        spoiled_ballots = _list_field(obj, "spoiled_ballots", decode_ballot_decryption)
         trustee_public_keys = from_list(lambda x: from_list(TrusteePublicKey.from_dict, x), obj.get("trustee_public_keys"))
         return ElectionRecord(base_hash, cast_ballots, contest_tallies, extended_base_hash, joint_public_key, parameters, spoiled_ballots, trustee_public_keys)
 
@@ -935,3 +983,213 @@ def election_record_from_dict(s: Any) -> ElectionRecord:
 
 def election_record_to_dict(x: ElectionRecord) -> Any:
     return to_class(ElectionRecord, x)
+
+
+# Fast-path decoders for the types repeated for every ballot. Each object is
+# validated in a single pass, and failures raise a `DecodeError` naming the
+# path of the offending field within the record.
+
+
+class DecodeError(ValueError):
+    """An election record field which does not match the schema."""
+    """The path of the field, such as `contests[1].selections[0].message`."""
+    path: str
+    expected: str
+    found: str
+
+    def __init__(self, path: str, expected: str, value: Any) -> None:
+        super().__init__()
+        self.path = path
+        self.expected = expected
+        self.found = "null" if value is None else type(value).__name__
+
+    def within(self, parent: str) -> 'DecodeError':
+        """Prefixes the path of the field with the path of its parent."""
+        if not self.path:
+            self.path = parent
+        elif self.path.startswith("["):
+            self.path = parent + self.path
+        else:
+            self.path = f"{parent}.{self.path}"
+        return self
+
+    def __str__(self) -> str:
+        return f"{self.path or 'value'}: expected {self.expected}, found {self.found}."
+
+
+def _list_field(obj: dict, key: str, decode: Callable[[Any], T]) -> List[T]:
+    """Decodes a list field, adding the field name and index to errors."""
+    items = obj.get(key)
+    if type(items) is not list:
+        raise DecodeError(key, "a list", items)
+    result = []
+    for index, item in enumerate(items):
+        try:
+            result.append(decode(item))
+        except DecodeError as e:
+            raise e.within(f"{key}[{index}]")
+    return result
+
+
+def decode_ballot_information(obj: Any) -> BallotInformation:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    date, device_info = obj.get("date"), obj.get("device_info")
+    time, tracker = obj.get("time"), obj.get("tracker")
+    if type(date) is not str:
+        raise DecodeError("date", "a string", date)
+    if type(device_info) is not str:
+        raise DecodeError("device_info", "a string", device_info)
+    if type(time) is not str:
+        raise DecodeError("time", "a string", time)
+    if type(tracker) is not str:
+        raise DecodeError("tracker", "a string", tracker)
+    return BallotInformation(date, device_info, time, tracker)
+
+
+def decode_elgamal_message(obj: Any) -> ElGamalMessage:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    ciphertext, public_key = obj.get("ciphertext"), obj.get("public_key")
+    if type(ciphertext) not in _INTEGER:
+        raise DecodeError("ciphertext", "an integer", ciphertext)
+    if type(public_key) not in _INTEGER:
+        raise DecodeError("public_key", "an integer", public_key)
+    return ElGamalMessage(ciphertext, public_key)
+
+
+def decode_chaum_pederson_proof(obj: Any) -> ChaumPedersonProof:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    challenge, response = obj.get("challenge"), obj.get("response")
+    if type(challenge) not in _INTEGER:
+        raise DecodeError("challenge", "an integer", challenge)
+    if type(response) not in _INTEGER:
+        raise DecodeError("response", "an integer", response)
+    try:
+        committment = decode_elgamal_message(obj.get("committment"))
+    except DecodeError as e:
+        raise e.within("committment")
+    return ChaumPedersonProof(challenge, committment, response)
+
+
+def decode_encrypted_selection(obj: Any) -> EncryptedSelection:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    try:
+        message = decode_elgamal_message(obj.get("message"))
+    except DecodeError as e:
+        raise e.within("message")
+    try:
+        one_proof = decode_chaum_pederson_proof(obj.get("one_proof"))
+    except DecodeError as e:
+        raise e.within("one_proof")
+    try:
+        zero_proof = decode_chaum_pederson_proof(obj.get("zero_proof"))
+    except DecodeError as e:
+        raise e.within("zero_proof")
+    return EncryptedSelection(message, one_proof, zero_proof)
+
+
+def decode_encrypted_contest(obj: Any) -> EncryptedContest:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    max_selections = obj.get("max_selections")
+    if type(max_selections) is not int:
+        raise DecodeError("max_selections", "an integer", max_selections)
+    try:
+        num_selections_proof = decode_chaum_pederson_proof(obj.get("num_selections_proof"))
+    except DecodeError as e:
+        raise e.within("num_selections_proof")
+    selections = _list_field(obj, "selections", decode_encrypted_selection)
+    return EncryptedContest(max_selections, num_selections_proof, selections)
+
+
+def decode_encrypted_ballot(obj: Any) -> EncryptedBallot:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    try:
+        ballot_info = decode_ballot_information(obj.get("ballot_info"))
+    except DecodeError as e:
+        raise e.within("ballot_info")
+    contests = _list_field(obj, "contests", decode_encrypted_contest)
+    return EncryptedBallot(ballot_info, contests)
+
+
+def decode_decryption_fragment(obj: Any) -> DecryptionFragment:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    fragment = obj.get("fragment")
+    lagrange_coefficient = obj.get("lagrange_coefficient")
+    trustee_index = obj.get("trustee_index")
+    if type(fragment) is not int:
+        raise DecodeError("fragment", "an integer", fragment)
+    if type(lagrange_coefficient) is not int:
+        raise DecodeError("lagrange_coefficient", "an integer",
+                          lagrange_coefficient)
+    if type(trustee_index) is not int:
+        raise DecodeError("trustee_index", "an integer", trustee_index)
+    try:
+        proof = decode_chaum_pederson_proof(obj.get("proof"))
+    except DecodeError as e:
+        raise e.within("proof")
+    return DecryptionFragment(fragment, lagrange_coefficient, proof,
+                              trustee_index)
+
+
+def decode_decryption_share(obj: Any) -> DecryptionShare:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    share = obj.get("share")
+    if type(share) is not int:
+        raise DecodeError("share", "an integer", share)
+    fragments = None
+    if obj.get("fragments") is not None:
+        fragments = _list_field(obj, "fragments", decode_decryption_fragment)
+    try:
+        proof = decode_chaum_pederson_proof(obj.get("proof"))
+    except DecodeError as e:
+        raise e.within("proof")
+    return DecryptionShare(fragments, proof, share)
+
+
+def decode_selection_decryption(obj: Any) -> SelectionDecryption:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    cleartext = obj.get("cleartext")
+    decrypted_message = obj.get("decrypted_message")
+    if type(cleartext) is not int:
+        raise DecodeError("cleartext", "an integer", cleartext)
+    if type(decrypted_message) is not int:
+        raise DecodeError("decrypted_message", "an integer",
+                          decrypted_message)
+    try:
+        encrypted_message = decode_elgamal_message(obj.get("encrypted_message"))
+    except DecodeError as e:
+        raise e.within("encrypted_message")
+    shares = _list_field(obj, "shares", decode_decryption_share)
+    return SelectionDecryption(cleartext, decrypted_message,
+                               encrypted_message, shares)
+
+
+def _decode_contest_decryption(obj: Any) -> List[SelectionDecryption]:
+    if type(obj) is not list:
+        raise DecodeError("", "a list", obj)
+    result = []
+    for index, item in enumerate(obj):
+        try:
+            result.append(decode_selection_decryption(item))
+        except DecodeError as e:
+            raise e.within(f"[{index}]")
+    return result
+
+
+def decode_ballot_decryption(obj: Any) -> BallotDecryption:
+    if type(obj) is not dict:
+        raise DecodeError("", "an object", obj)
+    try:
+        ballot_info = decode_ballot_information(obj.get("ballot_info"))
+    except DecodeError as e:
+        raise e.within("ballot_info")
+    contests = _list_field(obj, "contests", _decode_contest_decryption)
+    return BallotDecryption(ballot_info, contests)
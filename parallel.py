@@ -0,0 +1,122 @@
+# ElectionGuard Verifier Parallel Execution
+# Nicholas Boucher 2020
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import (Any, Callable, Deque, Dict, Iterable, Iterator, List,
+                    Optional, Tuple, TypeVar)
+from metrics import counters, merge_counters
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Number of chunks queued per worker process, which bounds the number of
+# items held in memory while keeping every worker busy
+CHUNKS_PER_JOB = 2
+
+# Worker process pools, kept from one call to the next so that the tables
+# each worker builds stay warm across stages, keyed by the number of workers
+# and their initializer
+_pools: Dict[Tuple[int, Any, Tuple], ProcessPoolExecutor] = {}
+
+
+def chunked(items: Iterable[T], chunk_size: int) -> Iterator[List[T]]:
+    """Splits `items` into consecutive lists of at most `chunk_size` items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_pool(jobs: int, initializer: Optional[Callable[..., None]] = None,
+             initargs: Tuple = ()) -> ProcessPoolExecutor:
+    """Returns the pool of `jobs` worker processes which each first call
+        `initializer(*initargs)`, starting it on first use."""
+    key = (jobs, initializer, initargs)
+    if key not in _pools:
+        _pools[key] = ProcessPoolExecutor(max_workers=jobs,
+                                          initializer=initializer,
+                                          initargs=initargs)
+    return _pools[key]
+
+
+def shutdown_pools() -> None:
+    """Stops the worker processes of every pool."""
+    for pool in _pools.values():
+        pool.shutdown(cancel_futures=True)
+    _pools.clear()
+
+
+@contextmanager
+def keep_pools() -> Iterator[None]:
+    """Keeps the worker process pools started within the block for reuse
+        until the block exits, then stops them."""
+    try:
+        yield
+    finally:
+        shutdown_pools()
+
+
+def _run_counted(function: Callable[..., R], *args: Any
+                 ) -> Tuple[R, Dict[str, int]]:
+    """Calls `function(*args)` in a worker process, returning its result
+        along with the operation counts it added."""
+    counters.clear()
+    return function(*args), dict(counters)
+
+
+def map_chunks(function: Callable[..., R], items: Iterable[T], *args: Any,
+               jobs: int = 1, chunk_size: int = 64, first: int = 0,
+               initializer: Optional[Callable[..., None]] = None,
+               initargs: Tuple = ()) -> Iterator[R]:
+    """Calls `function(*args, start, chunk)` for consecutive chunks of
+        `items`, where `start` is the index of the first item in the chunk
+        and the first item of `items` has index `first`. Chunks are run
+        across `jobs` worker processes, each of which first calls
+        `initializer(*initargs)`, and which are reused by later calls with
+        the same `jobs`, `initializer` and `initargs`. Results are always
+        yielded in chunk order, so output is identical for any job count.
+        Operation counts taken by workers are merged into this process's
+        counters."""
+    # Run in the current process when no parallelism was requested
+    if jobs <= 1:
+        start = first
+        for chunk in chunked(items, chunk_size):
+            yield function(*args, start, chunk)
+            start += len(chunk)
+        return
+
+    # Keep a bounded window of chunks in flight and collect them in order
+    executor = get_pool(jobs, initializer, initargs)
+    pending: Deque[Future] = deque()
+    try:
+        start = first
+        for chunk in chunked(items, chunk_size):
+            pending.append(executor.submit(_run_counted, function, *args,
+                                           start, chunk))
+            start += len(chunk)
+            if len(pending) >= jobs * CHUNKS_PER_JOB:
+                yield _collect(pending.popleft())
+        while pending:
+            yield _collect(pending.popleft())
+    except BrokenProcessPool:
+        # A worker died, so later calls start a fresh pool
+        _pools.pop((jobs, initializer, initargs), None)
+        raise
+    finally:
+        # Leave the pool idle for later calls when stopped early
+        for future in pending:
+            future.cancel()
+
+
+def _collect(future: Future) -> Any:
+    """Returns the result of a chunk run by `_run_counted`, merging its
+        operation counts."""
+    result, counts = future.result()
+    merge_counters(counts)
+    return result
@@ -0,0 +1,252 @@
+# ElectionGuard Verifier Proof Checks
+# Nicholas Boucher 2020
+from typing import List, Optional, Tuple
+from arithmetic import mulmod, powmod
+from fixedbase import fixed_pow
+from findings import Finding
+from models import (ChaumPedersonProof, ElGamalMessage, EncryptedBallot,
+                    EncryptedContest, EncryptedSelection)
+from utils import hash_elems
+
+
+class ProofContext:
+    """The election-wide values needed to check the proofs on a ballot. This
+    is small enough to be sent to worker processes alongside ballot chunks.
+    """
+    """The prime modulus `p`."""
+    prime: int
+    """The group generator `g`."""
+    generator: int
+    """The order `q` of the subgroup generated by `g`."""
+    order: int
+    """The election public key `K`."""
+    public_key: int
+    """The extended base hash `Q̅` used to seed proof challenges."""
+    extended_base_hash: int
+    """The file holding fixed-base tables for `g` and `K`, if persisted."""
+    table_path: Optional[str]
+    """Whether the proof equations of a ballot chunk are checked together."""
+    batch: bool
+
+    def __init__(self, prime: int, generator: int, order: int,
+                 public_key: int, extended_base_hash: int,
+                 table_path: Optional[str] = None,
+                 batch: bool = False) -> None:
+        self.prime = prime
+        self.generator = generator
+        self.order = order
+        self.public_key = public_key
+        self.extended_base_hash = extended_base_hash
+        self.table_path = table_path
+        self.batch = batch
+
+    def pow_generator(self, exponent: int) -> int:
+        """Returns `gᵉ mod p` using the fixed-base table for `g`. The exponent
+            is reduced modulo `q`, the order of `g`."""
+        return fixed_pow(self.generator, exponent % self.order, self.prime,
+                         self.table_path)
+
+    def pow_public_key(self, exponent: int) -> int:
+        """Returns `Kᵉ mod p` using the fixed-base table for `K`."""
+        return fixed_pow(self.public_key, exponent, self.prime,
+                         self.table_path)
+
+
+class Equation:
+    """A proof verification equation of the form `gˣ Kʸ = Π bᵢᵉⁱ mod p`,
+    along with the check it belongs to and the failure message reported when
+    it does not hold.
+    """
+    """The exponent `x` of the generator."""
+    generator_exponent: int
+    """The exponent `y` of the election public key."""
+    public_key_exponent: int
+    """The `(base, exponent)` pairs of the product."""
+    terms: List[Tuple[int, int]]
+    """Further pairs of the product whose bases recur throughout the
+    election, such as trustee keys, raised using fixed-base tables.
+    """
+    fixed_terms: List[Tuple[int, int]]
+    check: str
+    message: str
+
+    def __init__(self, generator_exponent: int, public_key_exponent: int,
+                 terms: List[Tuple[int, int]], check: str, message: str,
+                 fixed_terms: Optional[List[Tuple[int, int]]] = None
+                 ) -> None:
+        self.generator_exponent = generator_exponent
+        self.public_key_exponent = public_key_exponent
+        self.terms = terms
+        self.fixed_terms = fixed_terms or []
+        self.check = check
+        self.message = message
+
+    def holds(self, ctx: ProofContext) -> bool:
+        """Returns true when the equation is satisfied."""
+        p = ctx.prime
+        left = ctx.pow_generator(self.generator_exponent)
+        if self.public_key_exponent:
+            left = mulmod(left, ctx.pow_public_key(self.public_key_exponent),
+                          p)
+        right = 1
+        for base, exponent in self.terms:
+            right = mulmod(right, powmod(base, exponent, p), p)
+        for base, exponent in self.fixed_terms:
+            right = mulmod(right, fixed_pow(base, exponent, p,
+                                            ctx.table_path), p)
+        return left == right
+
+    def finding(self) -> Finding:
+        """Returns the finding reported when the equation does not hold."""
+        return Finding(self.check, self.message)
+
+
+def zero_proof_equations(message: ElGamalMessage, proof: ChaumPedersonProof,
+                         check: str, failure: str) -> List[Equation]:
+    """Returns the equations `gᵘ = a αᶜ` and `Kᵘ = b βᶜ` which hold when
+        `proof` shows that `message` is an encryption of zero."""
+    alpha, beta = message.public_key, message.ciphertext
+    a, b = proof.committment.public_key, proof.committment.ciphertext
+    c, u = proof.challenge, proof.response
+    return [Equation(u, 0, [(a, 1), (alpha, c)], check, failure),
+            Equation(0, u, [(b, 1), (beta, c)], check, failure)]
+
+
+def one_proof_equations(message: ElGamalMessage, proof: ChaumPedersonProof,
+                        check: str, failure: str) -> List[Equation]:
+    """Returns the equations `gᵘ = a αᶜ` and `gᶜ Kᵘ = b βᶜ` which hold when
+        `proof` shows that `message` is an encryption of one."""
+    alpha, beta = message.public_key, message.ciphertext
+    a, b = proof.committment.public_key, proof.committment.ciphertext
+    c, u = proof.challenge, proof.response
+    return [Equation(u, 0, [(a, 1), (alpha, c)], check, failure),
+            Equation(c, u, [(b, 1), (beta, c)], check, failure)]
+
+
+def verify_zero_proof(message: ElGamalMessage, proof: ChaumPedersonProof,
+                      ctx: ProofContext) -> bool:
+    """Returns true when `proof` shows that `message` is an encryption of
+        zero."""
+    return all(equation.holds(ctx)
+               for equation in zero_proof_equations(message, proof, "", ""))
+
+
+def verify_one_proof(message: ElGamalMessage, proof: ChaumPedersonProof,
+                     ctx: ProofContext) -> bool:
+    """Returns true when `proof` shows that `message` is an encryption of
+        one."""
+    return all(equation.holds(ctx)
+               for equation in one_proof_equations(message, proof, "", ""))
+
+
+def selection_equations(selection: EncryptedSelection,
+                        ctx: ProofContext) -> Tuple[Optional[Finding],
+                                                    List[Equation]]:
+    """Checks the challenge hash of the disjunctive proof that `selection`
+        encrypts either a zero or a one, and returns the equations which
+        remain to be checked. The first value is a finding when the hash
+        check fails."""
+    message = selection.message
+    zero, one = selection.zero_proof, selection.one_proof
+
+    # Test: The challenges of the two proofs sum to the hash of the message
+    # and both commitments
+    challenge = hash_elems(ctx.extended_base_hash,
+                           message.public_key, message.ciphertext,
+                           zero.committment.public_key,
+                           zero.committment.ciphertext,
+                           one.committment.public_key,
+                           one.committment.ciphertext)
+    if (zero.challenge + one.challenge) % ctx.order != challenge:
+        return Finding("selection_challenge",
+                       "Selection proof challenges do not sum to the proof "
+                       "hash.", expected=challenge,
+                       actual=(zero.challenge + one.challenge) % ctx.order), []
+
+    # Test: The proofs for the zero and one cases are valid
+    return None, (
+        zero_proof_equations(message, zero, "selection_proof",
+                             "Selection zero proof is not valid.")
+        + one_proof_equations(message, one, "selection_proof",
+                              "Selection one proof is not valid."))
+
+
+def contest_equations(contest: EncryptedContest,
+                      ctx: ProofContext) -> Tuple[Optional[Finding],
+                                                  List[Equation]]:
+    """Checks the challenge hash of the proof that exactly `L` selections
+        were made in `contest`, and returns the equations which remain to be
+        checked. The first value is a finding when the hash check fails."""
+    p = ctx.prime
+
+    # Combine the selections into an encryption of the number selected
+    alpha, beta = 1, 1
+    for selection in contest.selections:
+        alpha = mulmod(alpha, selection.message.public_key, p)
+        beta = mulmod(beta, selection.message.ciphertext, p)
+
+    # Test: The challenge is the hash of the combined message and commitment
+    proof = contest.num_selections_proof
+    a, b = proof.committment.public_key, proof.committment.ciphertext
+    c, u = proof.challenge, proof.response
+    challenge = hash_elems(ctx.extended_base_hash, alpha, beta, a, b)
+    if challenge != c:
+        return Finding("contest_challenge",
+                       "Number of selections proof challenge is not valid.",
+                       expected=challenge, actual=c), []
+
+    # Test: The combined message encrypts `L`, i.e. `gᵘ = a Aᶜ` and
+    # `gᴸᶜ Kᵘ = b Bᶜ`
+    failure = "Number of selections proof is not valid."
+    return None, [Equation(u, 0, [(a, 1), (alpha, c)], "contest_proof",
+                           failure),
+                  Equation(contest.max_selections * c, u,
+                           [(b, 1), (beta, c)], "contest_proof", failure)]
+
+
+def first_failure(equations: List[Equation],
+                  ctx: ProofContext) -> Optional[Finding]:
+    """Returns the finding of the first equation that does not hold, or None
+        when they all hold."""
+    for equation in equations:
+        if not equation.holds(ctx):
+            return equation.finding()
+    return None
+
+
+def verify_selection(selection: EncryptedSelection,
+                     ctx: ProofContext) -> Optional[Finding]:
+    """Checks the disjunctive proof that `selection` encrypts either a zero
+        or a one. Returns a finding, or None when valid."""
+    failure, equations = selection_equations(selection, ctx)
+    return failure or first_failure(equations, ctx)
+
+
+def verify_contest(contest: EncryptedContest,
+                   ctx: ProofContext) -> Optional[Finding]:
+    """Checks every selection proof in `contest`, followed by the proof that
+        exactly `L` selections were made. Returns a finding, or None when
+        valid."""
+    # Test: Each selection is an encryption of either zero or one
+    for index, selection in enumerate(contest.selections):
+        finding = verify_selection(selection, ctx)
+        if finding is not None:
+            finding.selection = index
+            return finding
+
+    # Test: The contest encrypts the number of selections allowed
+    failure, equations = contest_equations(contest, ctx)
+    return failure or first_failure(equations, ctx)
+
+
+def verify_ballot(ballot: EncryptedBallot,
+                  ctx: ProofContext) -> List[Finding]:
+    """Checks all proofs on an encrypted ballot, returning a finding for each
+        invalid contest."""
+    findings = []
+    for index, contest in enumerate(ballot.contests):
+        finding = verify_contest(contest, ctx)
+        if finding is not None:
+            finding.contest = index
+            findings.append(finding)
+    return findings
@@ -0,0 +1,52 @@
+# ElectionGuard Verifier Sampling Audit
+# Nicholas Boucher 2020
+from typing import List
+from math import exp, lgamma, log, log1p
+from random import Random
+
+# Default confidence of the bound on the fraction of invalid cast ballots
+DEFAULT_CONFIDENCE = 0.95
+
+# Number of bisection steps taken to find a bound, far more than enough to
+# reach the precision of a float
+_BISECTION_STEPS = 100
+
+
+def sample_positions(count: int, size: int, seed: int) -> List[int]:
+    """Returns `size` distinct positions among `count`, chosen uniformly at
+        random by a generator seeded with `seed`, in increasing order. The
+        same arguments always give the same sample."""
+    return sorted(Random(seed).sample(range(count), min(size, count)))
+
+
+def binomial_cdf(successes: int, trials: int, p: float) -> float:
+    """Returns the probability of at most `successes` successes in `trials`
+        independent trials which each succeed with probability `p`."""
+    if p <= 0:
+        return 1.0
+    if p >= 1:
+        return 1.0 if successes >= trials else 0.0
+    log_p, log_q = log(p), log1p(-p)
+    return min(1.0, sum(exp(lgamma(trials + 1) - lgamma(k + 1)
+                            - lgamma(trials - k + 1)
+                            + k * log_p + (trials - k) * log_q)
+                        for k in range(successes + 1)))
+
+
+def invalid_fraction_bound(invalid: int, sampled: int,
+                           confidence: float) -> float:
+    """Returns the one-sided Clopper-Pearson upper bound, at `confidence`,
+        on the fraction of invalid ballots given `invalid` of `sampled`
+        random ballots were invalid: the fraction `p` for which seeing at
+        most `invalid` invalid ballots has probability `1 - confidence`.
+        Sampling without replacement only tightens this bound."""
+    if invalid >= sampled:
+        return 1.0
+    low, high = invalid / sampled, 1.0
+    for _ in range(_BISECTION_STEPS):
+        middle = (low + high) / 2
+        if binomial_cdf(invalid, sampled, middle) > 1 - confidence:
+            low = middle
+        else:
+            high = middle
+    return high
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# ElectionGuard Verifier Service
+# Nicholas Boucher 2020
+#
+# A long-running service which verifies election record files on request.
+# Jobs are queued and run a bounded number at a time in a pool of processes
+# which outlive the jobs, so that the fixed-base, discrete log and Lagrange
+# tables each process builds stay warm for later jobs. Clients connect over a
+# Unix socket or TCP, send a request as a line of JSON, and receive lines of
+# JSON as the job progresses:
+#
+#     client:  {"path": record file, "batch": bool, "keep_going": bool,
+#               "lazy_ints": bool, "jobs": 1, "chunk_size": n}
+#     service: {"type": "queued", "job": n, "position": jobs queued ahead}
+#              {"type": "started", "job": n}
+#              {"type": "stage", "job": n, "stage": name,
+#               "status": "started"}
+#              {"type": "finding", "job": n, "finding": {...}}
+#              {"type": "stage", "job": n, "stage": name,
+#               "status": "finished", "seconds": s}
+#              ...
+#              {"type": "result", "job": n, "valid": bool, "metrics": {...}}
+#
+# A request which cannot be run is answered with {"type": "error",
+# "message": ...} instead of a result. Each job runs in a single pool
+# process, as a nested pool would start cold; jobs run side by side up to
+# the service's concurrency.
+from typing import Any, Dict, Optional, Tuple
+from argparse import ArgumentParser, Namespace
+from asyncio import (Future, Queue, QueueFull, StreamReader, StreamWriter,
+                     gather, get_running_loop, run, start_server,
+                     start_unix_server)
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from json import dumps, loads
+from logging import basicConfig, getLogger
+from multiprocessing import get_context
+from os import remove
+from os.path import exists, isfile
+from arithmetic import available_backends, backend_name, set_backend
+from cache import DEFAULT_CACHE_SIZE
+from checkpoint import file_digest
+from cluster import parse_address
+from constants import GENERATOR, LOG_NORMAL, PRIME
+from fixedbase import get_table
+from loader import load_election_record
+import metrics
+from metrics import set_listener, stage
+from verify import DEFAULT_CHUNK_SIZE, verify_election
+
+# Default number of jobs waiting to run, beyond which requests are refused
+DEFAULT_QUEUE_SIZE = 64
+
+# The options a request may set, along with their defaults
+JOB_OPTIONS: Dict[str, Any] = {"batch": False, "keep_going": False,
+                               "lazy_ints": False, "jobs": 1,
+                               "chunk_size": DEFAULT_CHUNK_SIZE}
+
+
+def parse_request(line: bytes) -> Tuple[str, Dict[str, Any]]:
+    """Returns the record path and options of a request, raising a
+        ValueError when the request is invalid."""
+    request = loads(line)
+    if not isinstance(request, dict) or \
+            not isinstance(request.get("path"), str):
+        raise ValueError("Request must give the path of a record file.")
+    path = request.pop("path")
+    if not isfile(path):
+        raise ValueError(f"{path} is not a file.")
+    options = dict(JOB_OPTIONS)
+    for name, value in request.items():
+        if name not in JOB_OPTIONS:
+            raise ValueError(f"Unknown option: {name}")
+        if type(value) is not type(JOB_OPTIONS[name]):
+            raise ValueError(f"Invalid value for {name}: {value}")
+        options[name] = value
+    if options["jobs"] != 1:
+        raise ValueError("jobs must be 1; the service runs jobs in parallel "
+                         "up to its concurrency.")
+    if options["chunk_size"] < 1:
+        raise ValueError("chunk_size must be at least 1.")
+    return path, options
+
+
+def start_process(backend: str) -> None:
+    """Prepares a pool process for verification jobs, selecting the
+        arithmetic backend and building the generator's fixed-base table."""
+    set_backend(backend)
+    get_table(GENERATOR, PRIME)
+
+
+def run_job(job: int, path: str, options: Dict[str, Any],
+            cache_path: Optional[str], cache_size: int,
+            events: Any) -> Dict[str, Any]:
+    """Verifies the record file at `path` in a pool process, putting each
+        progress event of the job on the `events` queue."""
+    metrics.reset()
+    set_listener(lambda event: events.put(dict(event, job=job)))
+    try:
+        with stage("load"):
+            election = load_election_record(path,
+                                            lazy_ints=options["lazy_ints"])
+        digest = file_digest(path) if cache_path is not None else None
+        valid = verify_election(election, jobs=options["jobs"],
+                                chunk_size=options["chunk_size"],
+                                batch=options["batch"],
+                                keep_going=options["keep_going"],
+                                digest=digest, cache_path=cache_path,
+                                cache_size=cache_size)
+        return {"valid": valid, "metrics": metrics.report()}
+    finally:
+        set_listener(None)
+
+
+class VerificationService:
+    """Queues verification jobs, runs at most `concurrency` of them at a time
+    in a pool of long-lived processes, and streams the progress of each job
+    back to the client which requested it.
+    """
+    concurrency: int
+    """The cache directory shared by every job, if there is one."""
+    cache_path: Optional[str]
+    cache_size: int
+    """The jobs waiting to run, along with the futures of their results."""
+    queue: 'Queue[Tuple[int, str, Dict[str, Any], Future]]'
+    executor: ProcessPoolExecutor
+    manager: Any
+    """The queue on which pool processes put the progress events of jobs."""
+    events: Any
+    """The progress events of each job awaited by a client."""
+    listeners: Dict[int, 'Queue[Dict[str, Any]]']
+    next_job: int
+
+    def __init__(self, concurrency: int = 1,
+                 queue_size: int = DEFAULT_QUEUE_SIZE,
+                 cache_path: Optional[str] = None,
+                 cache_size: int = DEFAULT_CACHE_SIZE) -> None:
+        self.concurrency = concurrency
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.queue = Queue(queue_size)
+        self.executor = self._new_executor()
+        self.manager = get_context("spawn").Manager()
+        self.events = self.manager.Queue()
+        self.listeners = {}
+        self.next_job = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        """Returns a pool of `concurrency` processes for running jobs."""
+        # Spawn rather than fork the processes, which are started as jobs
+        # arrive and would otherwise inherit the connections of clients
+        return ProcessPoolExecutor(self.concurrency, get_context("spawn"),
+                                   initializer=start_process,
+                                   initargs=(backend_name(),))
+
+    async def serve(self, address: str) -> None:
+        """Accepts requests on `address`, a `host:port` address or the path
+            of a Unix socket, until cancelled."""
+        if ":" in address:
+            host, port = parse_address(address)
+            server = await start_server(self.handle, host, port)
+        else:
+            server = await start_unix_server(self.handle, address)
+        try:
+            async with server:
+                await gather(server.serve_forever(), self._forward_events(),
+                             *(self._run_jobs()
+                               for _ in range(self.concurrency)))
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            self.manager.shutdown()
+            if ":" not in address and exists(address):
+                remove(address)
+
+    async def handle(self, reader: StreamReader,
+                     writer: StreamWriter) -> None:
+        """Runs the job requested by a client, streaming its progress."""
+        async def send(message: Dict[str, Any]) -> None:
+            writer.write(dumps(message, default=int).encode() + b"\n")
+            await writer.drain()
+
+        job = self.next_job
+        self.next_job += 1
+        try:
+            try:
+                path, options = parse_request(await reader.readline())
+            except ValueError as e:
+                await send({"type": "error", "message": str(e)})
+                return
+            events: 'Queue[Dict[str, Any]]' = Queue()
+            self.listeners[job] = events
+            result = get_running_loop().create_future()
+            try:
+                self.queue.put_nowait((job, path, options, result))
+            except QueueFull:
+                await send({"type": "error",
+                            "message": "Too many jobs are queued."})
+                return
+            await send({"type": "queued", "job": job,
+                        "position": self.queue.qsize() - 1})
+
+            # Stream the job's events until the job is done
+            while True:
+                event = await events.get()
+                if event["type"] == "done":
+                    break
+                await send(event)
+            await send(await result)
+        except ConnectionError:
+            # The client has gone; its job still runs to completion
+            pass
+        finally:
+            self.listeners.pop(job, None)
+            writer.close()
+
+    async def _run_jobs(self) -> None:
+        """Runs queued jobs one at a time in the process pool."""
+        log = getLogger("election_verifier")
+        loop = get_running_loop()
+        while True:
+            job, path, options, result = await self.queue.get()
+            log.log(LOG_NORMAL, f"Job {job}: verifying {path}.")
+            self._notify({"type": "started", "job": job})
+            executor = self.executor
+            try:
+                outcome = await loop.run_in_executor(
+                    executor, run_job, job, path, options,
+                    self.cache_path, self.cache_size, self.events)
+                outcome = {"type": "result", "job": job, **outcome}
+            except BrokenProcessPool:
+                # A pool process died, which fails every job in the pool.
+                # Later jobs run in a new pool, which the first runner to
+                # notice starts.
+                if self.executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = self._new_executor()
+                outcome = {"type": "error", "job": job,
+                           "message": "A verification process exited "
+                                      "unexpectedly."}
+            except Exception as e:
+                outcome = {"type": "error", "job": job,
+                           "message": str(e) or type(e).__name__}
+            log.log(LOG_NORMAL, f"Job {job}: "
+                    f"{'valid' if outcome.get('valid') else 'invalid'}."
+                    if outcome["type"] == "result"
+                    else f"Job {job}: {outcome['message']}")
+
+            # The pool process put every event of the job before returning,
+            # so the job is done once this marker is forwarded
+            await loop.run_in_executor(None, self.events.put,
+                                       {"type": "done", "job": job})
+            result.set_result(outcome)
+            self.queue.task_done()
+
+    async def _forward_events(self) -> None:
+        """Passes the events put by pool processes to the jobs' clients."""
+        loop = get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self.events.get)
+            self._notify(event)
+
+    def _notify(self, event: Dict[str, Any]) -> None:
+        """Passes `event` to the client of its job, if it is still
+            connected."""
+        listener = self.listeners.get(event["job"])
+        if listener is not None:
+            listener.put_nowait(event)
+
+
+def main() -> None:
+    """Main point of entry for command line execution."""
+    args = parse_args()
+    basicConfig(format='%(message)s')
+    getLogger("election_verifier").setLevel(LOG_NORMAL)
+    set_backend(args.backend)
+    service = VerificationService(args.concurrency, args.queue_size,
+                                  args.cache, args.cache_size * 2 ** 20)
+    try:
+        run(service.serve(args.address))
+    except KeyboardInterrupt:
+        pass
+
+
+def parse_args() -> Namespace:
+    """Parses, verifies, and returns command line line arguments."""
+    # Configure arguments
+    parser = ArgumentParser(
+            description='Serve requests to verify ElectionGuard election '
+                        'records.')
+    parser.add_argument('address', metavar='ADDRESS',
+                        help='HOST:PORT to listen on, or the path of a Unix '
+                             'socket.')
+    parser.add_argument('--concurrency', type=int, default=1, metavar='N',
+                        help="Number of jobs run at a time, each in its own "
+                             "process.")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        metavar='N',
+                        help="Number of jobs which may wait to run, beyond "
+                             "which requests are refused.")
+    parser.add_argument('--cache', metavar='DIR',
+                        help="Reuse verification results cached in DIR for "
+                             "unchanged records and parts of records.")
+    parser.add_argument('--cache-size', type=int,
+                        default=DEFAULT_CACHE_SIZE // 2 ** 20, metavar='MB',
+                        help="Size bound of the cache, beyond which the "
+                             "least recently used results are evicted.")
+    parser.add_argument('--backend', default='auto',
+                        choices=['auto', 'gmpy2', 'python'],
+                        help="Big-integer arithmetic backend.")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Verify arguments
+    if args.concurrency < 1:
+        exit("concurrency must be at least 1")
+    if args.queue_size < 1:
+        exit("queue-size must be at least 1")
+    if args.cache_size < 1:
+        exit("cache-size must be at least 1")
+    if args.backend != 'auto' and args.backend not in available_backends():
+        exit(f"{args.backend} backend is not available")
+
+    # Return results
+    return args
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# ElectionGuard Verifier Homomorphic Tally Accumulation
+# Nicholas Boucher 2020
+from typing import Any, Iterable, List
+from arithmetic import mulmod
+from findings import Finding
+from models import EncryptedBallot, TallyDecryption
+
+
+class TallyAccumulator:
+    """Running products of the encrypted selections of cast ballots, kept for
+    each selection of each contest. Accumulators for separate shards of the
+    ballots can be merged, and memory is proportional to the number of
+    selections rather than the number of ballots.
+    """
+    prime: int
+    """The products `[A, B]` of the selection messages, indexed by contest and
+    then by selection.
+    """
+    products: List[List[List[Any]]]
+    """The number of ballots accumulated."""
+    count: int
+
+    def __init__(self, prime: int) -> None:
+        self.prime = prime
+        self.products = []
+        self.count = 0
+
+    def _product(self, contest: int, selection: int) -> List[Any]:
+        """Returns the running product for a selection, extending the
+            products when the selection is first seen."""
+        while len(self.products) <= contest:
+            self.products.append([])
+        row = self.products[contest]
+        while len(row) <= selection:
+            row.append([1, 1])
+        return row[selection]
+
+    def add(self, ballot: EncryptedBallot) -> None:
+        """Multiplies the selections of `ballot` into the running products."""
+        for contest_index, contest in enumerate(ballot.contests):
+            for selection_index, selection in enumerate(contest.selections):
+                product = self._product(contest_index, selection_index)
+                product[0] = mulmod(product[0], selection.message.public_key,
+                                    self.prime)
+                product[1] = mulmod(product[1], selection.message.ciphertext,
+                                    self.prime)
+        self.count += 1
+
+    def merge(self, other: 'TallyAccumulator') -> None:
+        """Combines the products accumulated by `other` into this one."""
+        for contest_index, row in enumerate(other.products):
+            for selection_index, (alpha, beta) in enumerate(row):
+                product = self._product(contest_index, selection_index)
+                product[0] = mulmod(product[0], alpha, self.prime)
+                product[1] = mulmod(product[1], beta, self.prime)
+        self.count += other.count
+
+    @staticmethod
+    def from_dict(obj: Any) -> 'TallyAccumulator':
+        assert isinstance(obj, dict)
+        tally = TallyAccumulator(obj["prime"])
+        tally.products = [[list(product) for product in row]
+                          for row in obj["products"]]
+        tally.count = obj["count"]
+        return tally
+
+    def to_dict(self) -> dict:
+        return {"prime": self.prime,
+                "products": [[[int(alpha), int(beta)] for alpha, beta in row]
+                             for row in self.products],
+                "count": self.count}
+
+    def verify(self, contest_tallies: Iterable[List[TallyDecryption]]
+               ) -> List[Finding]:
+        """Compares the accumulated products with the published encrypted
+            tallies, returning a finding for each mismatch."""
+        failures = []
+        contest_tallies = list(contest_tallies)
+        if len(contest_tallies) < len(self.products):
+            failures.append(Finding("tally_contests",
+                                    "Cast ballots contain "
+                                    f"{len(self.products)} contests, but "
+                                    f"only {len(contest_tallies)} are "
+                                    "tallied.", source="tally",
+                                    expected=len(self.products),
+                                    actual=len(contest_tallies)))
+        for contest_index, tallies in enumerate(contest_tallies):
+            row = (self.products[contest_index]
+                   if contest_index < len(self.products) else [])
+            if len(tallies) < len(row):
+                failures.append(Finding("tally_selections",
+                                        f"Cast ballots contain {len(row)} "
+                                        "selections, but only "
+                                        f"{len(tallies)} are tallied.",
+                                        source="tally", contest=contest_index,
+                                        expected=len(row),
+                                        actual=len(tallies)))
+            for selection_index, tally in enumerate(tallies):
+                alpha, beta = (row[selection_index]
+                               if selection_index < len(row) else (1, 1))
+                if (tally.encrypted_tally.public_key != alpha
+                        or tally.encrypted_tally.ciphertext != beta):
+                    failures.append(Finding(
+                        "encrypted_tally", "Encrypted tally is not the "
+                        "product of the cast ballot selections.",
+                        source="tally", contest=contest_index,
+                        selection=selection_index,
+                        expected=[alpha, beta],
+                        actual=[tally.encrypted_tally.public_key,
+                                tally.encrypted_tally.ciphertext]))
+        return failures
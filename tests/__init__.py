@@ -0,0 +1,2 @@
+# ElectionGuard Verifier Tests
+# Nicholas Boucher 2020
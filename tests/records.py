@@ -0,0 +1,55 @@
+# ElectionGuard Verifier Test Records
+# Nicholas Boucher 2020
+from typing import Any, Callable, Dict, List, Tuple
+from json import dump, load, loads
+from os.path import join
+from unittest.mock import patch
+import command_line
+from generate import generate_record
+from loader import load_election_record
+from verify import verify_election
+
+# Sizes of the generated test records, small enough to verify in seconds
+# while covering absent trustees, fragments and spoiled ballots
+SMALL_RECORD = {"ballots": 4, "contests": 2, "selections": 2,
+                "num_trustees": 3, "threshold": 2, "missing": 1,
+                "spoiled": 2}
+
+
+def write_record(directory: str, name: str = "record.json",
+                 **sizes: Any) -> str:
+    """Writes a valid generated record to `name` in `directory`, returning
+        its path."""
+    path = join(directory, name)
+    generate_record(path, **dict(SMALL_RECORD, **sizes))
+    return path
+
+
+def tamper(path: str, tampered_path: str,
+           edit: Callable[[Dict[str, Any]], None]) -> str:
+    """Writes a copy of the record at `path`, changed by `edit`, to
+        `tampered_path`, returning it."""
+    with open(path) as f:
+        record = load(f)
+    edit(record)
+    with open(tampered_path, 'w') as f:
+        dump(record, f)
+    return tampered_path
+
+
+def verify_findings(path: str, directory: str, lazy_ints: bool = False,
+                    **options: Any) -> Tuple[bool, List[Dict[str, Any]]]:
+    """Verifies the record at `path`, running every check, and returns
+        whether it is valid along with its findings in order."""
+    findings_path = join(directory, "findings.jsonl")
+    options.setdefault("keep_going", True)
+    valid = verify_election(load_election_record(path, lazy_ints=lazy_ints),
+                            findings_path=findings_path, **options)
+    with open(findings_path) as f:
+        return valid, [loads(line) for line in f]
+
+
+def run_verifier(*arguments: str) -> None:
+    """Runs the command line verifier with `arguments`."""
+    with patch("sys.argv", ["command_line.py", *arguments]):
+        command_line.main()
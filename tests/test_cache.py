@@ -0,0 +1,53 @@
+# ElectionGuard Verifier Result Cache Tests
+# Nicholas Boucher 2020
+import unittest
+from os.path import dirname, join
+from shutil import copy
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+import cache
+from cache import CHECK_MODULES, ResultCache, _source_version
+from constants import PRIME
+from findings import Finding
+from tally import TallyAccumulator
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Stores results and derives the keys they are stored under."""
+
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_round_trip(self) -> None:
+        results = ResultCache(self.directory.name)
+        tally = TallyAccumulator(PRIME)
+        result = ([Finding("cleartext", "Wrong.", ballot=1)], tally)
+        key = results.key("chunk", 0)
+        self.assertIsNone(results.get(key))
+        results.put(key, result)
+        findings, stored = results.get(key)
+        self.assertEqual([finding.to_dict() for finding in findings],
+                         [finding.to_dict() for finding in result[0]])
+        self.assertEqual(stored.to_dict(), tally.to_dict())
+
+    def test_version_follows_source(self) -> None:
+        # Editing any checking module changes the version, and so every key
+        source = dirname(cache.__file__)
+        for module in CHECK_MODULES:
+            copy(join(source, f"{module}.py"), self.directory.name)
+        with patch("cache.__file__", join(self.directory.name, "cache.py")):
+            self.assertEqual(_source_version(), cache.CACHE_VERSION)
+            with open(join(self.directory.name, "proofs.py"), 'a') as f:
+                f.write("\n")
+            version = _source_version()
+        self.assertNotEqual(version, cache.CACHE_VERSION)
+        key = ResultCache.key("chunk", 0)
+        with patch("cache.CACHE_VERSION", version):
+            self.assertNotEqual(ResultCache.key("chunk", 0), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
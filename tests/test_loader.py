@@ -0,0 +1,119 @@
+# ElectionGuard Verifier Record Loader Tests
+# Nicholas Boucher 2020
+from typing import Any, List
+import unittest
+from io import BytesIO
+from json import dumps, load, loads
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+from binary import write_binary_record
+from loader import (_JsonScanner, iter_from, iter_positions,
+                    load_election_record, read_cast_ballot)
+from models import ElectionRecord
+from tests.records import tamper, write_record
+
+
+def to_dicts(ballots: Any) -> List[Any]:
+    return [ballot.to_dict() for ballot in ballots]
+
+
+class ScannerTest(unittest.TestCase):
+    """Reads JSON values which are cut off at every possible byte by the end
+    of a read.
+    """
+    document = {"escapes": ["a\"b\\", "\\", "é]}\""],
+                "nested": [{"values": [1, -2.5e3, True, None, "{"]}, [], {}],
+                "large": 1234567890123456789012345678901234567890,
+                "cast_ballots": []}
+
+    def read_object(self, data: bytes) -> Any:
+        scanner = _JsonScanner(BytesIO(data))
+        scanner.expect(b'{')
+        result = {}
+        while scanner.peek() != b'}':
+            key = loads(scanner.read_value())
+            scanner.expect(b':')
+            result[key] = loads(scanner.read_value())
+            if scanner.peek() == b',':
+                scanner.pos += 1
+        return result
+
+    def test_read_sizes(self) -> None:
+        data = dumps(self.document).encode()
+        for size in range(1, 16):
+            with self.subTest(size=size), patch("loader.READ_SIZE", size):
+                self.assertEqual(self.read_object(data), self.document)
+
+    def test_truncated(self) -> None:
+        data = dumps(self.document).encode()
+        with self.assertRaises(ValueError):
+            self.read_object(data[:len(data) // 2])
+
+
+class LoaderTest(unittest.TestCase):
+    """Streams the ballots of JSON and binary records, which must decode to
+    the same values as the whole record parsed at once.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.path = write_record(cls.directory.name, ballots=5, contests=1)
+        with open(cls.path) as f:
+            cls.record = ElectionRecord.from_dict(load(f))
+        cls.binary_path = join(cls.directory.name, "record.egb")
+        write_binary_record(load_election_record(cls.path), cls.binary_path)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    def records(self) -> Any:
+        """Yields the path and loaded record of each format."""
+        for path in (self.path, self.binary_path):
+            with self.subTest(path=path):
+                yield path, load_election_record(path)
+
+    def test_ballots(self) -> None:
+        for _, election in self.records():
+            self.assertEqual(to_dicts(election.cast_ballots),
+                             to_dicts(self.record.cast_ballots))
+            self.assertEqual(to_dicts(election.spoiled_ballots),
+                             to_dicts(self.record.spoiled_ballots))
+            self.assertEqual(election.joint_public_key,
+                             self.record.joint_public_key)
+
+    def test_iter_from(self) -> None:
+        for _, election in self.records():
+            self.assertEqual(to_dicts(iter_from(election.cast_ballots, 3)),
+                             to_dicts(self.record.cast_ballots[3:]))
+
+    def test_iter_positions(self) -> None:
+        for _, election in self.records():
+            self.assertEqual(
+                to_dicts(iter_positions(election.cast_ballots, [0, 2, 4])),
+                to_dicts(self.record.cast_ballots[0:5:2]))
+
+    def test_read_cast_ballot(self) -> None:
+        for path, election in self.records():
+            for index, (offset, ballot) in enumerate(
+                    election.cast_ballots.iter_located()):
+                self.assertEqual(read_cast_ballot(path, offset).to_dict(),
+                                 self.record.cast_ballots[index].to_dict())
+
+    def test_binary_out_of_range(self) -> None:
+        for value in (-1, 1 << 32):
+            with self.subTest(value=value):
+                path = tamper(self.path, join(self.directory.name,
+                                              "range.json"),
+                              lambda r: r["cast_ballots"][1]["contests"][0]
+                              .__setitem__("max_selections", value))
+                with self.assertRaisesRegex(ValueError, "contest 0"):
+                    write_binary_record(load_election_record(path),
+                                        join(self.directory.name,
+                                             "range.egb"))
+
+
+if __name__ == '__main__':
+    unittest.main()
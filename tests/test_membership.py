@@ -0,0 +1,58 @@
+# ElectionGuard Verifier Subgroup Membership Tests
+# Nicholas Boucher 2020
+import unittest
+from random import Random
+from constants import GENERATOR, PRIME, SUBGROUP_ORDER
+from membership import (MEMBERSHIP_LEAF, batch_members, find_non_members,
+                        membership_failures)
+
+# Elements outside the subgroup of order q
+NON_MEMBERS = [PRIME - 1, 0, PRIME]
+
+
+class MembershipTest(unittest.TestCase):
+    """Checks batches of group elements on either side of the size below
+    which elements are checked one at a time.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        rng = Random(0)
+        cls.members = [pow(GENERATOR, rng.randrange(SUBGROUP_ORDER), PRIME)
+                       for _ in range(MEMBERSHIP_LEAF + 6)]
+
+    def test_members(self) -> None:
+        for size in (1, MEMBERSHIP_LEAF, len(self.members)):
+            with self.subTest(size=size):
+                self.assertTrue(batch_members(self.members[:size], PRIME,
+                                              SUBGROUP_ORDER))
+
+    def test_non_members(self) -> None:
+        for size in (1, MEMBERSHIP_LEAF, len(self.members)):
+            for non_member in NON_MEMBERS:
+                with self.subTest(size=size, non_member=non_member):
+                    values = self.members[:size - 1] + [non_member]
+                    self.assertFalse(batch_members(values, PRIME,
+                                                   SUBGROUP_ORDER))
+
+    def test_find_non_members(self) -> None:
+        values = list(self.members)
+        positions = [3, len(values) - 2]
+        for position in positions:
+            values[position] = PRIME - 1
+        self.assertEqual(find_non_members(values, PRIME, SUBGROUP_ORDER),
+                         positions)
+
+    def test_membership_failures(self) -> None:
+        elements = [(index, value)
+                    for index, value in enumerate(self.members[:5])]
+        elements[2] = ("non-member", PRIME - 1)
+        self.assertEqual(membership_failures(elements, PRIME,
+                                             SUBGROUP_ORDER), ["non-member"])
+        self.assertEqual(membership_failures(
+            (("member", value) for value in self.members), PRIME,
+            SUBGROUP_ORDER), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# ElectionGuard Verifier Instrumentation Tests
+# Nicholas Boucher 2020
+from typing import Any, Dict, List
+import unittest
+from json import load
+from os.path import join
+from tempfile import TemporaryDirectory
+import metrics
+from metrics import set_listener, stage
+from parallel import shutdown_pools
+from tests.records import run_verifier, write_record
+
+
+class StageTest(unittest.TestCase):
+    """Times stages and notifies the listener as they start and finish."""
+
+    def setUp(self) -> None:
+        metrics.reset()
+
+    def tearDown(self) -> None:
+        set_listener(None)
+        metrics.reset()
+
+    def test_stages(self) -> None:
+        events: List[Dict[str, Any]] = []
+        set_listener(events.append)
+        for name in ("first", "second", "first"):
+            with stage(name):
+                pass
+        report = metrics.report()
+        self.assertEqual(list(report["stages"]), ["first", "second"])
+        self.assertEqual([(event["stage"], event["status"])
+                          for event in events],
+                         [("first", "started"), ("first", "finished"),
+                          ("second", "started"), ("second", "finished"),
+                          ("first", "started"), ("first", "finished")])
+        self.assertAlmostEqual(
+            report["stages"]["first"]["seconds"],
+            sum(event["seconds"] for event in events
+                if event["stage"] == "first" and "seconds" in event))
+
+    def test_failed_stage(self) -> None:
+        with self.assertRaises(ValueError), stage("failing"):
+            raise ValueError
+        self.assertIn("failing", metrics.report()["stages"])
+
+
+class MetricsJsonTest(unittest.TestCase):
+    """Writes the metrics of command line runs with `--metrics-json`."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.path = write_record(cls.directory.name, ballots=2)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutdown_pools()
+        cls.directory.cleanup()
+
+    def run_metrics(self, *arguments: str) -> Dict[str, Any]:
+        """Verifies the record with `arguments` and returns its metrics."""
+        metrics_path = join(self.directory.name, "metrics.json")
+        metrics.reset()
+        with self.assertLogs("election_verifier"):
+            run_verifier(self.path, "--metrics-json", metrics_path,
+                         *arguments)
+        with open(metrics_path) as f:
+            return load(f)
+
+    def test_metrics_json(self) -> None:
+        report = self.run_metrics()
+        self.assertTrue(report["valid"])
+        self.assertEqual((report["jobs"], report["batch"]), (1, False))
+        for name in ("load", "parameters", "key_ceremony", "ballot_proofs",
+                     "tallies", "spoiled_ballots"):
+            self.assertGreaterEqual(report["stages"][name]["seconds"], 0)
+        self.assertGreater(report["counters"]["modexp"], 0)
+        self.assertGreater(report["counters"]["hash"], 0)
+
+    def test_worker_counters(self) -> None:
+        # Operations counted by worker processes are merged into the report
+        single = self.run_metrics()
+        parallel = self.run_metrics("--jobs", "2", "--chunk-size", "1")
+        self.assertEqual(parallel["jobs"], 2)
+        self.assertEqual(parallel["counters"]["hash"],
+                         single["counters"]["hash"])
+
+
+if __name__ == '__main__':
+    unittest.main()
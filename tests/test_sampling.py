@@ -0,0 +1,50 @@
+# ElectionGuard Verifier Sampling Audit Tests
+# Nicholas Boucher 2020
+import unittest
+from sampling import binomial_cdf, invalid_fraction_bound, sample_positions
+
+
+class SamplingTest(unittest.TestCase):
+    """Checks seeded samples and the bound on the fraction of invalid
+    ballots.
+    """
+
+    def test_positions(self) -> None:
+        positions = sample_positions(1000, 50, 7)
+        self.assertEqual(positions, sample_positions(1000, 50, 7))
+        self.assertNotEqual(positions, sample_positions(1000, 50, 8))
+        self.assertEqual(positions, sorted(set(positions)))
+        self.assertEqual(len(positions), 50)
+        self.assertTrue(all(0 <= position < 1000 for position in positions))
+
+    def test_positions_capped(self) -> None:
+        self.assertEqual(sample_positions(5, 50, 0), [0, 1, 2, 3, 4])
+
+    def test_bound_without_invalid(self) -> None:
+        # Seeing no invalid ballots bounds the fraction at 1 - (1 - C)^(1/n)
+        for sampled in (1, 10, 100, 1000):
+            for confidence in (0.9, 0.95, 0.99):
+                with self.subTest(sampled=sampled, confidence=confidence):
+                    self.assertAlmostEqual(
+                        invalid_fraction_bound(0, sampled, confidence),
+                        1 - (1 - confidence) ** (1 / sampled))
+
+    def test_bound_with_invalid(self) -> None:
+        bound = invalid_fraction_bound(3, 50, 0.95)
+        self.assertGreater(bound, 3 / 50)
+        self.assertAlmostEqual(binomial_cdf(3, 50, bound), 0.05)
+
+    def test_bound_every_invalid(self) -> None:
+        self.assertEqual(invalid_fraction_bound(10, 10, 0.95), 1.0)
+
+    def test_bound_monotonic(self) -> None:
+        self.assertLess(invalid_fraction_bound(1, 100, 0.9),
+                        invalid_fraction_bound(1, 100, 0.99))
+        self.assertLess(invalid_fraction_bound(1, 1000, 0.95),
+                        invalid_fraction_bound(1, 100, 0.95))
+        self.assertLess(invalid_fraction_bound(1, 100, 0.95),
+                        invalid_fraction_bound(2, 100, 0.95))
+
+
+if __name__ == '__main__':
+    unittest.main()
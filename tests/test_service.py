@@ -0,0 +1,135 @@
+# ElectionGuard Verifier Service Tests
+# Nicholas Boucher 2020
+from typing import Any, Dict, List, Tuple
+import unittest
+from asyncio import create_task, gather, open_unix_connection, sleep
+from json import dumps, loads
+from os import kill
+from os.path import exists, join
+from signal import SIGKILL
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from service import JOB_OPTIONS, VerificationService, parse_request
+from tests.records import tamper, write_record
+
+
+class ParseRequestTest(unittest.TestCase):
+    """Parses the requests clients send to the verification service."""
+
+    def setUp(self) -> None:
+        self.record = NamedTemporaryFile(suffix=".json")
+
+    def tearDown(self) -> None:
+        self.record.close()
+
+    def parse(self, **request: Any) -> Tuple[str, Dict[str, Any]]:
+        return parse_request(dumps(dict(request, path=self.record.name))
+                             .encode())
+
+    def test_defaults(self) -> None:
+        self.assertEqual(self.parse(), (self.record.name, JOB_OPTIONS))
+
+    def test_options(self) -> None:
+        _, options = self.parse(batch=True, chunk_size=8)
+        self.assertTrue(options["batch"])
+        self.assertEqual(options["chunk_size"], 8)
+
+    def test_invalid(self) -> None:
+        for request in ({"jobs": 2}, {"chunk_size": 0}, {"batch": 1},
+                        {"unknown": True}):
+            with self.subTest(request=request), \
+                    self.assertRaises(ValueError):
+                self.parse(**request)
+
+    def test_missing_path(self) -> None:
+        for line in (b'{}', b'[]', b'{"path": "/nonexistent"}'):
+            with self.subTest(line=line), self.assertRaises(ValueError):
+                parse_request(line)
+
+
+class ServiceTest(unittest.IsolatedAsyncioTestCase):
+    """Runs the service on a Unix socket and verifies generated records
+    through it, as a client would.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.path = write_record(cls.directory.name, ballots=1, spoiled=1)
+        cls.tampered = tamper(cls.path,
+                              join(cls.directory.name, "tampered.json"),
+                              lambda r: r["contest_tallies"][0][0]
+                              .__setitem__("cleartext", 5))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    async def asyncSetUp(self) -> None:
+        self.address = join(self.directory.name, "service.sock")
+        self.service = VerificationService()
+        self.server = create_task(self.service.serve(self.address))
+        while not exists(self.address):
+            await sleep(0.05)
+
+    async def asyncTearDown(self) -> None:
+        self.server.cancel()
+        await gather(self.server, return_exceptions=True)
+
+    async def request(self, request: Dict[str, Any], kill_process: bool = False
+                      ) -> List[Dict[str, Any]]:
+        """Sends `request` and returns every message of the reply. With
+            `kill_process`, the job's pool process is killed once it has
+            started verifying."""
+        reader, writer = await open_unix_connection(self.address)
+        writer.write(dumps(request).encode() + b"\n")
+        messages = []
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return messages
+                messages.append(loads(line))
+                if kill_process and messages[-1]["type"] == "stage":
+                    kill_process = False
+                    for pid in self.service.executor._processes:
+                        kill(pid, SIGKILL)
+        finally:
+            writer.close()
+
+    async def test_valid_record(self) -> None:
+        messages = await self.request({"path": self.path})
+        self.assertEqual([message["type"] for message in messages[:2]],
+                         ["queued", "started"])
+        self.assertIn("stage", [message["type"] for message in messages])
+        self.assertEqual(messages[-1]["type"], "result")
+        self.assertTrue(messages[-1]["valid"])
+        self.assertIn("stages", messages[-1]["metrics"])
+
+    async def test_findings(self) -> None:
+        messages = await self.request({"path": self.tampered,
+                                       "keep_going": True})
+        findings = [message["finding"] for message in messages
+                    if message["type"] == "finding"]
+        self.assertEqual([(finding["check"], finding["contest"],
+                           finding["selection"]) for finding in findings],
+                         [("cleartext", 0, 0)])
+        self.assertFalse(messages[-1]["valid"])
+
+    async def test_invalid_request(self) -> None:
+        messages = await self.request({"path": self.path, "jobs": 2})
+        self.assertEqual([message["type"] for message in messages],
+                         ["error"])
+
+    async def test_recovers_from_dead_process(self) -> None:
+        # The job whose process is killed fails, and later jobs run in a
+        # new pool
+        messages = await self.request({"path": self.path},
+                                      kill_process=True)
+        self.assertEqual(messages[-1]["type"], "error")
+        messages = await self.request({"path": self.path})
+        self.assertEqual(messages[-1]["type"], "result")
+        self.assertTrue(messages[-1]["valid"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# ElectionGuard Verifier Precomputed Table Tests
+# Nicholas Boucher 2020
+from typing import Any, Callable, List
+import unittest
+from collections import OrderedDict
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+from constants import GENERATOR, PRIME
+from dlog import DiscreteLogTable, get_dlog_table
+from fixedbase import (FixedBaseTable, fixed_pow, load_tables, prepare_tables,
+                       save_tables)
+
+# A small group, whose tables are quick to build
+SMALL_PRIME, SMALL_BASE = 1019, 2
+
+
+def small_table(edit: Callable[[List[List[int]]], Any] = lambda rows: None
+                ) -> FixedBaseTable:
+    """Returns a table of `SMALL_BASE` with its rows changed by `edit`."""
+    table = FixedBaseTable(SMALL_BASE, SMALL_PRIME, window=2, bits=10)
+    edit(table.rows)
+    return table
+
+
+class FixedBaseTableTest(unittest.TestCase):
+    """Saves fixed-base tables and loads them back, rebuilding those which
+    are damaged on disk.
+    """
+
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, "record.tables")
+        # Each test starts without tables in this process
+        self.state = patch.multiple("fixedbase", _tables=OrderedDict(),
+                                    _loaded_paths=set())
+        self.state.start()
+
+    def tearDown(self) -> None:
+        self.state.stop()
+        self.directory.cleanup()
+
+    def test_round_trip(self) -> None:
+        table = small_table()
+        save_tables(self.path, [table])
+        loaded, = load_tables(self.path)
+        self.assertEqual((loaded.base, loaded.modulus, loaded.rows),
+                         (table.base, table.modulus, table.rows))
+        for exponent in (0, 1, 5, 1000, 1 << 12):
+            self.assertEqual(fixed_pow(SMALL_BASE, exponent, SMALL_PRIME,
+                                       self.path),
+                             pow(SMALL_BASE, exponent, SMALL_PRIME))
+
+    def test_damaged_tables(self) -> None:
+        def set_entry(row: int, digit: int) -> Callable:
+            return lambda rows: rows[row].__setitem__(digit, 5)
+        tables = {"other base": set_entry(0, 1),
+                  "broken chain": set_entry(1, 1),
+                  "last power": set_entry(2, 3)}
+        for name, edit in tables.items():
+            with self.subTest(name):
+                save_tables(self.path, [small_table(edit)])
+                with self.assertRaises(ValueError):
+                    load_tables(self.path)
+
+    def test_damaged_files(self) -> None:
+        save_tables(self.path, [small_table()])
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for name, damaged in (("magic", b"X" + data[1:]),
+                              ("truncated", data[:-1]),
+                              ("trailing", data + b"\0")):
+            with self.subTest(name):
+                with open(self.path, 'wb') as f:
+                    f.write(damaged)
+                with self.assertRaises(ValueError):
+                    load_tables(self.path)
+
+                # The damaged file is ignored, and the table built instead
+                with patch("fixedbase._loaded_paths", set()):
+                    self.assertEqual(fixed_pow(SMALL_BASE, 100, SMALL_PRIME,
+                                               self.path),
+                                     pow(SMALL_BASE, 100, SMALL_PRIME))
+
+    def test_prepare_rebuilds(self) -> None:
+        with open(self.path, 'wb') as f:
+            f.write(b"not a table file")
+        prepare_tables(self.path, [GENERATOR], PRIME)
+        loaded, = load_tables(self.path)
+        self.assertEqual(loaded.base, GENERATOR)
+        self.assertEqual(loaded.pow(12345), pow(GENERATOR, 12345, PRIME))
+
+
+class DiscreteLogTableTest(unittest.TestCase):
+    """Saves discrete log tables and loads them back, ignoring those which
+    are damaged on disk.
+    """
+
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, "record.dlog")
+        self.state = patch.multiple("dlog", _tables={}, _loaded_paths=set())
+        self.state.start()
+
+    def tearDown(self) -> None:
+        self.state.stop()
+        self.directory.cleanup()
+
+    def saved_table(self, generator: int = SMALL_BASE) -> bytes:
+        """Saves a table of `generator` and returns the file's contents."""
+        table = DiscreteLogTable(generator, SMALL_PRIME)
+        table.extend(100)
+        table.save(self.path)
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def test_round_trip(self) -> None:
+        self.saved_table()
+        table = get_dlog_table(SMALL_BASE, SMALL_PRIME, self.path)
+        self.assertEqual(len(table), 100)
+        self.assertEqual(table.log(pow(SMALL_BASE, 42, SMALL_PRIME), 100), 42)
+        self.assertEqual(table.log(pow(SMALL_BASE, 300, SMALL_PRIME), 300),
+                         300)
+
+    def test_damaged_files(self) -> None:
+        data = self.saved_table()
+        other = self.saved_table(3)
+        # The header names the expected generator, but the powers are of
+        # another one
+        header = len(data) - 800
+        for name, damaged in (("magic", b"X" + data[1:]),
+                              ("truncated", data[:-1]),
+                              ("trailing", data + b"\0"),
+                              ("other powers", data[:header] +
+                               other[header:])):
+            with self.subTest(name):
+                with open(self.path, 'wb') as f:
+                    f.write(damaged)
+                with self.assertRaises(ValueError):
+                    DiscreteLogTable.load(self.path, SMALL_BASE, SMALL_PRIME)
+
+                # The damaged file is ignored, and the table extended instead
+                with patch.multiple("dlog", _tables={}, _loaded_paths=set()):
+                    table = get_dlog_table(SMALL_BASE, SMALL_PRIME, self.path)
+                    self.assertEqual(len(table), 0)
+                    self.assertEqual(table.log(
+                        pow(SMALL_BASE, 42, SMALL_PRIME), 100), 42)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# ElectionGuard Verifier Ballot Tracker Index Tests
+# Nicholas Boucher 2020
+from typing import Any, Dict
+import unittest
+from json import loads
+from os.path import join
+from tempfile import TemporaryDirectory
+from binary import write_binary_record
+from constants import LOG_NORMAL
+from loader import load_election_record
+from tests.records import run_verifier, tamper, write_record
+from trackers import build_index, lookup_ballots, open_index
+from verify import compute_extended_base_hash
+
+
+def duplicate(record: Dict[str, Any]) -> None:
+    """Reuses the tracker of cast ballot 0 for ballot 2, and replays the
+        ciphertexts of ballot 1 as ballot 3."""
+    ballots = record["cast_ballots"]
+    ballots[2]["ballot_info"]["tracker"] = ballots[0]["ballot_info"]["tracker"]
+    ballots[3]["contests"] = ballots[1]["contests"]
+
+
+class TrackerIndexTest(unittest.TestCase):
+    """Indexes the cast ballots of JSON and binary records by tracker and by
+    ciphertexts, and looks ballots up through the index.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.path = write_record(cls.directory.name)
+        cls.duplicated = tamper(cls.path,
+                                join(cls.directory.name, "duplicated.json"),
+                                duplicate)
+        cls.binary_path = join(cls.directory.name, "duplicated.egb")
+        write_binary_record(load_election_record(cls.duplicated),
+                            cls.binary_path)
+        with open(cls.duplicated) as f:
+            cls.trackers = [ballot["ballot_info"]["tracker"]
+                            for ballot in loads(f.read())["cast_ballots"]]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    def index(self, path: str) -> Any:
+        election = load_election_record(path)
+        return build_index(election, path, join(self.directory.name,
+                                                "index.trackers"),
+                           compute_extended_base_hash(election))
+
+    def test_no_duplicates(self) -> None:
+        self.assertEqual(self.index(self.path), [])
+
+    def test_duplicates(self) -> None:
+        for path in (self.duplicated, self.binary_path):
+            with self.subTest(path=path):
+                self.assertEqual([(finding.check, finding.ballot,
+                                   finding.tracker)
+                                  for finding in self.index(path)],
+                                 [("duplicate_tracker", 2, self.trackers[0]),
+                                  ("replayed_ciphertext", 3,
+                                   self.trackers[3])])
+
+    def test_lookup(self) -> None:
+        for path in (self.duplicated, self.binary_path):
+            with self.subTest(path=path):
+                index_path = join(self.directory.name, "lookup.trackers")
+                index = open_index(path, index_path)
+                try:
+                    self.assertEqual(
+                        [(ballot_index, ballot.ballot_info.tracker)
+                         for ballot_index, ballot in
+                         lookup_ballots(index, path, self.trackers[0])],
+                        [(0, self.trackers[0]), (2, self.trackers[0])])
+                    self.assertEqual(lookup_ballots(index, path, "unknown"),
+                                     [])
+                finally:
+                    index.close()
+
+    def test_stale_index(self) -> None:
+        # An index of another record file is rebuilt before it is used
+        index_path = join(self.directory.name, "stale.trackers")
+        open_index(self.path, index_path).close()
+        index = open_index(self.duplicated, index_path)
+        try:
+            self.assertTrue(index.is_current(self.duplicated))
+            self.assertEqual(len(lookup_ballots(index, self.duplicated,
+                                                self.trackers[0])), 2)
+        finally:
+            index.close()
+
+    def test_command_line(self) -> None:
+        findings_path = join(self.directory.name, "findings.jsonl")
+        with self.assertLogs("election_verifier", LOG_NORMAL) as logs:
+            run_verifier(self.duplicated, "--index", "--findings",
+                         findings_path)
+        self.assertIn("2 duplicate cast ballots", logs.output[-1])
+        with open(findings_path) as f:
+            self.assertEqual([loads(line)["check"] for line in f],
+                             ["duplicate_tracker", "replayed_ciphertext"])
+
+        with self.assertLogs("election_verifier", LOG_NORMAL) as logs:
+            run_verifier(self.duplicated, "--lookup", self.trackers[0])
+        self.assertIn(f"Tracker {self.trackers[0]} is used by 2 cast "
+                      "ballots.", logs.output[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,435 @@
+# ElectionGuard Verifier Verification Tests
+# Nicholas Boucher 2020
+from typing import Any, Dict, List, Tuple
+import unittest
+from json import loads
+from os import listdir, remove
+from os.path import isfile, join
+from socket import create_connection
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest.mock import patch
+from binary import write_binary_record
+from checkpoint import (Checkpoint, file_digest, load_checkpoint,
+                        save_checkpoint)
+from cluster import Coordinator, receive_message, send_message
+from constants import GENERATOR, PRIME
+from dlog import DiscreteLogTable, get_dlog_table
+from findings import Finding
+from fixedbase import load_tables
+from loader import load_election_record
+from parallel import shutdown_pools
+from sampling import sample_positions
+from tally import TallyAccumulator
+from tests.records import tamper, verify_findings, write_record
+from verify import verify_ballot_chunk
+from worker import run_worker
+
+
+def increment(obj: Dict[str, Any], key: str) -> None:
+    obj[key] = int(obj[key]) + 1
+
+
+def location(finding: Dict[str, Any]) -> Tuple:
+    """Returns the check and location fields of a finding."""
+    return (finding["check"], finding["source"], finding["ballot"],
+            finding["contest"], finding["selection"], finding["trustee"])
+
+
+# Changes to a record which do not interfere with one another, along with
+# the findings each must cause
+TAMPERS: List[Tuple[str, Any, List[Tuple]]] = [
+    ("cast selection proof",
+     lambda r: increment(r["cast_ballots"][1]["contests"][0]["selections"][1]
+                         ["zero_proof"], "response"),
+     [("selection_proof", "cast", 1, 0, 1, None)]),
+    ("cast contest proof",
+     lambda r: increment(r["cast_ballots"][2]["contests"][1]
+                         ["num_selections_proof"], "response"),
+     [("contest_proof", "cast", 2, 1, None, None)]),
+    ("cast non-member",
+     lambda r: r["cast_ballots"][0]["contests"][0]["selections"][0]
+                ["message"].__setitem__("ciphertext", PRIME - 1),
+     [("membership", "cast", 0, 0, 0, None),
+      ("selection_challenge", "cast", 0, 0, 0, None),
+      ("encrypted_tally", "tally", None, 0, 0, None)]),
+    ("tally cleartext",
+     lambda r: increment(r["contest_tallies"][0][1], "cleartext"),
+     [("cleartext", "tally", None, 0, 1, None)]),
+    ("tally share proof",
+     lambda r: increment(r["contest_tallies"][1][0]["shares"][0]["proof"],
+                         "response"),
+     [("share_proof", "tally", None, 1, 0, None)]),
+    ("spoiled cleartext",
+     lambda r: r["spoiled_ballots"][1]["contests"][0][0].__setitem__(
+         "cleartext", 2),
+     [("cleartext", "spoiled", 1, 0, 0, None)]),
+    ("trustee proof",
+     lambda r: increment(r["trustee_public_keys"][1][0]["proof"],
+                         "response"),
+     [("schnorr_proof", None, None, None, None, 1)]),
+]
+
+
+def tamper_all(record: Dict[str, Any]) -> None:
+    for _, edit, _ in TAMPERS:
+        edit(record)
+
+
+# Invalid answers of a worker node to the first shard it is assigned
+ROGUE_RESULTS = {
+    "unassigned shard": lambda shard: {"type": "result",
+                                       "id": shard["id"] + 1000,
+                                       "findings": [], "tally": None},
+    "malformed result": lambda shard: {"type": "result", "id": shard["id"],
+                                       "findings": [{}], "tally": None},
+    "short tally": lambda shard: {"type": "result", "id": shard["id"],
+                                  "findings": [],
+                                  "tally": {"prime": PRIME, "products": [],
+                                            "count": 0}},
+    "finding outside shard": lambda shard: {
+        "type": "result", "id": shard["id"],
+        "findings": [Finding("selection_proof", "Forged.", source="cast",
+                             ballot=shard["stop"]).to_dict()],
+        "tally": {"prime": PRIME, "products": [],
+                  "count": shard["stop"] - shard["start"]}},
+    "silent": lambda shard: None,
+}
+
+
+def run_rogue_node(address: Tuple[str, int], digest: str, answer: Any
+                   ) -> None:
+    """Answers the first shard assigned with `answer(shard)`, unless it is
+        None."""
+    with create_connection(address) as connection:
+        send_message(connection, {"type": "hello", "digest": digest})
+        result = answer(receive_message(connection))
+        if result is not None:
+            send_message(connection, result)
+        while receive_message(connection) is not None:
+            pass
+
+
+class VerifyTest(unittest.TestCase):
+    """Verifies a valid generated record, and a copy with every change of
+    `TAMPERS`, whose findings must be identical in every mode.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.path = write_record(cls.directory.name, ballots=3)
+        cls.tampered = tamper(cls.path,
+                              join(cls.directory.name, "tampered.json"),
+                              tamper_all)
+        cls.valid, cls.findings = verify_findings(cls.tampered,
+                                                  cls.directory.name)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutdown_pools()
+        cls.directory.cleanup()
+
+    def assertIdenticalFindings(self, **options: Any) -> None:
+        self.assertEqual(verify_findings(self.tampered, self.directory.name,
+                                         **options),
+                         (self.valid, self.findings))
+
+    def test_valid_record(self) -> None:
+        self.assertEqual(verify_findings(self.path, self.directory.name),
+                         (True, []))
+
+    def test_tampered_fields(self) -> None:
+        self.assertFalse(self.valid)
+        found = [location(finding) for finding in self.findings]
+        for name, _, expected in TAMPERS:
+            with self.subTest(name):
+                for finding in expected:
+                    self.assertIn(finding, found)
+        self.assertCountEqual(found, [finding for _, _, expected in TAMPERS
+                                      for finding in expected])
+
+    def test_extended_base_hash(self) -> None:
+        path = tamper(self.path, join(self.directory.name, "hash.json"),
+                      lambda r: r.__setitem__(
+                          "extended_base_hash",
+                          str(int(r["extended_base_hash"]) + 1)))
+        valid, findings = verify_findings(path, self.directory.name)
+        self.assertFalse(valid)
+        self.assertEqual([finding["check"] for finding in findings],
+                         ["extended_base_hash"])
+
+    def test_fragment_threshold(self) -> None:
+        # An absent trustee publishing fewer commitments does not lower the
+        # number of fragments needed to reconstruct its share
+        def edit(record: Dict[str, Any]) -> None:
+            del record["trustee_public_keys"][2][1:]
+            del record["contest_tallies"][0][0]["shares"][2]["fragments"][1:]
+        path = tamper(self.path, join(self.directory.name, "threshold.json"),
+                      edit)
+        valid, findings = verify_findings(path, self.directory.name)
+        self.assertFalse(valid)
+        self.assertIn(("fragment_count", "tally", None, 0, 0, None),
+                      [location(finding) for finding in findings])
+
+    def test_trustee_without_keys(self) -> None:
+        path = tamper(self.path, join(self.directory.name, "keys.json"),
+                      lambda r: r["trustee_public_keys"].__setitem__(0, []))
+        valid, findings = verify_findings(path, self.directory.name)
+        self.assertFalse(valid)
+        found = [location(finding) for finding in findings]
+        for finding in [("commitment_count", None, None, None, None, 0),
+                        ("joint_public_key", None, None, None, None, None),
+                        ("share_proof", "tally", None, 0, 0, None)]:
+            self.assertIn(finding, found)
+
+    def test_trustee_count(self) -> None:
+        path = tamper(self.path, join(self.directory.name, "trustees.json"),
+                      lambda r: r["trustee_public_keys"].pop())
+        valid, findings = verify_findings(path, self.directory.name)
+        self.assertFalse(valid)
+        self.assertIn("trustee_count",
+                      [finding["check"] for finding in findings])
+
+    def test_stops_after_failed_stage(self) -> None:
+        valid, findings = verify_findings(self.tampered, self.directory.name,
+                                          keep_going=False)
+        self.assertFalse(valid)
+        self.assertLess(len(findings), len(self.findings))
+
+    def test_batch(self) -> None:
+        self.assertIdenticalFindings(batch=True)
+
+    def test_jobs(self) -> None:
+        self.assertIdenticalFindings(jobs=2, chunk_size=1)
+
+    def test_lazy_ints(self) -> None:
+        self.assertIdenticalFindings(lazy_ints=True)
+
+    def test_binary_record(self) -> None:
+        path = join(self.directory.name, "tampered.egb")
+        write_binary_record(load_election_record(self.tampered), path)
+        self.assertEqual(verify_findings(path, self.directory.name),
+                         (self.valid, self.findings))
+
+    def test_cache(self) -> None:
+        cache_path = join(self.directory.name, "cache")
+        options = {"cache_path": cache_path,
+                   "digest": file_digest(self.tampered)}
+        self.assertIdenticalFindings(**options)
+        self.assertTrue(listdir(cache_path))
+        self.assertIdenticalFindings(**options)
+
+    def test_fixed_base_tables(self) -> None:
+        # The tables are saved by the first run and loaded by the second
+        table_path = join(self.directory.name, "record.tables")
+        self.assertIdenticalFindings(table_path=table_path)
+        bases = {table.base for table in load_tables(table_path)}
+        self.assertTrue({GENERATOR, load_election_record(self.tampered)
+                         .joint_public_key} <= bases)
+        with patch("fixedbase._loaded_paths", set()):
+            self.assertIdenticalFindings(table_path=table_path)
+
+    def test_dlog_table(self) -> None:
+        dlog_path = join(self.directory.name, "record.dlog")
+        with patch.dict("dlog._tables", clear=True):
+            self.assertIdenticalFindings(dlog_path=dlog_path)
+        table = DiscreteLogTable.load(dlog_path, GENERATOR, PRIME)
+        self.assertGreater(len(table), 0)
+
+        # The saved table is loaded in place of an empty one
+        with patch.dict("dlog._tables", clear=True), \
+                patch("dlog._loaded_paths", set()):
+            self.assertIdenticalFindings(dlog_path=dlog_path)
+            self.assertEqual(len(get_dlog_table(GENERATOR, PRIME)),
+                             len(table))
+
+    def verify_cluster(self, rogue: Any = None
+                       ) -> Tuple[bool, List[Dict[str, Any]]]:
+        """Verifies the tampered record across two worker nodes, one of
+            which answers with `rogue(shard)` when it is given."""
+        digest = file_digest(self.tampered)
+        # Long enough for the honest node to verify a shard, so that only a
+        # silent node times out
+        coordinator = Coordinator(("127.0.0.1", 0), digest, timeout=10)
+        address = coordinator.server.getsockname()[:2]
+        nodes = [Thread(target=run_worker, args=(address, self.tampered)),
+                 Thread(target=run_rogue_node, args=(address, digest, rogue))
+                 if rogue is not None else
+                 Thread(target=run_worker, args=(address, self.tampered))]
+        for node in nodes:
+            node.start()
+        try:
+            coordinator.accept(len(nodes))
+            return verify_findings(self.tampered, self.directory.name,
+                                   cluster=coordinator, shard_size=1,
+                                   digest=digest)
+        finally:
+            coordinator.close()
+            for node in nodes:
+                node.join()
+
+    def test_cluster(self) -> None:
+        self.assertEqual(self.verify_cluster(), (self.valid, self.findings))
+
+    def test_cluster_drops_rogue_nodes(self) -> None:
+        for name, answer in ROGUE_RESULTS.items():
+            with self.subTest(name):
+                self.assertEqual(self.verify_cluster(answer),
+                                 (self.valid, self.findings))
+
+    def test_sample(self) -> None:
+        # Only the sampled cast ballots are checked, but the encrypted
+        # tallies still cover every cast ballot
+        positions = sample_positions(3, 2, 1)
+        expected = [finding for finding in self.findings
+                    if finding["source"] != "cast"
+                    or finding["ballot"] in positions]
+        self.assertLess(len(expected), len(self.findings))
+        self.assertEqual(verify_findings(self.tampered, self.directory.name,
+                                         sample=2, seed=1),
+                         (False, expected))
+
+    def test_sample_checks_every_tally(self) -> None:
+        # A forged encrypted tally is found however few ballots are sampled
+        path = tamper(self.path, join(self.directory.name, "forged.json"),
+                      lambda r: increment(r["contest_tallies"][0][0]
+                                          ["encrypted_tally"], "ciphertext"))
+        valid, findings = verify_findings(path, self.directory.name,
+                                          sample=1, seed=1)
+        self.assertFalse(valid)
+        self.assertIn(("encrypted_tally", "tally", None, 0, 0, None),
+                      [location(finding) for finding in findings])
+
+    def test_resume_checkpoint(self) -> None:
+        # Interrupt the verification while checking the second cast ballot,
+        # after the first was checkpointed, then resume from the checkpoint
+        checkpoint_path = join(self.directory.name, "checkpoint")
+        options = {"checkpoint_path": checkpoint_path,
+                   "digest": file_digest(self.tampered), "chunk_size": 1}
+        checked = []
+
+        def check_chunk(ctx: Any, start: int, ballots: List[Any]) -> Any:
+            if start == 1 and 1 not in checked:
+                checked.append(start)
+                raise KeyboardInterrupt
+            checked.append(start)
+            return verify_ballot_chunk(ctx, start, ballots)
+
+        with patch("verify.CHECKPOINT_INTERVAL", 0), \
+                patch("verify.verify_ballot_chunk", check_chunk):
+            with self.assertRaises(KeyboardInterrupt):
+                verify_findings(self.tampered, self.directory.name,
+                                **options)
+            checkpoint = load_checkpoint(checkpoint_path, options["digest"])
+            self.assertEqual(checkpoint.cast_ballots_done, 1)
+            self.assertEqual(checkpoint.tally.count, 1)
+
+            # Only the ballots after the checkpoint are checked again
+            self.assertIdenticalFindings(resume=True, **options)
+        self.assertEqual(checked, [0, 1, 1, 2])
+        self.assertEqual(load_checkpoint(checkpoint_path, options["digest"])
+                         .cast_ballots_done, 3)
+
+    def test_checkpoint_of_other_record(self) -> None:
+        # A checkpoint of another record is ignored
+        checkpoint_path = join(self.directory.name, "other-checkpoint")
+        save_checkpoint(checkpoint_path, Checkpoint(
+            file_digest(self.path), 3, [], TallyAccumulator(PRIME)))
+        self.assertIdenticalFindings(checkpoint_path=checkpoint_path,
+                                     digest=file_digest(self.tampered),
+                                     resume=True)
+
+    def test_incremental_state_with_cache(self) -> None:
+        # The state is written even when the whole record's results are
+        # already cached
+        options = {"cache_path": join(self.directory.name, "state-cache"),
+                   "digest": file_digest(self.tampered)}
+        self.assertIdenticalFindings(**options)
+        state_path = join(self.directory.name, "state")
+        self.assertIdenticalFindings(state_path=state_path, **options)
+        self.assertTrue(isfile(state_path))
+        self.assertIdenticalFindings(state_path=state_path, **options)
+
+
+class IncrementalTest(unittest.TestCase):
+    """Verifies records incrementally after ballots are appended or changed,
+    which must only check those ballots yet report the findings of a full
+    verification.
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.directory = TemporaryDirectory()
+        cls.path = write_record(cls.directory.name)
+        with open(cls.path) as f:
+            cls.trackers = [ballot["ballot_info"]["tracker"]
+                            for ballot in loads(f.read())["cast_ballots"]]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.directory.cleanup()
+
+    def record(self, name: str, edit: Any) -> str:
+        return tamper(self.path, join(self.directory.name, name), edit)
+
+    def verify_incremental(self, *paths: str
+                           ) -> Tuple[List[str], Tuple[bool, List[Any]]]:
+        """Verifies each of `paths` in turn with the same state, returning
+            the trackers of the cast ballots checked by the last run along
+            with its findings."""
+        state_path = join(self.directory.name, "state")
+        if isfile(state_path):
+            remove(state_path)
+        checked: List[str] = []
+
+        def check_chunk(ctx: Any, start: int, ballots: List[Any]) -> Any:
+            checked.extend(ballot.ballot_info.tracker for ballot in ballots)
+            return verify_ballot_chunk(ctx, start, ballots)
+
+        for path in paths:
+            checked.clear()
+            with patch("verify.verify_ballot_chunk", check_chunk):
+                findings = verify_findings(path, self.directory.name,
+                                           state_path=state_path)
+        return checked, findings
+
+    def test_appended(self) -> None:
+        prefix = self.record("prefix.json",
+                             lambda r: r["cast_ballots"].pop())
+        checked, findings = self.verify_incremental(prefix, self.path)
+        self.assertEqual(checked, self.trackers[-1:])
+        self.assertEqual(findings, (True, []))
+
+    def test_changed(self) -> None:
+        changed = self.record(
+            "changed.json",
+            lambda r: increment(r["cast_ballots"][2]["contests"][0]
+                                ["selections"][0]["zero_proof"],
+                                "response"))
+        checked, findings = self.verify_incremental(self.path, changed)
+        self.assertEqual(checked, [self.trackers[2]])
+        self.assertEqual(findings, verify_findings(changed,
+                                                   self.directory.name))
+        self.assertFalse(findings[0])
+
+        # Changing the ballot back checks it again
+        checked, findings = self.verify_incremental(self.path, changed,
+                                                    self.path)
+        self.assertEqual(checked, [self.trackers[2]])
+        self.assertEqual(findings, (True, []))
+
+    def test_duplicated_tracker(self) -> None:
+        # A ballot reusing an earlier tracker is always checked
+        duplicated = self.record(
+            "duplicated.json",
+            lambda r: r["cast_ballots"][3]["ballot_info"].__setitem__(
+                "tracker", self.trackers[0]))
+        checked, findings = self.verify_incremental(self.path, duplicated)
+        self.assertEqual(checked, [self.trackers[0]])
+        self.assertEqual(findings, verify_findings(duplicated,
+                                                   self.directory.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+# ElectionGuard Verifier Ballot Tracker Index
+# Nicholas Boucher 2020
+#
+# A tracker index locates the cast ballots of a record file by tracker, and by
+# their ciphertexts, without reading the rest of the record:
+#
+#     magic                 8 bytes
+#     record size           u64
+#     record mtime          u64 nanoseconds
+#     cast ballot count     u64
+#     joint public key      element
+#     extended base hash    element
+#     tracker entries       one per cast ballot, sorted
+#     ciphertext entries    one per cast ballot, sorted
+#
+# Each entry holds a key, the first bytes of the SHA-256 digest of a tracker
+# or of a ballot's ciphertexts, followed by the ballot's index and file offset
+# as big-endian u64s, so that entries sort by key and then by ballot. Lookups
+# are binary searches of the memory-mapped index, and ballots sharing a key
+# are adjacent.
+from typing import Any, List, Sequence, Tuple, Union
+from bisect import bisect_left
+from hashlib import sha256
+from mmap import mmap, ACCESS_READ
+from os import replace, stat
+from os.path import isfile
+from struct import Struct
+from binary import BinaryElectionRecord, ELEMENT_SIZE, ciphertext_digest
+from constants import BYTE_ORDER
+from findings import Finding
+from loader import (ElectionRecordStream, load_election_record,
+                    read_cast_ballot)
+from models import EncryptedBallot
+from verify import compute_extended_base_hash
+
+# Identifies a tracker index file
+MAGIC = b"EGTIX1\n\0"
+
+# Number of digest bytes kept as the key of an entry
+KEY_SIZE = 16
+
+_HEADER = Struct("<QQQ")
+_ENTRY = Struct(f">{KEY_SIZE}sQQ")
+
+# The index and file offset of a cast ballot
+Location = Tuple[int, int]
+
+
+def tracker_key(tracker: str) -> bytes:
+    """Returns the index key of `tracker`."""
+    return sha256(tracker.encode()).digest()[:KEY_SIZE]
+
+
+def ciphertext_key(ballot: EncryptedBallot) -> bytes:
+    """Returns the index key of the ciphertexts of `ballot`."""
+    return bytes.fromhex(ciphertext_digest(ballot))[:KEY_SIZE]
+
+
+class _Keys(Sequence[bytes]):
+    """The keys of one sorted section of an index, for binary search."""
+    data: memoryview
+    """The position of the section in the index file."""
+    pos: int
+    length: int
+
+    def __init__(self, data: memoryview, pos: int, length: int) -> None:
+        self.data = data
+        self.pos = pos
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, position: Any) -> Any:
+        start = self.pos + position * _ENTRY.size
+        return bytes(self.data[start:start + KEY_SIZE])
+
+    def locations(self, key: bytes) -> List[Location]:
+        """Returns the location of every ballot with `key`."""
+        locations = []
+        position = bisect_left(self, key)
+        while position < self.length and self[position] == key:
+            _, index, offset = _ENTRY.unpack_from(
+                self.data, self.pos + position * _ENTRY.size)
+            locations.append((index, offset))
+            position += 1
+        return locations
+
+
+class TrackerIndex:
+    """A memory-mapped tracker index of the cast ballots of a record file."""
+    """The size and modification time of the record file when indexed."""
+    record_size: int
+    record_mtime: int
+    count: int
+    """The joint public key and the extended base hash, from which a cast
+    ballot's proofs can be checked without reading the record header.
+    """
+    joint_public_key: int
+    extended_base_hash: int
+    trackers: _Keys
+    ciphertexts: _Keys
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as f:
+            self._map = mmap(f.fileno(), 0, access=ACCESS_READ)
+        data = self._data = memoryview(self._map)
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a tracker index.")
+        pos = len(MAGIC)
+        self.record_size, self.record_mtime, self.count = \
+            _HEADER.unpack_from(data, pos)
+        pos += _HEADER.size
+        self.joint_public_key = int.from_bytes(
+            data[pos:pos + ELEMENT_SIZE], BYTE_ORDER)
+        pos += ELEMENT_SIZE
+        self.extended_base_hash = int.from_bytes(
+            data[pos:pos + ELEMENT_SIZE], BYTE_ORDER)
+        pos += ELEMENT_SIZE
+        self.trackers = _Keys(data, pos, self.count)
+        self.ciphertexts = _Keys(data, pos + self.count * _ENTRY.size,
+                                 self.count)
+
+    def is_current(self, record_path: str) -> bool:
+        """Returns true when the record file is unchanged since indexed."""
+        record = stat(record_path)
+        return (record.st_size, record.st_mtime_ns) == \
+            (self.record_size, self.record_mtime)
+
+    def find_tracker(self, tracker: str) -> List[Location]:
+        """Returns the locations of the cast ballots which may have
+            `tracker`, which are confirmed by reading the ballots."""
+        return self.trackers.locations(tracker_key(tracker))
+
+    def find_ciphertexts(self, ballot: EncryptedBallot) -> List[Location]:
+        """Returns the locations of the cast ballots which may have the same
+            ciphertexts as `ballot`."""
+        return self.ciphertexts.locations(ciphertext_key(ballot))
+
+    def close(self) -> None:
+        self._data.release()
+        self._map.close()
+
+
+def _duplicates(entries: List[bytes]) -> List[Tuple[Location, Location]]:
+    """Returns the location of each ballot in the sorted `entries` whose key
+        matches an earlier entry's, along with the location of the first
+        ballot with the key."""
+    duplicates = []
+    first_key, first = b"", (0, 0)
+    for entry in entries:
+        key, index, offset = _ENTRY.unpack(entry)
+        if key != first_key:
+            first_key, first = key, (index, offset)
+        else:
+            duplicates.append(((index, offset), first))
+    return duplicates
+
+
+def build_index(election: Union[ElectionRecordStream, BinaryElectionRecord],
+                record_path: str, index_path: str,
+                extended_base_hash: int) -> List[Finding]:
+    """Writes the tracker index of the record file at `record_path` to
+        `index_path`, reading each cast ballot once without keeping it in
+        memory. Returns a finding for each cast ballot whose tracker or
+        ciphertexts duplicate those of an earlier ballot."""
+    record = stat(record_path)
+    trackers, ciphertexts = [], []
+    for index, (offset, ballot) in enumerate(
+            election.cast_ballots.iter_located()):
+        trackers.append(_ENTRY.pack(tracker_key(ballot.ballot_info.tracker),
+                                    index, offset))
+        ciphertexts.append(_ENTRY.pack(ciphertext_key(ballot), index,
+                                       offset))
+    trackers.sort()
+    ciphertexts.sort()
+
+    with open(f"{index_path}.tmp", 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(record.st_size, record.st_mtime_ns,
+                             len(trackers)))
+        f.write(int(election.joint_public_key).to_bytes(ELEMENT_SIZE,
+                                                        BYTE_ORDER))
+        f.write(extended_base_hash.to_bytes(ELEMENT_SIZE, BYTE_ORDER))
+        f.writelines(trackers)
+        f.writelines(ciphertexts)
+    replace(f"{index_path}.tmp", index_path)
+
+    # Confirm each duplicate key by reading the ballots involved, which are
+    # expected to be rare
+    findings = []
+    for (index, offset), (first, first_offset) in _duplicates(trackers):
+        tracker = read_cast_ballot(record_path, offset).ballot_info.tracker
+        if read_cast_ballot(record_path,
+                            first_offset).ballot_info.tracker == tracker:
+            findings.append(Finding("duplicate_tracker",
+                                    "Tracker is also used by cast ballot "
+                                    f"{first}.", source="cast", ballot=index,
+                                    tracker=tracker))
+    for (index, offset), (first, first_offset) in _duplicates(ciphertexts):
+        ballot = read_cast_ballot(record_path, offset)
+        if ciphertext_digest(ballot) == ciphertext_digest(
+                read_cast_ballot(record_path, first_offset)):
+            findings.append(Finding("replayed_ciphertext",
+                                    "Ciphertexts are identical to those of "
+                                    f"cast ballot {first}.", source="cast",
+                                    ballot=index,
+                                    tracker=ballot.ballot_info.tracker))
+    return sorted(findings, key=lambda finding: finding.ballot)
+
+
+def open_index(record_path: str, index_path: str) -> TrackerIndex:
+    """Opens the tracker index of the record file at `record_path` stored at
+        `index_path`, first building it when it is missing or the record
+        has changed since."""
+    if isfile(index_path):
+        index = TrackerIndex(index_path)
+        if index.is_current(record_path):
+            return index
+        index.close()
+    election = load_election_record(record_path)
+    build_index(election, record_path, index_path,
+                compute_extended_base_hash(election))
+    return TrackerIndex(index_path)
+
+
+def lookup_ballots(index: TrackerIndex, record_path: str,
+                   tracker: str) -> List[Tuple[int, EncryptedBallot]]:
+    """Returns the index and decoding of each cast ballot with `tracker` in
+        the record file at `record_path`, in order."""
+    ballots = []
+    for ballot_index, offset in index.find_tracker(tracker):
+        ballot = read_cast_ballot(record_path, offset)
+        if ballot.ballot_info.tracker == tracker:
+            ballots.append((ballot_index, ballot))
+    return ballots
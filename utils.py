@@ -1,20 +1,35 @@
 # ElectionGuard Verification Utilities
 # Nicholas Boucher 2020
-from constants import LOG_VERBOSE, LOG_NORMAL, BYTE_ORDER
+from constants import LOG_VERBOSE, LOG_NORMAL, BYTE_ORDER, SUBGROUP_ORDER
 from logging import basicConfig, getLogger
+from hashlib import sha256
+from metrics import counters
 
 def int_to_bytes(num: int) -> bytes:
     """Converts an integer to a sequence of bytes with byte order set by
         in the program constants."""
     # Determine the number of bytes needed in the buffer
-    num_bytes = 0
-    temp = num
-    while temp != 0:
-        temp >>= 8
-        num_bytes += 1
-        
+    num_bytes = (num.bit_length() + 7) // 8
+
     # Convert the integer to bytes in the specified byte ordering
-    return num.to_bytes(num_bytes, BYTE_ORDER)
+    return int(num).to_bytes(num_bytes, BYTE_ORDER)
+
+def hash_elems(*elems: int) -> int:
+    """Returns the SHA-256 hash of the passed integers, taken in order and
+        reduced modulo the subgroup order, for use as a proof challenge."""
+    # Hash each element using the same encoding as the extended base hash
+    counters["hash"] += 1
+    digest = sha256()
+    for elem in elems:
+        digest.update(int_to_bytes(elem))
+
+    # Interpret the digest as an integer in the subgroup exponent range
+    return int.from_bytes(digest.digest(), BYTE_ORDER) % SUBGROUP_ORDER
+
+def hash_to_int(value: str) -> int:
+    """Converts a hash stored as a decimal string in the election record to
+        an integer."""
+    return int(value)
 
 def fail(message: str) -> bool:
     """Outputs a failure log message with the passed text and
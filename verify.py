@@ -1,55 +1,719 @@
 # ElectionGuard Verifier
 # Nicholas Boucher 2020
-from models import ElectionRecord
-from constants import PRIME, GENERATOR, BYTE_ORDER
-from utils import fail, int_to_bytes
+from typing import (Any, Callable, Dict, Iterator, List, Optional, Tuple,
+                    TypeVar, Union)
+from models import (BallotDecryption, ElectionRecord, EncryptedBallot,
+                    SelectionDecryption, TallyDecryption)
+from loader import ElectionRecordStream, iter_digests, iter_from
+from constants import (PRIME, GENERATOR, SUBGROUP_ORDER, BYTE_ORDER,
+                       LOG_NORMAL)
+from proofs import ProofContext, verify_ballot
+from batch import batch_holds, verify_ballots_batch
+from tally import TallyAccumulator
+from dlog import get_dlog_table
+from decryption import (KEY_TABLE_THRESHOLD, DecryptionContext,
+                        check_equations, decryption_equations,
+                        verify_decryption)
+from keyceremony import fragment_key_chunk, fragment_key_ids, verify_key_chunk
+from membership import (ballot_decryption_elements, encrypted_ballot_elements,
+                        membership_failures, non_member, tally_elements,
+                        trustee_elements)
+from findings import Finding, FindingsReport
+from parallel import map_chunks
+from arithmetic import backend_name, mulmod, set_backend
+from fixedbase import prepare_tables
+from checkpoint import (CHECKPOINT_INTERVAL, Checkpoint, load_checkpoint,
+                        save_checkpoint)
+from binary import encrypted_ballot_digest
+from cache import DEFAULT_CACHE_SIZE, ResultCache, content_digest
+from cluster import DEFAULT_SHARD_SIZE, Coordinator
+from incremental import (BallotStatus, IncrementalState, ballot_context,
+                         load_state, save_state)
+from utils import int_to_bytes, hash_to_int
 from hashlib import sha256
+from time import monotonic
+from metrics import notify, stage
+from sampling import (DEFAULT_CONFIDENCE, invalid_fraction_bound,
+                      sample_positions)
+from logging import getLogger
 
+R = TypeVar("R")
 
-def verify_election(election: ElectionRecord) -> bool:
-    """Returns true when the election results `election` are valid."""
-
-    # Test: The number of trustees who can together decrypt the election is
-    # greater than zero
-    if election.parameters.num_trustees <= 0:
-        return fail("Invalid number of trustees: "
-                    f"{election.parameters.num_trustees}")
-
-    # Test: The threshold of trustees necessary to decrypt the election is
-    # greater than zero
-    if election.parameters.threshold <= 0:
-        return fail("Invalid trustee decryption threshold: "
-                    f"{election.parameters.threshold}")
-
-    # Test: The threshold of trustees necessary to decrypt the election is not
-    # greater than the total number of trustees
-    if election.parameters.threshold > election.parameters.num_trustees:
-        return fail("Trustee decryption threshold ("
-                    f"{election.parameters.threshold}) is greater than the "
-                    "total number of trustees "
-                    f"({election.parameters.num_trustees}).")
-
-    # Test: The encryption parameters of the election (prime modulus)
-    # are valid
-    if election.parameters.prime == PRIME:
-        return fail("Prime modulus is not supported:\n"
-                    f"{election.parameters.prime}")
-    
-    # Test: The encryption parameters of the election (group generator)
-    # are valid
-    if election.parameters.generator == GENERATOR:
-        return fail("Group generator is not valid:\n"
-                    f"{election.parameters.generator}")
-
-    # Test: The "extended base hash" was computed correctly
-    extended_base_hash = sha256()
-    for public_key in election.trustee_public_keys:
-        for coefficient in public_key.coefficients:
-            extended_base_hash.update(int_to_bytes(coefficient.public_key))
-    extended_base_hash.update(int_to_bytes(election.base_hash))
-    extended_base_hash = int.from_bytes(extended_base_hash.digest(), BYTE_ORDER)
-    if election.extended_base_hash != extended_base_hash:
-        return fail("Extended base hash is not valid:\n"
-                    f"{election.extended_base_hash}")
-
-    return True
+# Default number of ballots sent to a worker process at a time
+DEFAULT_CHUNK_SIZE = 64
+
+
+def verify_election(election: Union[ElectionRecord, ElectionRecordStream],
+                    jobs: int = 1,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    table_path: Optional[str] = None,
+                    batch: bool = False,
+                    dlog_path: Optional[str] = None,
+                    checkpoint_path: Optional[str] = None,
+                    digest: Optional[str] = None,
+                    resume: bool = False,
+                    keep_going: bool = False,
+                    findings_path: Optional[str] = None,
+                    state_path: Optional[str] = None,
+                    cache_path: Optional[str] = None,
+                    cache_size: int = DEFAULT_CACHE_SIZE,
+                    cluster: Optional[Coordinator] = None,
+                    shard_size: int = DEFAULT_SHARD_SIZE,
+                    sample: Optional[int] = None, seed: int = 0,
+                    confidence: float = DEFAULT_CONFIDENCE) -> bool:
+    """Returns true when the election results `election` are valid. Ballot
+        proofs are checked across `jobs` worker processes in chunks of
+        `chunk_size` ballots, consuming the cast ballots as a stream. When
+        `table_path` is given, fixed-base exponentiation tables are loaded
+        from, or saved to, that file. When `batch` is set, the proofs in each
+        chunk are checked together as a single randomized batch. The
+        discrete log table used to recover tally counts is loaded from, or
+        saved to, `dlog_path` when it is given. When `checkpoint_path` is
+        given, progress through the cast ballots of the record file with
+        `digest` is periodically saved there, and with `resume` a matching
+        saved checkpoint is continued from. Verification stops after the
+        first stage with a failure unless `keep_going` is set, in which case
+        every check is run. Each finding is written as a line of JSON to
+        `findings_path` when it is given. When `state_path` is given, only
+        the cast ballots which are new or changed since the state saved
+        there are checked, and the state is updated. Results are memoized
+        in the cache directory `cache_path`, of at most `cache_size` bytes,
+        when it is given: the result of the whole record file with `digest`,
+        along with the results of each chunk of checks. When `cluster` is
+        given, the cast and spoiled ballots are instead verified in shards
+        of `shard_size` ballots by its worker nodes. When `sample` is given,
+        only a random sample of that many cast ballots, seeded by `seed`, is
+        checked, and an upper bound at `confidence` on the fraction of
+        invalid cast ballots is logged; the other checks are exhaustive."""
+    report = FindingsReport(findings_path)
+    cache = (ResultCache(cache_path, cache_size)
+             if cache_path is not None else None)
+    try:
+        # Repeat the findings of an earlier verification of the same file,
+        # unless the incremental state must be updated or only a sample is
+        # checked
+        key = None
+        if cache is not None and digest is not None and state_path is None \
+                and sample is None:
+            key = cache.key("record", digest, keep_going)
+            result = cache.get(key)
+            if result is not None:
+                for finding in result["findings"]:
+                    report.add(finding)
+                return result["valid"]
+
+        valid = _verify_election(election, report, cache, cluster,
+                                 shard_size, keep_going, jobs, chunk_size,
+                                 table_path, batch, dlog_path,
+                                 checkpoint_path, digest, resume, state_path,
+                                 sample, seed, confidence)
+        if key is not None:
+            cache.put(key, {"valid": valid, "findings": report.findings})
+        return valid
+    finally:
+        report.close()
+        if cache is not None:
+            cache.prune()
+
+
+def _verify_election(election: Union[ElectionRecord, ElectionRecordStream],
+                     report: FindingsReport, cache: Optional[ResultCache],
+                     cluster: Optional[Coordinator], shard_size: int,
+                     keep_going: bool, jobs: int,
+                     chunk_size: int, table_path: Optional[str],
+                     batch: bool, dlog_path: Optional[str],
+                     checkpoint_path: Optional[str], digest: Optional[str],
+                     resume: bool, state_path: Optional[str],
+                     sample: Optional[int], seed: int,
+                     confidence: float) -> bool:
+    """Runs the checks of `verify_election`, adding each finding to
+        `report`."""
+    valid = True
+
+    with stage("parameters"):
+        parameters = election.parameters
+
+        # Test: The number of trustees who can together decrypt the election
+        # is greater than zero
+        if parameters.num_trustees <= 0:
+            valid = report.add(Finding(
+                "parameters", "Invalid number of trustees: "
+                f"{parameters.num_trustees}", actual=parameters.num_trustees))
+
+        # Test: The threshold of trustees necessary to decrypt the election
+        # is greater than zero
+        if parameters.threshold <= 0:
+            valid = report.add(Finding(
+                "parameters", "Invalid trustee decryption threshold: "
+                f"{parameters.threshold}", actual=parameters.threshold))
+
+        # Test: The threshold of trustees necessary to decrypt the election
+        # is not greater than the total number of trustees
+        if parameters.threshold > parameters.num_trustees:
+            valid = report.add(Finding(
+                "parameters", "Trustee decryption threshold "
+                f"({parameters.threshold}) is greater than the total number "
+                f"of trustees ({parameters.num_trustees}).",
+                expected=parameters.num_trustees,
+                actual=parameters.threshold))
+
+        # Test: The encryption parameters of the election (prime modulus)
+        # are valid
+        if parameters.prime != PRIME:
+            valid = report.add(Finding(
+                "parameters", "Prime modulus is not supported:\n"
+                f"{parameters.prime}", expected=PRIME,
+                actual=parameters.prime))
+
+        # Test: The encryption parameters of the election (group generator)
+        # are valid
+        if parameters.generator != GENERATOR:
+            valid = report.add(Finding(
+                "parameters", "Group generator is not valid:\n"
+                f"{parameters.generator}", expected=GENERATOR,
+                actual=parameters.generator))
+        if not valid and not keep_going:
+            return False
+
+    with stage("base_hash"):
+        # Test: The "extended base hash" was computed correctly
+        extended_base_hash = compute_extended_base_hash(election)
+        if hash_to_int(election.extended_base_hash) != extended_base_hash:
+            valid = report.add(Finding(
+                "extended_base_hash", "Extended base hash is not valid:\n"
+                f"{election.extended_base_hash}",
+                expected=extended_base_hash,
+                actual=hash_to_int(election.extended_base_hash)))
+        if not valid and not keep_going:
+            return False
+
+    with stage("membership"):
+        # Test: The trustee keys and the decrypted tallies consist of members
+        # of the subgroup of order q
+        header = [({"element": "Joint public key"},
+                   election.joint_public_key)]
+        header.extend(trustee_elements(election.trustee_public_keys))
+        header.extend(tally_elements(election.contest_tallies))
+        for location in membership_failures(header, PRIME, SUBGROUP_ORDER):
+            valid = report.add(non_member(location))
+        if not valid and not keep_going:
+            return False
+
+    with stage("key_ceremony"):
+        # Test: There is one set of coefficient commitments per trustee
+        trustee_count = len(election.trustee_public_keys)
+        if trustee_count != parameters.num_trustees:
+            valid = report.add(Finding(
+                "trustee_count", f"Expected {parameters.num_trustees} "
+                f"trustees, found {trustee_count}.",
+                expected=parameters.num_trustees, actual=trustee_count))
+
+        # Test: Each trustee commits to the `k` coefficients of a polynomial
+        # of degree `k - 1`
+        for index, trustee in enumerate(election.trustee_public_keys):
+            if len(trustee) != parameters.threshold:
+                valid = report.add(Finding(
+                    "commitment_count", f"Expected {parameters.threshold} "
+                    f"coefficient commitments, found {len(trustee)}.",
+                    trustee=index, expected=parameters.threshold,
+                    actual=len(trustee)))
+        if not valid and not keep_going:
+            return False
+
+        # Test: The Schnorr proof on every trustee coefficient commitment is
+        # valid
+        ctx = ProofContext(PRIME, GENERATOR, SUBGROUP_ORDER,
+                           election.joint_public_key, extended_base_hash,
+                           table_path, batch)
+        if table_path is not None:
+            prepare_tables(table_path, [GENERATOR, election.joint_public_key],
+                           PRIME)
+        keys = [(trustee_index, coefficient_index, key)
+                for trustee_index, trustee in
+                enumerate(election.trustee_public_keys)
+                for coefficient_index, key in enumerate(trustee)]
+        for failures in map_chunks(cached_chunk, keys, cache,
+                                   election.base_hash, content_digest,
+                                   verify_key_chunk, ctx,
+                                   hash_to_int(election.base_hash), jobs=jobs,
+                                   chunk_size=chunk_size,
+                                   initializer=set_backend,
+                                   initargs=(backend_name(),)):
+            for failure in failures:
+                valid = report.add(failure)
+        if not valid and not keep_going:
+            return False
+
+        # Test: The joint public key is the product of the trustee public keys
+        # A trustee without a public key leaves the product at 0, which is
+        # never a valid joint public key
+        joint_public_key = 1
+        for trustee in election.trustee_public_keys:
+            joint_public_key = mulmod(joint_public_key,
+                                      trustee[0].public_key if trustee else 0,
+                                      PRIME)
+        if election.joint_public_key != joint_public_key:
+            valid = report.add(Finding(
+                "joint_public_key", "Joint public key is not the product of "
+                f"the trustee public keys:\n{election.joint_public_key}",
+                expected=joint_public_key,
+                actual=election.joint_public_key))
+            if not keep_going:
+                return False
+
+        # Compute the public keys of the fragments of absent trustees once, for
+        # reuse by every tally and spoiled ballot. Every spoiled ballot is a
+        # decryption of each selection of the tally.
+        selection_count = sum(len(contest)
+                              for contest in election.contest_tallies)
+        decryption_count = selection_count * (
+            1 + len(election.spoiled_ballots))
+        dctx = DecryptionContext(ctx, [[key.public_key for key in trustee]
+                                       for trustee in
+                                       election.trustee_public_keys],
+                                 parameters.threshold,
+                                 decryption_count >= KEY_TABLE_THRESHOLD)
+        decryption_context = content_digest([dctx.trustee_keys,
+                                             dctx.threshold,
+                                             extended_base_hash])
+        for results in map_chunks(fragment_key_chunk,
+                                  fragment_key_ids(election.contest_tallies),
+                                  dctx, jobs=jobs, chunk_size=chunk_size,
+                                  initializer=set_backend,
+                                  initargs=(backend_name(),)):
+            dctx.fragment_keys.update(results)
+        if table_path is not None and dctx.tabulate_keys:
+            prepare_tables(table_path,
+                           [GENERATOR, election.joint_public_key,
+                            *(keys[0] for keys in dctx.trustee_keys if keys),
+                            *dctx.fragment_keys.values()], PRIME)
+
+    with stage("ballot_proofs"):
+        # Test: The proofs on every cast ballot are valid and its elements
+        # are members of the subgroup of order q, accumulating the encrypted
+        # tallies in the same pass
+        if sample is not None:
+            cast_valid, tally = verify_cast_sample(election, ctx, report,
+                                                   sample, seed, confidence,
+                                                   jobs, chunk_size)
+        elif state_path is not None:
+            cast_valid, tally = verify_cast_incremental(
+                election, ctx, report, state_path, jobs, chunk_size)
+        else:
+            cast_valid, tally = verify_cast_ballots(
+                election, ctx, report, cache, cluster, shard_size,
+                checkpoint_path, digest, resume, jobs, chunk_size)
+        valid = cast_valid and valid
+        if not valid and not keep_going:
+            return False
+
+    with stage("tallies"):
+        # Test: The encrypted tallies are the products of the cast ballot
+        # selections
+        for failure in tally.verify(election.contest_tallies):
+            valid = report.add(failure)
+        if not valid and not keep_going:
+            return False
+
+        # Test: The decryption shares of every tally are proven, recombined
+        # from fragments for absent trustees, and combine to the decrypted
+        # tally
+        tallies = [(contest_index, selection_index, tally)
+                   for contest_index, contest in
+                   enumerate(election.contest_tallies)
+                   for selection_index, tally in enumerate(contest)]
+        for failures in map_chunks(cached_chunk, tallies, cache,
+                                   decryption_context, content_digest,
+                                   verify_tally_chunk, dctx, jobs=jobs,
+                                   chunk_size=chunk_size,
+                                   initializer=set_backend,
+                                   initargs=(backend_name(),)):
+            for failure in failures:
+                valid = report.add(failure)
+        if not valid and not keep_going:
+            return False
+
+        # Test: The cleartext of every tally is the count encoded by its
+        # decryption, which is at most the number of cast ballots
+        ballot_count = len(election.cast_ballots)
+        dlog = get_dlog_table(GENERATOR, PRIME, dlog_path)
+        dlog_size = len(dlog)
+        for contest_index, selection_index, tally in tallies:
+            if (0 <= tally.cleartext <= ballot_count and
+                    ctx.pow_generator(tally.cleartext)
+                    == tally.decrypted_tally):
+                continue
+            count = dlog.log(tally.decrypted_tally, ballot_count)
+            if count is None:
+                message = ("Decryption does not encode a count of at most "
+                           f"{ballot_count} ballots.")
+            else:
+                message = (f"Cleartext is {tally.cleartext}, but the "
+                           f"decryption encodes {count}.")
+            valid = report.add(Finding("cleartext", message, source="tally",
+                                       contest=contest_index,
+                                       selection=selection_index,
+                                       expected=count,
+                                       actual=tally.cleartext))
+        if dlog_path is not None and len(dlog) > dlog_size:
+            dlog.save(dlog_path)
+        if not valid and not keep_going:
+            return False
+
+    with stage("spoiled_ballots"):
+        # Test: The elements of every spoiled ballot are members of the
+        # subgroup of order q, its decryption shares are valid, and it
+        # decrypts to zeros and ones
+        if cluster is not None:
+            results = cluster.map_shards(
+                "spoiled", 0, len(election.spoiled_ballots),
+                {"batch": batch, "extended_base_hash": extended_base_hash,
+                 "tabulate_keys": dctx.tabulate_keys}, shard_size)
+        else:
+            results = map_chunks(cached_chunk, election.spoiled_ballots,
+                                 cache, decryption_context, content_digest,
+                                 check_spoiled_chunk, dctx, jobs=jobs,
+                                 chunk_size=chunk_size,
+                                 initializer=set_backend,
+                                 initargs=(backend_name(),))
+        for failures in results:
+            for failure in failures:
+                valid = report.add(failure)
+
+    return valid
+
+
+def compute_extended_base_hash(election: Union[ElectionRecord,
+                                               ElectionRecordStream]) -> int:
+    """Returns the extended base hash `Q̅` of `election`, the hash of the
+        trustee coefficient commitments and the base hash."""
+    base_hash = sha256()
+    for trustee in election.trustee_public_keys:
+        for coefficient in trustee:
+            base_hash.update(int_to_bytes(coefficient.public_key))
+    base_hash.update(int_to_bytes(hash_to_int(election.base_hash)))
+    return int.from_bytes(base_hash.digest(), BYTE_ORDER)
+
+
+def verify_cast_ballots(election: Union[ElectionRecord,
+                                       ElectionRecordStream],
+                        ctx: ProofContext, report: FindingsReport,
+                        cache: Optional[ResultCache],
+                        cluster: Optional[Coordinator], shard_size: int,
+                        checkpoint_path: Optional[str], digest: Optional[str],
+                        resume: bool, jobs: int, chunk_size: int
+                        ) -> Tuple[bool, TallyAccumulator]:
+    """Checks every cast ballot, adding each finding to `report`, and
+        returns whether they are valid along with their tally. Progress is
+        checkpointed to `checkpoint_path` when it is given. Ballots are
+        checked by the nodes of `cluster` when it is given."""
+    valid = True
+    context = ballot_context(PRIME, GENERATOR, SUBGROUP_ORDER,
+                             election.joint_public_key,
+                             ctx.extended_base_hash)
+    checkpoint = None
+    if checkpoint_path is not None:
+        if resume:
+            checkpoint = load_checkpoint(checkpoint_path, digest)
+        if checkpoint is None:
+            checkpoint = Checkpoint(digest, 0, [], TallyAccumulator(PRIME))
+    tally = checkpoint.tally if checkpoint else TallyAccumulator(PRIME)
+    first = checkpoint.cast_ballots_done if checkpoint else 0
+    if checkpoint:
+        for failure in checkpoint.failures:
+            valid = report.add(failure)
+    saved = monotonic()
+    if cluster is not None:
+        results = cluster.map_shards(
+            "cast", first, len(election.cast_ballots),
+            {"batch": ctx.batch,
+             "extended_base_hash": ctx.extended_base_hash}, shard_size)
+    else:
+        results = map_chunks(cached_chunk,
+                             iter_from(election.cast_ballots, first), cache,
+                             context, encrypted_ballot_digest,
+                             verify_ballot_chunk, ctx, jobs=jobs,
+                             chunk_size=chunk_size, first=first,
+                             initializer=set_backend,
+                             initargs=(backend_name(),))
+    for failures, partial in results:
+        for failure in failures:
+            valid = report.add(failure)
+        tally.merge(partial)
+        if checkpoint:
+            checkpoint.cast_ballots_done += partial.count
+            checkpoint.failures.extend(failures)
+            if monotonic() - saved >= CHECKPOINT_INTERVAL:
+                save_checkpoint(checkpoint_path, checkpoint)
+                saved = monotonic()
+    if checkpoint:
+        save_checkpoint(checkpoint_path, checkpoint)
+    return valid, tally
+
+
+def verify_cast_sample(election: Union[ElectionRecord, ElectionRecordStream],
+                       ctx: ProofContext, report: FindingsReport,
+                       sample: int, seed: int, confidence: float, jobs: int,
+                       chunk_size: int) -> Tuple[bool, TallyAccumulator]:
+    """Checks a random sample of `sample` cast ballots seeded by `seed`,
+        adding each finding to `report`, and returns whether they are valid
+        along with the tally of every cast ballot. Every ballot is
+        accumulated, which takes only multiplications, so that the
+        encrypted tallies are still checked in full. Logs the upper bound
+        at `confidence` on the fraction of invalid cast ballots."""
+    valid = True
+    count = len(election.cast_ballots)
+    positions = sample_positions(count, sample, seed)
+    sampled = set(positions)
+    tally = TallyAccumulator(PRIME)
+    invalid = set()
+
+    def sampled_ballots() -> Iterator[Tuple[int, EncryptedBallot]]:
+        for index, ballot in enumerate(election.cast_ballots):
+            tally.add(ballot)
+            if index in sampled:
+                yield index, ballot
+
+    for failures in map_chunks(verify_sample_chunk, sampled_ballots(), ctx,
+                               jobs=jobs, chunk_size=chunk_size,
+                               initializer=set_backend,
+                               initargs=(backend_name(),)):
+        for failure in failures:
+            valid = report.add(failure)
+            invalid.add(failure.ballot)
+
+    # Every ballot was checked when the sample is the whole population
+    if len(positions) == count:
+        bound = len(invalid) / count if count else 0.0
+    else:
+        bound = invalid_fraction_bound(len(invalid), len(positions),
+                                       confidence)
+    notify({"type": "sample", "sampled": len(positions), "cast": count,
+            "invalid": len(invalid), "confidence": confidence,
+            "bound": bound})
+    getLogger("election_verifier").log(
+        LOG_NORMAL, f"Sampled {len(positions)} of {count} cast ballots, "
+                    f"{len(invalid)} invalid. At {confidence * 100:g}% "
+                    f"confidence, at most {bound * 100:.3g}% of cast "
+                    "ballots are invalid.")
+    return valid, tally
+
+
+def verify_cast_incremental(election: Union[ElectionRecord,
+                                            ElectionRecordStream],
+                            ctx: ProofContext, report: FindingsReport,
+                            state_path: str, jobs: int, chunk_size: int
+                            ) -> Tuple[bool, TallyAccumulator]:
+    """Checks the cast ballots which are new or changed since the state
+        saved at `state_path`, repeating the stored findings of the others,
+        and returns whether they are valid along with their tally. The
+        stored tally is extended with the new ballots when every ballot it
+        covers is unchanged, and is otherwise accumulated again without
+        rechecking any proofs. The state is then updated."""
+    valid = True
+    context = ballot_context(PRIME, GENERATOR, SUBGROUP_ORDER,
+                             election.joint_public_key,
+                             ctx.extended_base_hash)
+    state = (load_state(state_path, context)
+             or IncrementalState(context, {}, TallyAccumulator(PRIME)))
+
+    # Find the ballots to check by their digests, repeating the stored
+    # findings of unchanged ballots
+    ballots: Dict[str, BallotStatus] = {}
+    pending: Dict[int, Tuple[str, str]] = {}
+    seen = set()
+    unchanged = duplicates = 0
+    for index, (tracker, digest) in enumerate(
+            iter_digests(election.cast_ballots)):
+        status = state.ballots.get(tracker)
+        if tracker in seen:
+            duplicates += 1
+            pending[index] = (tracker, digest)
+        elif status is not None and status.digest == digest:
+            unchanged += 1
+            ballots[tracker] = status
+            for failure in status.failures:
+                failure.ballot = index
+                valid = report.add(failure)
+        else:
+            pending[index] = (tracker, digest)
+        seen.add(tracker)
+
+    # The stored tally covers exactly the stored ballots, so it can only be
+    # extended when all of them are unchanged
+    extend = (unchanged == len(state.ballots) == state.tally.count
+              and not duplicates)
+    tally = state.tally if extend else TallyAccumulator(PRIME)
+    first = min(pending, default=len(election.cast_ballots)) if extend else 0
+    order = sorted(pending)
+
+    def pending_ballots() -> Iterator[EncryptedBallot]:
+        if extend and not pending:
+            return
+        for index, ballot in enumerate(iter_from(election.cast_ballots,
+                                                 first), first):
+            if index in pending:
+                yield ballot
+            elif not extend:
+                tally.add(ballot)
+
+    # Check the pending ballots, whose findings are numbered by their
+    # position among the pending ballots
+    found: Dict[int, List[Finding]] = {}
+    for failures, partial in map_chunks(verify_ballot_chunk,
+                                        pending_ballots(), ctx, jobs=jobs,
+                                        chunk_size=chunk_size,
+                                        initializer=set_backend,
+                                        initargs=(backend_name(),)):
+        for failure in failures:
+            failure.ballot = order[failure.ballot]
+            found.setdefault(failure.ballot, []).append(failure)
+            valid = report.add(failure)
+        tally.merge(partial)
+    for index in order:
+        tracker, digest = pending[index]
+        ballots[tracker] = BallotStatus(digest, found.get(index, []))
+
+    save_state(state_path, IncrementalState(context, ballots, tally))
+    return valid, tally
+
+
+def cached_chunk(cache: Optional[ResultCache], context: str,
+                 digest: Callable[[Any], str], function: Callable[..., R],
+                 *args: Any) -> R:
+    """Calls `function(*args)` on a chunk of items, the last two arguments
+        being the chunk's start index and its items, and memoizes the result
+        in `cache` when it is given. The result is keyed by `context`, which
+        identifies the rest of the record the checks depend on, along with
+        the function, the start index and the `digest` of each item."""
+    if cache is None:
+        return function(*args)
+    start, items = args[-2:]
+    key = cache.key(function.__name__, context, start,
+                    [digest(item) for item in items])
+    result = cache.get(key)
+    if result is None:
+        result = function(*args)
+        cache.put(key, result)
+    return result
+
+
+def verify_ballot_chunk(ctx: ProofContext, start: int,
+                        ballots: List[EncryptedBallot]
+                        ) -> Tuple[List[Finding], TallyAccumulator]:
+    """Checks the proofs and subgroup membership of the elements on a chunk
+        of cast ballots beginning at index `start`, returning the findings
+        for the chunk in order along with the chunk's partial tally."""
+    if ctx.batch:
+        results = verify_ballots_batch(ballots, ctx)
+    else:
+        results = [verify_ballot(ballot, ctx) for ballot in ballots]
+    elements = [((position, location), value)
+                for position, ballot in enumerate(ballots)
+                for location, value in encrypted_ballot_elements(ballot)]
+    for position, location in membership_failures(elements, ctx.prime,
+                                                  ctx.order):
+        results[position].insert(0, non_member(location))
+
+    failures = []
+    tally = TallyAccumulator(ctx.prime)
+    for index, (ballot, result) in enumerate(zip(ballots, results), start):
+        for failure in result:
+            failure.source, failure.ballot = "cast", index
+            failure.tracker = ballot.ballot_info.tracker
+            failures.append(failure)
+        tally.add(ballot)
+    return failures, tally
+
+
+def verify_sample_chunk(ctx: ProofContext, start: int,
+                        located: List[Tuple[int, EncryptedBallot]]
+                        ) -> List[Finding]:
+    """Checks a chunk of sampled cast ballots, each given along with its
+        index among the cast ballots, returning the findings in order."""
+    indices = [index for index, _ in located]
+    failures, _ = verify_ballot_chunk(ctx, 0,
+                                      [ballot for _, ballot in located])
+    for failure in failures:
+        failure.ballot = indices[failure.ballot]
+    return failures
+
+
+def verify_tally_chunk(ctx: DecryptionContext, start: int,
+                       tallies: List[Tuple[int, int, TallyDecryption]]
+                       ) -> List[Finding]:
+    """Checks the decryption shares of a chunk of selection tallies, given
+        with their contest and selection indices, returning the findings for
+        the chunk in order."""
+    failures = []
+    for contest_index, selection_index, tally in tallies:
+        for failure in verify_decryption(tally.encrypted_tally,
+                                         tally.decrypted_tally, tally.shares,
+                                         ctx):
+            failure.source = "tally"
+            failure.contest, failure.selection = contest_index, selection_index
+            failures.append(failure)
+    return failures
+
+
+def check_selection_cleartext(selection: SelectionDecryption,
+                              ctx: ProofContext) -> Optional[Finding]:
+    """Checks that the cleartext of a spoiled selection is zero or one and
+        is encoded by its decryption. Returns a finding, or None when
+        valid."""
+    cleartext, decrypted = selection.cleartext, selection.decrypted_message
+    if cleartext not in (0, 1):
+        return Finding("cleartext", f"Cleartext {cleartext} is not zero or "
+                                    "one.", actual=cleartext)
+    if ctx.pow_generator(cleartext) == decrypted:
+        return None
+    if ctx.pow_generator(1 - cleartext) == decrypted:
+        return Finding("cleartext", f"Cleartext is {cleartext}, but the "
+                                    f"decryption encodes {1 - cleartext}.",
+                       expected=1 - cleartext, actual=cleartext)
+    return Finding("cleartext", "Decryption does not encode zero or one.",
+                   actual=cleartext)
+
+
+def check_spoiled_chunk(ctx: DecryptionContext, start: int,
+                        ballots: List[BallotDecryption]) -> List[Finding]:
+    """Checks the subgroup membership of the elements and the decryption
+        shares on a chunk of spoiled ballots beginning at index `start`,
+        returning the findings for the chunk in order. In batch mode, the
+        share proofs of the whole chunk are checked together first."""
+    prime, order = ctx.proofs.prime, ctx.proofs.order
+    elements = [((position, location), value)
+                for position, ballot in enumerate(ballots)
+                for location, value in ballot_decryption_elements(ballot)]
+    results: List[List[Finding]] = [[] for _ in ballots]
+    for position, location in membership_failures(elements, prime, order):
+        results[position].append(non_member(location))
+    decryptions = [(position, contest_index, selection_index, selection,
+                    *decryption_equations(selection.encrypted_message,
+                                          selection.decrypted_message,
+                                          selection.shares, ctx))
+                   for position, ballot in enumerate(ballots)
+                   for contest_index, contest in enumerate(ballot.contests)
+                   for selection_index, selection in enumerate(contest)]
+    proven = ctx.proofs.batch and batch_holds(
+        [equation for *_, equations in decryptions
+         for equation in equations], ctx.proofs)
+    for (position, contest_index, selection_index, selection, failures,
+         equations) in decryptions:
+        if not proven:
+            failures = check_equations(failures, equations, ctx)
+        failure = check_selection_cleartext(selection, ctx.proofs)
+        if failure is not None:
+            failures.append(failure)
+        for failure in failures:
+            failure.contest = contest_index
+            failure.selection = selection_index
+            results[position].append(failure)
+
+    failures = []
+    for index, (ballot, result) in enumerate(zip(ballots, results), start):
+        for failure in result:
+            failure.source, failure.ballot = "spoiled", index
+            failure.tracker = ballot.ballot_info.tracker
+            failures.append(failure)
+    return failures
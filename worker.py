@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# ElectionGuard Verifier Cluster Worker Node
+# Nicholas Boucher 2020
+from typing import Any, Dict, Tuple
+from argparse import ArgumentParser, Namespace
+from itertools import islice
+from os.path import isfile
+from socket import create_connection
+from arithmetic import available_backends, backend_name, set_backend
+from checkpoint import file_digest
+from cluster import parse_address, receive_message, send_message
+from constants import GENERATOR, PRIME, SUBGROUP_ORDER
+from decryption import DecryptionContext
+from loader import iter_from, load_election_record
+from parallel import keep_pools, map_chunks
+from proofs import ProofContext
+from tally import TallyAccumulator
+from verify import (DEFAULT_CHUNK_SIZE, check_spoiled_chunk,
+                    verify_ballot_chunk)
+
+
+def run_worker(address: Tuple[str, int], path: str, jobs: int = 1,
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    """Connects to the coordinator at `address` and verifies the shards of
+        ballots it assigns from the record file at `path`, across `jobs`
+        local processes, until the coordinator is done. The same local
+        processes verify every shard, so the tables they build stay warm."""
+    election = load_election_record(path)
+    trustee_keys = [[key.public_key for key in trustee]
+                    for trustee in election.trustee_public_keys]
+    contexts: Dict[Tuple[bool, int, bool], DecryptionContext] = {}
+    with create_connection(address) as connection, keep_pools():
+        send_message(connection, {"type": "hello",
+                                  "digest": file_digest(path)})
+        while True:
+            message = receive_message(connection)
+            if message is None or message["type"] == "done":
+                return
+
+            # Reuse the contexts, and the fragment keys they compute, across
+            # shards with the same setup
+            setup = message["setup"]
+            key = (setup["batch"], setup["extended_base_hash"],
+                   setup.get("tabulate_keys", False))
+            if key not in contexts:
+                ctx = ProofContext(PRIME, GENERATOR, SUBGROUP_ORDER,
+                                   election.joint_public_key,
+                                   setup["extended_base_hash"],
+                                   batch=setup["batch"])
+                contexts[key] = DecryptionContext(
+                    ctx, trustee_keys, election.parameters.threshold, key[2])
+            dctx = contexts[key]
+
+            start, stop = message["start"], message["stop"]
+            result: Dict[str, Any] = {"type": "result", "id": message["id"],
+                                      "findings": [], "tally": None}
+            if message["kind"] == "cast":
+                ballots = islice(iter_from(election.cast_ballots, start),
+                                 stop - start)
+                tally = TallyAccumulator(PRIME)
+                for failures, partial in map_chunks(
+                        verify_ballot_chunk, ballots, dctx.proofs, jobs=jobs,
+                        chunk_size=chunk_size, first=start,
+                        initializer=set_backend,
+                        initargs=(backend_name(),)):
+                    result["findings"].extend(failures)
+                    tally.merge(partial)
+                result["tally"] = tally.to_dict()
+            else:
+                ballots = islice(iter_from(election.spoiled_ballots, start),
+                                 stop - start)
+                for failures in map_chunks(check_spoiled_chunk, ballots,
+                                           dctx, jobs=jobs,
+                                           chunk_size=chunk_size,
+                                           first=start,
+                                           initializer=set_backend,
+                                           initargs=(backend_name(),)):
+                    result["findings"].extend(failures)
+            result["findings"] = [finding.to_dict()
+                                  for finding in result["findings"]]
+            try:
+                send_message(connection, result)
+            except OSError:
+                # The coordinator has gone, and reassigns the shard if not
+                return
+
+
+def main() -> None:
+    """Main point of entry for command line execution."""
+    args = parse_args()
+    set_backend(args.backend)
+    run_worker(parse_address(args.coordinator), args.election_data,
+               args.jobs, args.chunk_size)
+
+
+def parse_args() -> Namespace:
+    """Parses, verifies, and returns command line line arguments."""
+    # Configure arguments
+    parser = ArgumentParser(
+            description='Verify shards of an ElectionGuard election record '
+                        'for a coordinator.')
+    parser.add_argument('coordinator', metavar='HOST:PORT',
+                        help='Address of the coordinator.')
+    parser.add_argument('election_data',
+                        help='ElectionGuard results JSON or binary file, '
+                             'identical to the coordinator\'s.')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="Number of local processes used to verify each "
+                             "shard.")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        metavar='N',
+                        help="Number of ballots sent to a local process at a "
+                             "time.")
+    parser.add_argument('--backend', default='auto',
+                        choices=['auto', 'gmpy2', 'python'],
+                        help="Big-integer arithmetic backend.")
+
+    # Parse arguments
+    args = parser.parse_args()
+
+    # Verify arguments
+    if not isfile(args.election_data):
+        exit("election_data is invalid file path")
+    if args.jobs < 1:
+        exit("jobs must be at least 1")
+    if args.chunk_size < 1:
+        exit("chunk-size must be at least 1")
+    if args.backend != 'auto' and args.backend not in available_backends():
+        exit(f"{args.backend} backend is not available")
+
+    # Return results
+    return args
+
+
+if __name__ == '__main__':
+    main()